@@ -6,13 +6,25 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "core" / "Providers"))
 
+from concurrent.futures import TimeoutError as FutureTimeout
 from flask import Blueprint, request, jsonify
 from InitAIProvider import AIProviderManager, ProviderType # type: ignore
 from app.Ai import ai_provider_bp
+from app.core.config import Config
+from app.services.Productivity.ai_queue import ClassificationQueue, PROVISIONAL_CATEGORY, QueueFull
 
 bp = ai_provider_bp
 
 _manager = AIProviderManager()
+# all provider classification goes through this queue (coalescing, batching, rate limits)
+_classify_queue = ClassificationQueue(
+    _manager.get_default_provider,
+    workers=Config.AI_CLASSIFY_WORKERS,
+    batch_size=Config.AI_CLASSIFY_BATCH_SIZE,
+    max_concurrency=Config.AI_CLASSIFY_CONCURRENCY,
+    rate_per_minute=Config.AI_CLASSIFY_RATE_PER_MINUTE,
+    max_pending=Config.AI_CLASSIFY_MAX_PENDING,
+)
 
 # ------------------------------------------------------------------
 # Provider management
@@ -60,15 +72,35 @@ def get_default():
 def classify():
     """
     Quick classification via the active provider.
-    Body: {"text": "youtube.com"}
+    Body: {"text": "youtube.com", "wait": 0}
+    By default (wait=0) a provisional category is returned at once (202) and
+    the text is classified in the background; wait=N blocks up to N seconds
+    for the provider's answer. 503 when the classification queue is full.
     """
-    body = request.get_json(force=True)
+    body = request.get_json(silent=True, force=True)
+    if not isinstance(body, dict) or not isinstance(body.get("text"), str):
+        return jsonify({"error": '{"text": "...", "wait": seconds}'}), 400
     text = body["text"]
+    try:
+        wait = float(body.get("wait", 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    if not 0 <= wait < float("inf"):
+        return jsonify({"error": "wait must be a number of seconds"}), 400
     prov = _manager.get_default_provider()
     if not prov:
         return jsonify({"error": "no provider initialized"}), 400
     try:
-        category = prov.classify(text)
+        future = _classify_queue.submit(text)
+        category = future.result(timeout=wait)
         return jsonify({"text": text, "category": category})
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    except FutureTimeout:
+        return jsonify({"text": text, "category": PROVISIONAL_CATEGORY, "pending": True}), 202
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/queue", methods=["GET"])
+def queue_stats():
+    return jsonify(_classify_queue.stats())
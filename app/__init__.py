@@ -14,6 +14,7 @@ from app.api.Widgets import widgets_bp
 from app.api.Activitiy import tracker_bp , utils_bp , productivy_bp , analytics_bp , config_manger_bp , history_bp , cupturer_bp , device_controller_bp
 from app.api.ModeController import mode_controller_bp
 from app.api.Extension import extension_tracker_bp
+from app.api.Stream import stream_bp
 from app.Ai import ai_provider_bp
 
 def create_app():
@@ -58,6 +59,9 @@ def create_app():
     # Extension Tracker API
    
     app.register_blueprint(extension_tracker_bp)
+
+    # Live state stream (SSE)
+    app.register_blueprint(stream_bp)
     # app.disableHardwareAcceleration();
 
 
@@ -8,11 +8,17 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parents[4] / "Core"))
 
 from flask import Blueprint, abort, request, jsonify
-from  app.api.Activitiy.tracker_api import _tracker  
+from  app.api.Activitiy.tracker_api import _tracker, _feed
 from app.api.Activitiy import analytics_bp
+from app.core.cache import response_cache
 # Obtain analytics object from the already-running tracker
 _analytics = _tracker.analytics
 
+# Dashboard polling is served from the response cache until the data changes:
+# a closed session drops the entries, new samples make them stale after max_stale seconds
+_feed.on_session_closed(lambda _session: response_cache.invalidate("analytics"))
+_feed.on_sample(lambda _record: response_cache.touch("analytics"))
+
 # Define the blueprint for analytics API
 bp = analytics_bp
 
@@ -37,22 +43,26 @@ def _stats_to_dict(stats_map):
 # Routes
 # ------------------------------------------------------------------
 @bp.route("/app-time", methods=["GET"])
+@response_cache.cached(tags=("analytics",))
 def app_time():
     """GET /api/analytics/app-time?hours=6"""
     hours = request.args.get("hours", type=int)
     return jsonify(_analytics.get_time_by_app(hours))
 
 @bp.route("/window-type-time", methods=["GET"])
+@response_cache.cached(tags=("analytics",))
 def window_type_time():
     """GET /api/analytics/window-type-time"""
     return jsonify(_analytics.get_time_by_window_type())
 
 @bp.route("/today", methods=["GET"])
+@response_cache.cached(tags=("analytics",))
 def top_today_windows():
     """GET /api/analytics/window-type-time"""
     return jsonify(_analytics.get_today_statistics())
 
 @bp.route("/today", methods=["GET"])
+@response_cache.cached(tags=("analytics",))
 def get_today():
     """
     GET /api/analytics/today
@@ -63,6 +73,7 @@ def get_today():
 
 
 @bp.route("/day/<string:day_str>", methods=["GET"])
+@response_cache.cached(tags=("analytics",))
 def get_day(day_str: str):
     """
     GET /api/analytics/day/2024-08-02
@@ -77,6 +88,7 @@ def get_day(day_str: str):
     return jsonify(_stats_to_dict(stats)), 200
 
 @bp.route("/top-windows", methods=["GET"])
+@response_cache.cached(tags=("analytics",))
 def top_windows():
     """GET /api/analytics/top-windows?n=5&hours=6"""
     n = request.args.get("n", default=5, type=int)
@@ -91,6 +103,7 @@ def top_windows():
             
 
 @bp.route("/top-raw-windows", methods=["GET"])
+@response_cache.cached(tags=("analytics",))
 def top_raw_windows():
     """GET /api/analytics/top-windows?n=5&hours=6"""
     n = request.args.get("n", default=5, type=int)
@@ -98,43 +111,55 @@ def top_raw_windows():
     return jsonify(_analytics.get_top_raw_windows(n, hours))
 
 @bp.route("/productivity-summary", methods=["GET"])
+@response_cache.cached(tags=("analytics",))
 def productivity_summary():
     """GET /api/analytics/productivity-summary?hours=6"""
     hours = request.args.get("hours", type=int)
     return jsonify(_analytics.get_productivity_summary(hours))
 
 @bp.route("/productive-apps", methods=["GET"])
+@response_cache.cached(tags=("analytics",))
 def productive_apps():
     """GET /api/analytics/productive-apps?hours=6"""
     hours = request.args.get("hours", type=int)
     return jsonify(_analytics.get_productive_apps_ranking(hours))
 
 @bp.route("/neutral-apps", methods=["GET"])
+@response_cache.cached(tags=("analytics",))
 def neutral_apps():
     """GET /api/analytics/neutral-apps?hours=6"""
     hours = request.args.get("hours", type=int)
     return jsonify(_analytics.get_neutral_apps_ranking(hours))
 
 @bp.route("/distracting-apps", methods=["GET"])
+@response_cache.cached(tags=("analytics",))
 def distracting_apps():
     """GET /api/analytics/distracting-apps?hours=6"""
     hours = request.args.get("hours", type=int)
     return jsonify(_analytics.get_distracting_apps_ranking(hours))
 
 @bp.route("/daily-summary", methods=["GET"])
+@response_cache.cached(tags=("analytics",))
 def daily_summary():
     """GET /api/analytics/daily-summary?days=7"""
     days = request.args.get("days", default=7, type=int)
     return jsonify(_analytics.get_daily_summary(days))
 
 @bp.route("/weekly-summary", methods=["GET"])
+@response_cache.cached(tags=("analytics",))
 def weekly_summary():
     """GET /api/analytics/weekly-summary?weeks=4"""
     weeks = request.args.get("weeks", default=4, type=int)
     return jsonify(_analytics.get_weekly_summary(weeks))
 
 @bp.route("/monthly-summary", methods=["GET"])
+@response_cache.cached(tags=("analytics",))
 def monthly_summary():
     """GET /api/analytics/monthly-summary?months=6"""
     months = request.args.get("months", default=6, type=int)
-    return jsonify(_analytics.get_monthly_summary(months))
\ No newline at end of file
+    return jsonify(_analytics.get_monthly_summary(months))
+
+@bp.route("/cache-stats", methods=["GET"])
+def cache_stats():
+    """GET /api/analytics/cache-stats"""
+    return jsonify(response_cache.stats())
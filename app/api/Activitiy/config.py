@@ -9,6 +9,13 @@ MAX_TOP_WINDOWS_LIMIT = 20
 DEFAULT_HISTORY_LIMIT = 50
 DEFAULT_TOP_WINDOWS_LIMIT = 5
 
+# In-memory raw history (ring buffer capacity, one day at 1s interval)
+RAW_HISTORY_CAPACITY = 86_400
+
+# Sessions imported from Core the first time the session index is empty (one year)
+SESSION_BACKFILL_HOURS = 24 * 365
+DEFAULT_SESSION_TITLES = 10
+
 # Thread timeouts
 THREAD_JOIN_TIMEOUT = 5
 
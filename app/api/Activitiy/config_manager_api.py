@@ -8,6 +8,8 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parents[4] / "Core"))
 
+import os
+import config_manager # type: ignore
 from flask import Blueprint, request, jsonify
 from config_manager import ( # type: ignore
     load_process_map,
@@ -23,14 +25,59 @@ from config_manager import ( # type: ignore
     get_all_urls
 ) 
 from app.api.Activitiy import config_manger_bp
+from app.core.cache import response_cache
+from app.core.config import Config
+from app.core.config_store import ConfigSection, ConfigStore
+from app.services.Config import sections
 bp = config_manger_bp
 
+# ----------------------------------------------------------
+# 0. Config store
+# Reads are served from memory; mutations are journaled and written
+# through config_manager by a debounced flusher.
+# ----------------------------------------------------------
+_PERSIST = {
+    ("process_map", "upsert"): add_or_update_mapping,
+    ("categories", "create"): create_category,
+    ("categories", "delete"): delete_category,
+    ("categories", "add_pattern"): add_pattern_to_category,
+    ("categories", "remove_pattern"): remove_pattern_from_category,
+    ("prefixes", "add"): add_prefix,
+    ("prefixes", "remove"): remove_prefix,
+}
+
+def _persister(section):
+    return lambda op, args: _PERSIST[(section, op)](*args)
+
+_config_store = ConfigStore(os.path.join(Config.STORAGE_FILE_JSON, "config_journal.jsonl"),
+                            debounce=Config.CONFIG_FLUSH_DEBOUNCE)
+_config_store.register(ConfigSection("process_map", lambda: dict(load_process_map()),
+                                     sections.PROCESS_MAP_OPS, _persister("process_map")))
+_config_store.register(ConfigSection("categories", lambda: sections.load_categories(get_all_categories()),
+                                     sections.CATEGORY_OPS, _persister("categories")))
+_config_store.register(ConfigSection("prefixes", lambda: list(get_all_prefixes()),
+                                     sections.PREFIX_OPS, _persister("prefixes")))
+
+def _sync_process_name_map(_section, value, _version):
+    # update config_manager's module-global map in place: modules that imported
+    # the dict itself (the tracker) keep seeing the current one. New entries go
+    # in before stale ones are dropped, so readers never see an empty map.
+    process_map = config_manager.PROCESS_NAME_MAP
+    process_map.update(value)
+    for name in [name for name in process_map if name not in value]:
+        del process_map[name]
+
+_config_store.subscribe(_sync_process_name_map, sections=("process_map",))
+_config_store.subscribe(lambda *_: response_cache.invalidate("analytics"),
+                        sections=("process_map", "categories"))
+_config_store.replay_journal()
+
 # ----------------------------------------------------------
 # 1. Process Map
 # ----------------------------------------------------------
 @bp.route("/process-map", methods=["GET"])
 def get_map():
-    return jsonify(load_process_map())
+    return jsonify(_config_store.get("process_map"))
 
 @bp.route("/process-map", methods=["POST"])
 def upsert_map():
@@ -38,7 +85,7 @@ def upsert_map():
     data = request.get_json(silent=True)
     if not data or "exe" not in data or "friendly" not in data:
         return jsonify({"error": "JSON body must contain 'exe' and 'friendly'"}), 400
-    add_or_update_mapping(data["exe"], data["friendly"])
+    _config_store.apply("process_map", "upsert", data["exe"], data["friendly"])
     return jsonify({"message": "updated"}), 201
 
 # ----------------------------------------------------------
@@ -46,19 +93,19 @@ def upsert_map():
 # ----------------------------------------------------------
 @bp.route("/categories", methods=["GET"])
 def list_categories():
-    return jsonify(get_all_categories())
+    return jsonify(_config_store.get("categories"))
 
 @bp.route("/categories", methods=["POST"])
 def new_category():
     name = request.get_json(silent=True, force=True)
     if not name or "name" not in name:
         return jsonify({"error": "JSON body must contain 'name'"}), 400
-    ok = create_category(name["name"])
+    ok = _config_store.apply("categories", "create", name["name"])
     return (jsonify({"message": "created"}), 201) if ok else (jsonify({"error": "exists"}), 409)
 
 @bp.route("/categories/<string:cat>", methods=["DELETE"])
 def remove_category(cat):
-    ok = delete_category(cat)
+    ok = _config_store.apply("categories", "delete", cat)
     return ("", 204) if ok else (jsonify({"error": "not found"}), 404)
 
 @bp.route("/categories/<string:cat>/patterns", methods=["POST"])
@@ -66,12 +113,12 @@ def add_pattern(cat):
     body = request.get_json(silent=True)
     if not body or "pattern" not in body:
         return jsonify({"error": "JSON body must contain 'pattern'"}), 400
-    ok = add_pattern_to_category(cat, body["pattern"])
+    ok = _config_store.apply("categories", "add_pattern", cat, body["pattern"])
     return (jsonify({"message": "added"}), 201) if ok else (jsonify({"error": "category or pattern issue"}), 400)
 
 @bp.route("/categories/<string:cat>/patterns/<string:pattern>", methods=["DELETE"])
 def remove_pattern(cat, pattern):
-    ok = remove_pattern_from_category(cat, pattern)
+    ok = _config_store.apply("categories", "remove_pattern", cat, pattern)
     return ("", 204) if ok else (jsonify({"error": "not found"}), 404)
 
 # ----------------------------------------------------------
@@ -79,19 +126,19 @@ def remove_pattern(cat, pattern):
 # ----------------------------------------------------------
 @bp.route("/prefixes", methods=["GET"])
 def list_prefixes():
-    return jsonify(get_all_prefixes())
+    return jsonify(_config_store.get("prefixes"))
 
 @bp.route("/prefixes", methods=["POST"])
 def add_pre():
     body = request.get_json(silent=True)
     if not body or "prefix" not in body:
         return jsonify({"error": "JSON body must contain 'prefix'"}), 400
-    ok = add_prefix(body["prefix"])
+    ok = _config_store.apply("prefixes", "add", body["prefix"])
     return (jsonify({"message": "added"}), 201) if ok else (jsonify({"error": "exists"}), 409)
 
 @bp.route("/prefixes/<string:prefix>", methods=["DELETE"])
 def remove_pre(prefix):
-    ok = remove_prefix(prefix)
+    ok = _config_store.apply("prefixes", "remove", prefix)
     return ("", 204) if ok else (jsonify({"error": "not found"}), 404)
 
 # ----------------------------------------------------------
@@ -99,4 +146,19 @@ def remove_pre(prefix):
 # ----------------------------------------------------------
 @bp.route("/urls", methods=["GET"])
 def list_urls():
-    return jsonify(get_all_urls())
\ No newline at end of file
+    return jsonify(get_all_urls())
+
+# ----------------------------------------------------------
+# 5. Store status
+# ----------------------------------------------------------
+@bp.route("/store", methods=["GET"])
+def store_stats():
+    return jsonify(_config_store.stats())
+
+@bp.route("/store/flush", methods=["POST"])
+def store_flush():
+    try:
+        _config_store.flush()
+        return jsonify({"message": "flushed", **_config_store.stats()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
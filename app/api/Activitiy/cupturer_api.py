@@ -3,53 +3,150 @@ server/app/api/capturer_bp.py
 REST wrapper for core.ImageCapturer
 """
 import sys
+import logging
+import threading
+from datetime import datetime, timedelta
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parents[4] / "core" / "layers"))
 
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 # from ImageCapturer import ImageCapturer
-from app.api.Activitiy.tracker_api import _tracker      # reuse tracker instance
+from app.api.Activitiy.tracker_api import _tracker, database_url, on_tracker      # reuse tracker instance
+from app.core.config import Config
+from app.services.Capture.catalog import THUMBNAIL_SIZES, ScreenshotCatalog
+from app.services.Capture.delivery import send_image
+from app.services.Capture.pipeline import ENCODE_PRESETS, ScreenshotPipeline
+from app.services.Capture.zip_stream import folder_members, iter_zip
 
 from app.api.Activitiy import cupturer_bp
 bp = cupturer_bp
 
 _capturer = _tracker.capturer        # already configured instance
 
+# Every saved file gets a catalog row; history/storage/cleanup query the index.
+# Files the pipeline did not save (Core's own capture loop) are reconciled
+# into it at startup, on /start and /stop, and before a cleanup; only the
+# first reconcile scans the folder, later ones the day folders changed since.
+_catalog = ScreenshotCatalog(database_url, _capturer.base_folder,
+                             cache_bytes=Config.SCREENSHOT_THUMB_CACHE_MB * 1024 * 1024)
+
+def _reconcile_catalog():
+    try:
+        _catalog.reconcile()
+    except Exception as e:
+        logging.error(f"Error indexing existing screenshots: {e}")
+
+def _reconcile_in_background():
+    threading.Thread(target=_reconcile_catalog, daemon=True).start()
+
+_reconcile_in_background()
+
+def _capture_context():
+    """App and session the frame belongs to, taken at capture time."""
+    window = _tracker.get_current_window()
+    session = getattr(_tracker.history, "current_session", None)
+    return {
+        "app": getattr(window, "app", None),
+        "session_id": getattr(session, "session_id", None),
+    }
+
+# Periodic captures go through the pipeline (dedup + background encode);
+# the capturer is only used to grab frames.
+_pipeline = ScreenshotPipeline(
+    _capturer.capture_active_window,
+    _capturer.base_folder,
+    interval=_capturer.interval or Config.SCREENSHOT_INTERVAL,
+    preset=Config.SCREENSHOT_PRESET,
+    threshold=Config.SCREENSHOT_DEDUP_THRESHOLD,
+    on_saved=_catalog.add,
+    context=_capture_context,
+)
+
+def _start_pipeline():
+    if _capturer.is_capturing:
+        _capturer.stop()             # never run both capture loops
+    _pipeline.start()
+    _reconcile_in_background()
+
+def _stop_pipeline():
+    _pipeline.stop()
+    if _capturer.is_capturing:
+        _capturer.stop()
+    _reconcile_in_background()
+
+# The tracker starts Core's own capture loop with it; the pipeline replaces it
+on_tracker("started", _start_pipeline)
+on_tracker("stopped", _stop_pipeline)
+if _tracker.is_tracking:
+    _start_pipeline()
+
 # ------------------------------------------------------------------
 # Control capture
 # ------------------------------------------------------------------
 @bp.route("/start", methods=["POST"])
 def start():
-    _capturer.start()
+    _start_pipeline()
     return jsonify({"message": "Image capturing started"})
 
 @bp.route("/stop", methods=["POST"])
 def stop():
-    _capturer.stop()
+    _stop_pipeline()
     return jsonify({"message": "Image capturing stopped"})
 
 @bp.route("/status", methods=["GET"])
 def status():
+    latest = _pipeline.recent[-1]["timestamp"] if _pipeline.recent else _capturer.capture_time
     return jsonify({
-        "is_capturing": _capturer.is_capturing,
-        "interval_sec": _capturer.interval,
-        "latest_time": _capturer.capture_time
+        "is_capturing": _pipeline.is_running or _capturer.is_capturing,
+        "interval_sec": _pipeline.interval,
+        "latest_time": latest,
+        "pipeline": _pipeline.stats(),
     })
 
+@bp.route("/settings", methods=["POST"])
+def settings():
+    """Body: {"preset": "balanced", "dedup_threshold": 2}"""
+    body = request.get_json(silent=True) or {}
+    preset = body.get("preset", _pipeline.preset)
+    if preset not in ENCODE_PRESETS:
+        return jsonify({"error": f"preset must be one of {sorted(ENCODE_PRESETS)}"}), 400
+    try:
+        threshold = int(body.get("dedup_threshold", _pipeline.threshold))
+    except (TypeError, ValueError):
+        return jsonify({"error": "dedup_threshold must be an integer"}), 400
+    if threshold < 0:
+        return jsonify({"error": "dedup_threshold must not be negative"}), 400
+    _pipeline.preset = preset
+    _pipeline.threshold = threshold
+    return jsonify({"preset": _pipeline.preset, "dedup_threshold": _pipeline.threshold})
+
 # ------------------------------------------------------------------
 # History & cleanup
 # ------------------------------------------------------------------
+def _time_arg(name):
+    value = request.args.get(name)
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() if value else None
+
 @bp.route("/history", methods=["GET"])
 def history():
     """
-    Return in-memory history (timestamps + filenames).
-    For full file download use /download.
+    Screenshots from the catalog, oldest first.
+    ?from=&to= (ISO timestamps), ?app=, ?session_id=, ?limit=, ?order=desc
+    `path` is relative to the screenshot folder, for /download and /thumbnail.
     """
-    with _capturer.lock:
-        return jsonify([
-            {"timestamp": t, "filepath": fp}
-            for t, _, fp in _capturer.image_history
-        ])
+    try:
+        start, end = _time_arg("from"), _time_arg("to")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        entries = _catalog.query(start, end, request.args.get("app"), request.args.get("session_id"),
+                                 request.args.get("limit", type=int),
+                                 newest_first=request.args.get("order") == "desc")
+        for entry in entries:
+            entry["filepath"] = str(_catalog.base_folder / entry["path"])
+        return jsonify(entries)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 @bp.route("/clear-memory", methods=["POST"])
 def clear_memory():
@@ -58,30 +155,108 @@ def clear_memory():
 
 @bp.route("/clean-storage", methods=["POST"])
 def clean_storage():
+    """
+    Body: {"days_old": 7} or {"specific_month": "2024-05"} or {"specific_day": "2024-05-02"}
+    Deletes by catalog range (ts index), after indexing the files saved
+    outside the pipeline since the last reconcile so those are deleted too
+    (never a walk of the whole folder: before the startup scan has run,
+    the cleanup covers what is indexed).
+    """
     body = request.get_json(silent=True) or {}
     days_old = body.get("days_old", _capturer.auto_cleanup_days)
     specific_month = body.get("specific_month")
     specific_day   = body.get("specific_day")
-    _capturer.clean_storage(days_old, specific_month, specific_day)
-    return jsonify({"message": "storage cleaned"})
+    try:
+        if specific_day:
+            start = datetime.strptime(specific_day, "%Y-%m-%d")
+            end = start + timedelta(days=1)
+        elif specific_month:
+            start = datetime.strptime(specific_month, "%Y-%m")
+            end = (start + timedelta(days=32)).replace(day=1)
+        else:
+            start, end = None, datetime.now() - timedelta(days=int(days_old))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        _catalog.reconcile(full_scan=False)
+        result = _catalog.delete_range(start.timestamp() if start else None, end.timestamp())
+        return jsonify({"message": "storage cleaned", **result})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 # ------------------------------------------------------------------
 # File download
 # ------------------------------------------------------------------
+def _send_image(filename, variant=None, as_attachment=False):
+    """
+    Conditional send: strong ETag, If-None-Match -> 304, Range -> 206.
+    Saved captures never change, so they are cached as immutable.
+    """
+    base = Path(_capturer.base_folder).resolve()
+    filepath = (base / filename).resolve()
+    if not filepath.is_relative_to(base):
+        return jsonify({"error": "invalid path"}), 400
+    if not filepath.is_file():
+        return jsonify({"error": "file not found"}), 404
+    data = _catalog.thumbnail(filename, variant) if variant else None
+    return send_image(filepath, data, as_attachment)
+
 @bp.route("/download/<path:filename>")
 def download(filename):
-    """Download a specific screenshot file by relative path."""
-    filepath = Path(_capturer.base_folder) / filename
-    if not filepath.exists():
-        return jsonify({"error": "file not found"}), 404
-    return send_file(filepath, as_attachment=True)
+    """Download a specific screenshot file by relative path; ?size=thumb|preview for a small variant."""
+    variant = request.args.get("size")
+    if variant and variant not in THUMBNAIL_SIZES:
+        return jsonify({"error": f"size must be one of {sorted(THUMBNAIL_SIZES)}"}), 400
+    try:
+        return _send_image(filename, variant, as_attachment=not variant)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/download", methods=["POST"])
+def download_many():
+    """
+    Streamed zip of many screenshots in one response.
+    Body: {"files": ["2024-05-02/101500_ab12.webp", ...]} or a catalog
+    range {"from": iso, "to": iso, "app": "..."}
+    """
+    body = request.get_json(silent=True) or {}
+    files = body.get("files")
+    if files is None:
+        try:
+            start = datetime.fromisoformat(body["from"]).timestamp() if body.get("from") else None
+            end = datetime.fromisoformat(body["to"]).timestamp() if body.get("to") else None
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        files = [e["path"] for e in _catalog.query(start, end, body.get("app"), limit=body.get("limit"))]
+    if not files:
+        return jsonify({"error": "no screenshots selected"}), 400
+
+    members = folder_members(_capturer.base_folder, files)
+    response = Response(stream_with_context(iter_zip(members)), mimetype="application/zip")
+    response.headers["Content-Disposition"] = (
+        f"attachment; filename=screenshots_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip")
+    return response
+
+@bp.route("/thumbnail/<path:filename>")
+def thumbnail(filename):
+    """Small variant of a screenshot (?size=thumb|preview), served from the LRU cache."""
+    variant = request.args.get("size", "thumb")
+    if variant not in THUMBNAIL_SIZES:
+        return jsonify({"error": f"size must be one of {sorted(THUMBNAIL_SIZES)}"}), 400
+    try:
+        return _send_image(filename, variant)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 # ------------------------------------------------------------------
 # Storage info
 # ------------------------------------------------------------------
 @bp.route("/storage-info", methods=["GET"])
 def storage_info():
-    return jsonify({"info": _capturer.get_storage_info()})
+    try:
+        return jsonify({"info": _catalog.storage_info()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 # ------------------------------------------------------------------
 # Capture image manually  
@@ -90,5 +265,9 @@ def storage_info():
 def set_interval():
     body = request.get_json(silent=True) or {}
     interval = body.get("interval", _capturer.interval)
+    try:
+        _pipeline.set_interval(interval)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     _capturer.set_interval(interval)
     return jsonify({"message": f"Capture interval set to {interval} seconds"})
\ No newline at end of file
@@ -11,6 +11,7 @@ from flask import Blueprint, request, jsonify
 from device_controller import DeviceController  # type: ignore
 import threading
 from app.api.Activitiy import device_controller_bp
+from app.core.events import event_bus
 
 bp = device_controller_bp 
 
@@ -39,15 +40,23 @@ def stop_timer():
     _controller.stop()
     return jsonify({"message": "Timer stopped"})
 
-@bp.route("/status", methods=["GET"])
-def status():
-    return jsonify({
+def _status_payload():
+    return {
         "is_timing": _controller.is_timing,
         "elapsed_seconds": _controller.elapsed(),
         "time_limit": _controller.time_limit,
         "action": _controller.action,
         "warning": _controller.is_warning
-    })
+    }
+
+@bp.route("/status", methods=["GET"])
+def status():
+    return jsonify(_status_payload())
+
+# Publish timer changes on /api/stream (topic "device")
+# (elapsed time alone does not count as a change)
+event_bus.register_source("device", _status_payload,
+                          key=lambda p: {k: v for k, v in p.items() if k != "elapsed_seconds"})
 
 # ------------------------------------------------------------------
 # History
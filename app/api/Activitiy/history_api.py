@@ -7,37 +7,176 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parents[4] / "Core"))
 
-from flask import Blueprint, request, jsonify
-from app.api.Activitiy.tracker_api import _tracker              # reuse same tracker instance
-from datetime import datetime
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from app.api.Activitiy.tracker_api import _tracker, _feed, database_url    # reuse same tracker instance
+from app.core.config import Config
+from app.core.database import engine_stats
+from app.services.History.backup import BackupManager
+from app.services.History.retention import RetentionManager, RetentionPolicy
+from app.services.History.archive import RawSampleArchive
+from app.services.History.rollups import RebuildRunning, RollupStore, period_bounds
+from app.services.History.sample_writer import SampleWriter
+from app.services.History.core_raw import CoreRawTable, core_engine_stats, core_session_factory
+from app.services.History.summaries import SummaryCache
+from app.services.History.session_store import SessionStore, session_summary, to_response
+from app.services.History.raw_buffer import RawHistoryBuffer, record_to_dict
+from app.services.History.raw_reader import HistoryRangeUnavailable, RawRecordReader, raw_record_to_dict
+from app.services.History.export import (
+    EXPORT_FORMATS, SAMPLE_COLUMNS, SESSION_COLUMNS, arrow_available, export_chunks, json_document_chunks,
+    session_row,
+)
+from app.services.History.streaming import STREAM_FORMATS, buffer_page, encode_cursor, parse_keyset, stream_records
+from app.api.Activitiy.config import DEFAULT_SESSION_TITLES, MAX_HISTORY_LIMIT, SESSION_BACKFILL_HOURS
+from datetime import datetime, timedelta
 from app.api.Activitiy import history_bp 
 import logging
+import threading
+from itertools import islice
 
 bp = history_bp
 
 _history = _tracker.history
 
+# Core's raw table is the one store of raw samples; with CORE_RAW_WRITE_BEHIND (the default)
+# Core's per-sample insert is taken out of its commit and batched by a write-behind queue
+_sample_writer = SampleWriter(database_url)
+_feed.on_flush(_sample_writer.flush)
+_core_raw = CoreRawTable(_sample_writer.engine, Config.CORE_RAW_TABLE)
+_core_sessions = core_session_factory(_history)
+if Config.CORE_RAW_WRITE_BEHIND:
+    _core_raw.divert_inserts(_core_sessions, _sample_writer)
+
+# Core's raw records older than its retention are compacted into monthly run-length archives
+_core_archive = RawSampleArchive(Config.CORE_RAW_ARCHIVE_DIR, max_gap=Config.RAW_ARCHIVE_MAX_GAP,
+                                 interval=getattr(_tracker, "interval", None) or 1)
+
+_raw_reader = RawRecordReader(_core_raw, _core_archive, _history)
+
+# Pre-aggregated hour/day/week/month buckets behind /context
+_rollups = RollupStore(database_url, max_gap_seconds=getattr(_tracker, "session_gap_seconds", 30),
+                       core=_core_raw, core_archive=_core_archive, flush_samples=_sample_writer.flush)
+_feed.on_sample(_rollups.add_sample)
+_feed.on_session_closed(_rollups.on_session_closed)
+_feed.on_flush(_rollups.flush)
+
+def _backfill_rollups():
+    try:
+        _rollups.ensure_backfilled()
+    except Exception as e:
+        logging.error(f"Error backfilling rollups: {e}")
+
+threading.Thread(target=_backfill_rollups, daemon=True).start()
+
+# Core's period summaries and usage, memoised (same payloads as before): finished
+# periods for the day, the current one for SUMMARY_LIVE_TTL seconds or until a session closes
+_summaries = SummaryCache(_history, live_ttl=Config.SUMMARY_LIVE_TTL)
+_feed.on_session_closed(_summaries.on_session_closed)
+
+# Online backups of the running database (SQLite backup API, background job)
+_backups = BackupManager(
+    database_url, Config.BACKUP_DIR,
+    retention_days=Config.BACKUP_RETENTION_DAYS,
+    pages_per_step=Config.BACKUP_PAGES_PER_STEP,
+    step_sleep=Config.BACKUP_STEP_SLEEP,
+    compression=Config.BACKUP_COMPRESSION,
+)
+
+# Batched retention cleanup of the server-side tables and Core's raw table, one policy per table;
+# /database/cleanup runs only Core's by default, the schedule (daily by default) the server's own
+_retention = RetentionManager(database_url, [p for p in (
+    _core_raw.retention_policy(Config.RETENTION_CORE_RAW_DAYS, archive=_core_archive.archive_rows),
+    RetentionPolicy("sessions", "session_index", "start_time", Config.RETENTION_SESSIONS_DAYS,
+                    key="session_id",
+                    children=(("session_titles", "session_id"), ("session_documents", "session_id"),
+                              ("session_status_log", "session_id"))),
+    RetentionPolicy("hourly_rollups", "rollup_buckets", "bucket_start", Config.RETENTION_HOURLY_ROLLUPS_DAYS,
+                    cutoff=lambda dt: dt.isoformat(), where="granularity = 'hour'"),
+    RetentionPolicy("url_events", "url_events", "ts", Config.RETENTION_URL_EVENTS_DAYS),
+) if p is not None], batch_size=Config.RETENTION_BATCH_SIZE,
+   migrate_vacuum=Config.RETENTION_MIGRATE_AUTO_VACUUM)
+_retention.schedule(Config.RETENTION_INTERVAL_HOURS, names=[n for n in _retention.policies if n != "core_raw"])
+
+# Closed sessions in an indexed table; titles / status changes in side tables
+_sessions = SessionStore(database_url)
+_feed.on_session_closed(_sessions.add)
+
+def _backfill_sessions():
+    try:
+        _sessions.backfill(_history, SESSION_BACKFILL_HOURS)
+    except Exception as e:
+        logging.error(f"Error backfilling session index: {e}")
+
+threading.Thread(target=_backfill_sessions, daemon=True).start()
+
+def _active_session(start=None, end=None, app_name=None, titles=DEFAULT_SESSION_TITLES):
+    """The still-open session (not in the index yet) if it falls in the range."""
+    current = getattr(_history, "current_session", None)
+    if current is None or (app_name and current.app_name != app_name):
+        return None
+    summary = session_summary(current)
+    if (start and summary["start_time"] < start.timestamp()) or (end and summary["start_time"] >= end.timestamp()):
+        return None
+    titles_seen = summary["_titles"][-titles:] if titles else summary["_titles"]
+    return to_response(summary["_document"], titles_seen if titles != 0 else [],
+                       request.args.get("status_changes", "1") != "0")
+
 # ------------------------------------------------------------------
 # Raw history (now with database support)
 # ------------------------------------------------------------------
 @bp.route("/raw", methods=["GET"])
 def raw_history():
-    """Get raw window records from memory cache or database."""
+    """
+    Get raw window records from memory cache or database.
+    Keyset pagination with ?after=<iso timestamp> or ?cursor=<X-Next-Cursor>;
+    ?format=json (array) or ndjson. The body is streamed in chunks.
+    source=database reads the archive of WindowHistory's table (one record
+    per run-length span), then that table, each by time range; when the
+    table is not known, WindowHistory.get_raw_history_from_db answers.
+    Timestamps are encoded like jsonify encoded Core's records, whichever
+    tier a record comes from.
+    ?source=archive returns only the archive's spans (start, end, duration,
+    samples), filtered by ?start=&end= (ISO) and ?app=.
+    """
     limit = request.args.get("limit", type=int)
-    source = request.args.get("source", default="cache")  # "cache" or "database"
+    source = request.args.get("source", default="cache")  # "cache", "database" or "archive"
     app_name = request.args.get("app")
+    fmt = request.args.get("format", default="json")
+    if fmt not in STREAM_FORMATS:
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 400
     
     try:
+        after, after_seq = parse_keyset(request.args)
+        start = datetime.fromisoformat(request.args["start"]) if request.args.get("start") else None
+        end = datetime.fromisoformat(request.args["end"]) if request.args.get("end") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if after is not None and not limit:
+        limit = MAX_HISTORY_LIMIT
+    
+    try:
+        if source == "archive":
+            spans = _core_archive.iter_spans(start, end, app_name)
+            return stream_records(islice(spans, limit) if limit else spans, fmt, dict)
         if source == "database":
-            # Get directly from database
-            records = _history.get_raw_history_from_db(limit, app_name)
+            # the archive, then WindowHistory's table through a server-side cursor
+            try:
+                records, key = _raw_reader.page(limit, app_name, after, after_seq)
+            except HistoryRangeUnavailable as e:
+                return jsonify({"error": str(e)}), 400
+            cursor = encode_cursor(*key) if key else None
+            serialize = raw_record_to_dict
+        elif isinstance(_history.raw_history, RawHistoryBuffer):
+            # Ring buffer: O(limit) tail, per-app index for app filter
+            records, cursor = buffer_page(_history.raw_history, limit, app_name, after, after_seq)
+            serialize = record_to_dict
         else:
-            # Get from memory cache (existing behavior)
             records = _history.raw_history[-limit:] if limit else _history.raw_history
             if app_name:
                 records = [r for r in records if r.app == app_name]
+            cursor, serialize = None, record_to_dict
         
-        return jsonify([r.__dict__ for r in records])
+        headers = {"X-Next-Cursor": cursor} if cursor else None
+        return stream_records(records, fmt, serialize, headers=headers)
     except Exception as e:
         logging.error(f"Error getting raw history: {e}")
         return jsonify({"error": str(e)}), 500
@@ -53,6 +192,8 @@ def sessions():
     offset = request.args.get("offset", default=0, type=int)
     
     try:
+        if _sessions.is_ready():
+            return jsonify(_indexed_sessions(hours, period, offset))
         if period:
             sess = _history.get_sessions_by_period(period, offset)
         elif hours:
@@ -82,6 +223,26 @@ def sessions():
         logging.error(f"Error getting sessions: {e}")
         return jsonify({"error": str(e)}), 500
 
+def _indexed_sessions(hours, period, offset):
+    """
+    /sessions from the session index. Extra filters: ?app=, ?limit=,
+    ?titles=N (last N titles, default 10), ?status_changes=0 to skip them.
+    """
+    if period:
+        start, end = period_bounds(period, offset)
+    else:
+        start, end = datetime.now() - timedelta(hours=hours or 24), None
+    app_name = request.args.get("app")
+    titles = request.args.get("titles", default=DEFAULT_SESSION_TITLES, type=int)
+    result = _sessions.sessions(
+        start, end, app_name, request.args.get("limit", type=int),
+        titles=titles, status_changes=request.args.get("status_changes", "1") != "0",
+    )
+    active = _active_session(start, end, app_name, titles)
+    if active and not any(s["session_id"] == active["session_id"] for s in result):
+        result.append(active)
+    return result
+
 # ------------------------------------------------------------------
 # App statistics (enhanced with database support)
 # ------------------------------------------------------------------
@@ -125,7 +286,7 @@ def summary():
     offset = request.args.get("offset", default=0, type=int)
     
     try:
-        summary_data = _history.get_status_summary_by_period(period, offset)
+        summary_data = _summaries.period(period, offset)
         return jsonify(summary_data)
     except Exception as e:
         logging.error(f"Error getting summary: {e}")
@@ -137,7 +298,7 @@ def daily():
     days = request.args.get("days", default=7, type=int)
     
     try:
-        daily_data = _history.get_daily_summary_range(days)
+        daily_data = _summaries.range("day", days)
         return jsonify(daily_data)
     except Exception as e:
         logging.error(f"Error getting daily summaries: {e}")
@@ -149,7 +310,7 @@ def weekly():
     weeks = request.args.get("weeks", default=4, type=int)
     
     try:
-        weekly_data = _history.get_weekly_summary_range(weeks)
+        weekly_data = _summaries.range("week", weeks)
         return jsonify(weekly_data)
     except Exception as e:
         logging.error(f"Error getting weekly summaries: {e}")
@@ -161,7 +322,7 @@ def monthly():
     months = request.args.get("months", default=6, type=int)
     
     try:
-        monthly_data = _history.get_monthly_summary_range(months)
+        monthly_data = _summaries.range("month", months)
         return jsonify(monthly_data)
     except Exception as e:
         logging.error(f"Error getting monthly summaries: {e}")
@@ -179,7 +340,7 @@ def app_usage():
     
     try:
         if period:
-            usage_data = _history.get_app_usage_by_period(period, offset)
+            usage_data = _summaries.usage(period, offset)
         else:
             usage_data = _history.get_app_usage_summary(hours)
         
@@ -284,7 +445,10 @@ def app_context_breakdown(app_name):
     hours = request.args.get("hours", default=24, type=int)
     
     try:
-        context_data = _history.get_context_breakdown(app_name, hours)
+        if _rollups.is_ready():
+            context_data = _rollups.context_breakdown(app_name, hours)
+        else:
+            context_data = _history.get_context_breakdown(app_name, hours)
         
         # Convert to hours and calculate percentages
         total_time = sum(context_data.values())
@@ -316,6 +480,10 @@ def database_info():
     """Get database information."""
     try:
         db_info = _history.get_database_info()
+        db_info["write_behind"] = {**_sample_writer.stats(), "core": _core_raw.stats()}
+        db_info["engines"] = engine_stats()
+        # Core's tracker keeps its own engine: the writer lock and counters above do not cover its commits
+        db_info["core_engine"] = core_engine_stats(_core_sessions, _sample_writer.engine)
         return jsonify(db_info)
     except Exception as e:
         logging.error(f"Error getting database info: {e}")
@@ -326,45 +494,128 @@ def sync_database():
     """Sync in-memory cache with database."""
     try:
         _history.sync_cache_with_database()
+        _feed.install()  # the sync may rebind raw_history to a plain list
+        _summaries.invalidate()
         return jsonify({"message": "Cache synced with database successfully"})
     except Exception as e:
         logging.error(f"Error syncing cache with database: {e}")
         return jsonify({"error": str(e)}), 500
 
+@bp.route("/database/cleanup", methods=["POST"])
+def cleanup_database():
+    """
+    Start a cleanup in the background: Core's raw table in batches (when it
+    is known), then Core's cleanup_old_data(days) for the rest of Core's data
+    (days defaults to 30 as before; it is still one DELETE per table inside
+    Core), then an incremental vacuum.
+    Body (optional): {"days": 30} applies to Core's data and to the policies
+    named in {"tables": ["core_raw", "url_events", ...]}; the server's own
+    tables are only cleaned when they are named here or by the schedule
+    (RETENTION_INTERVAL_HOURS, daily by default), each with its own retention there.
+    Returns 202 with the job; poll GET /database/cleanup/<job_id>.
+    """
+    body = request.get_json(silent=True, force=True) or {}
+    try:
+        days = body.get("days")
+        core_days = int(days) if days is not None else 30
+        tables = body.get("tables")
+        if tables is None:
+            tables = [name for name in ("core_raw",) if name in _retention.policies]
+        elif not isinstance(tables, list):
+            raise ValueError("tables must be a list of retention policy names")
+
+        def core_cleanup():
+            _history.cleanup_old_data(core_days)
+            _feed.install()  # Core may rebind raw_history while it cleans up
+            _summaries.invalidate()
+
+        job = _retention.start(int(days) if days is not None else None, tables,
+                               steps=[("core", core_cleanup)])
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error starting cleanup: {e}")
+        return jsonify({"error": str(e)}), 500
+    return jsonify({**job, "status_url": f"{bp.url_prefix or ''}/database/cleanup/{job['job_id']}"}), 202
+
+@bp.route("/database/cleanup/<job_id>", methods=["GET"])
+def cleanup_status(job_id):
+    job = _retention.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown cleanup job"}), 404
+    return jsonify(job)
+
+@bp.route("/database/archive", methods=["GET"])
+def archive_info():
+    """Cold-tier archive of Core's raw table: months, spans vs samples, bytes on disk."""
+    try:
+        return jsonify(_core_archive.stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/database/retention", methods=["GET"])
+def retention_status():
+    """Retention policies, free pages and the latest cleanup jobs."""
+    try:
+        return jsonify(_retention.status())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @bp.route("/database/backup", methods=["POST"])
 def create_backup():
-    """Create a database backup."""
+    """
+    Start an online backup of the running database in the background.
+    Body (optional): {"compression": "gzip" | "zstd" | "none"}
+    Returns 202 with the job; poll GET /backup/<job_id> for progress.
+    """
+    body = request.get_json(silent=True) or {}
     try:
-        from database.backup import DatabaseBackup #type: ignore
-        from database.config import DatabaseConfig #type: ignore
-        
-        database_url = DatabaseConfig.get_database_url('production')
-        backup = DatabaseBackup(database_url)
-        backup_path = backup.create_backup()
-        
-        if backup_path:
-            return jsonify({
-                "message": "Backup created successfully",
-                "backup_path": backup_path
-            })
-        else:
-            return jsonify({"error": "Failed to create backup"}), 500
+        job = _backups.start(body.get("compression"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        logging.error(f"Error creating backup: {e}")
+        logging.error(f"Error starting backup: {e}")
         return jsonify({"error": str(e)}), 500
+    return jsonify({**job, "status_url": f"{bp.url_prefix or ''}/backup/{job['job_id']}"}), 202
 
-@bp.route("/database/cleanup", methods=["POST"])
-def cleanup_database():
-    """Remove old data from database."""
-    data = request.get_json(silent=True, force=True)
-    days = data.get("days", 30) if data else 30
-    
+@bp.route("/backup/<job_id>", methods=["GET"])
+def backup_status(job_id):
+    job = _backups.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown backup job"}), 404
+    return jsonify(job)
+
+@bp.route("/backups", methods=["GET"])
+def list_backups():
+    """Recent backup jobs and the backup files currently kept."""
+    try:
+        return jsonify({"jobs": _backups.jobs(), "files": _backups.list_backups(),
+                        "retention_days": _backups.retention_days})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@bp.route("/rollups/rebuild", methods=["POST"])
+def rebuild_rollups():
+    """
+    Rebuild the summary rollups from the raw history stored in the database,
+    in the background. Returns 202 with the job; poll GET /rollups/rebuild.
+    409 while a rebuild (including the startup backfill) is running.
+    """
     try:
-        _history.cleanup_old_data(days)
-        return jsonify({"message": f"Cleaned data older than {days} days"})
+        job = _rollups.start_rebuild()
+    except RebuildRunning as e:
+        return jsonify({"error": str(e), "job": _rollups.rebuild_job()}), 409
     except Exception as e:
-        logging.error(f"Error cleaning up database: {e}")
+        logging.error(f"Error rebuilding rollups: {e}")
         return jsonify({"error": str(e)}), 500
+    return jsonify({**job, "status_url": f"{bp.url_prefix or ''}/rollups/rebuild"}), 202
+
+@bp.route("/rollups/rebuild", methods=["GET"])
+def rebuild_rollups_status():
+    job = _rollups.rebuild_job()
+    if job is None:
+        return jsonify({"error": "no rollup rebuild has been started"}), 404
+    return jsonify(job)
 
 # ------------------------------------------------------------------
 # Overall meta stats (enhanced)
@@ -384,58 +635,83 @@ def meta():
 # ------------------------------------------------------------------
 @bp.route("/export", methods=["GET"])
 def export_data():
-    """Export data for backup or analysis."""
-    format_type = request.args.get("format", default="json")  # json, csv
+    """
+    Export data for backup or analysis, streamed row by row.
+    ?format=json|csv|ndjson|columnar|arrow  ?dataset=sessions|samples
+    ?period=day|week|month  ?offset=N  ?app=<app name>
+    """
+    format_type = request.args.get("format", default="json")
+    dataset = request.args.get("dataset", default="sessions")  # sessions, samples
     period = request.args.get("period", default="month")
     offset = request.args.get("offset", default=0, type=int)
+    app_name = request.args.get("app")
+    
+    if format_type != "json" and format_type not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported export format: {format_type}"}), 400
+    if dataset not in ("sessions", "samples"):
+        return jsonify({"error": f"Unknown dataset: {dataset}"}), 400
+    if format_type == "arrow" and not arrow_available():
+        return jsonify({"error": "Arrow export requires pyarrow"}), 501
+    if period not in ("day", "week", "month"):
+        return jsonify({"error": f"Unknown period: {period}"}), 400
+    start, end = period_bounds(period, offset)
     
     try:
+        if dataset == "samples":
+            # archived spans for the part of the period before Core's table starts
+            rows = _raw_reader.samples_between(start, end, app_name)
+            columns = SAMPLE_COLUMNS
+        elif _sessions.is_ready():
+            rows = _sessions.iter_export_rows(start, end, app_name)
+            columns = SESSION_COLUMNS
+        else:
+            sessions = _history.get_sessions_by_period(period, offset)
+            rows = (session_row(s) for s in sessions if not app_name or s.app_name == app_name)
+            columns = SESSION_COLUMNS
+        
+        # the first row is read here, so an early failure is still a 500
         if format_type == "json":
-            # Export comprehensive JSON data
-            export_data = {
-                "sessions": [
-                    {
-                        "session_id": s.session_id,
-                        "app_name": s.app_name,
-                        "start_time": s.start_time.isoformat(),
-                        "end_time": s.end_time.isoformat() if s.end_time else None,
-                        "total_duration": s.total_duration,
-                        "context_changes": s.context_changes,
-                        "titles_seen": s.titles_seen,
-                        "status_changes": s.status_changes,
-                        "window_count": s.window_count
-                    }
-                    for s in _history.get_sessions_by_period(period, offset)
-                ],
-                "statistics": {
-                    app_name: {
-                        "total_time": stat.total_time,
-                        "session_count": stat.session_count,
-                        "contexts": stat.contexts,
-                        "statuses": stat.statuses,
-                        "average_session_duration": stat.average_session_duration,
-                        "longest_session": stat.longest_session,
-                        "last_used": stat.last_used.isoformat() if stat.last_used else None
-                    }
-                    for app_name, stat in _history.get_app_statistics().items()
-                },
-                "export_info": {
-                    "period": period,
-                    "offset": offset,
-                    "exported_at": datetime.now().isoformat(),
-                    "format": format_type
-                }
-            }
-            
-            return jsonify(export_data)
+            return _json_export(rows, dataset, period, offset, format_type)
         
-        else:
-            return jsonify({"error": "CSV export not implemented yet"}), 501
+        mimetype, extension = EXPORT_FORMATS[format_type]
+        filename = f"focusai_{dataset}_{period}_{offset}.{extension}"
+        return Response(
+            stream_with_context(export_chunks(format_type, rows, columns)),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
             
     except Exception as e:
         logging.error(f"Error exporting data: {e}")
         return jsonify({"error": str(e)}), 500
 
+def _json_export(rows, dataset, period, offset, format_type):
+    """Same document as the former jsonify export (rows under the dataset name), written incrementally."""
+    export_info = {
+        "period": period,
+        "offset": offset,
+        "exported_at": datetime.now().isoformat(),
+        "format": format_type
+    }
+    
+    def statistics():
+        return {
+            app_name: {
+                "total_time": stat.total_time,
+                "session_count": stat.session_count,
+                "contexts": stat.contexts,
+                "statuses": stat.statuses,
+                "average_session_duration": stat.average_session_duration,
+                "longest_session": stat.longest_session,
+                "last_used": stat.last_used.isoformat() if stat.last_used else None
+            }
+            for app_name, stat in _history.get_app_statistics().items()
+        }
+    
+    dumps = lambda obj: current_app.json.dumps(obj, separators=(",", ":"))
+    return Response(stream_with_context(json_document_chunks(rows, dataset, export_info, statistics, dumps)),
+                    mimetype="application/json")
+
 # ------------------------------------------------------------------
 # Health check endpoints
 # ------------------------------------------------------------------
@@ -9,19 +9,82 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[4] / "Core"))
 from flask import jsonify, request, send_file
 from app.api.Activitiy import productivy_bp
 from productivity_tracker import ProductivityTracker , ProductivityCategory # type: ignore
+from app.Ai.ai_provider_api import _classify_queue
+from app.api.Activitiy.tracker_api import _tracker as _window_tracker, database_url
+from app.core.config import Config
+from app.core.events import event_bus
+from app.services.Productivity.ai_cache_store import AICacheStore, provider_identity
+from app.services.Productivity.classifier import ClassifierEngine
 
 _tracker = ProductivityTracker(ai_provider=None)
+# every ProductivityTracker whose detect_status reads an ai_cache config section
+_productivity_trackers = [_tracker] + [p for p in vars(_window_tracker).values()
+                                       if isinstance(p, ProductivityTracker)]
+_ai_cache = AICacheStore(database_url, max_entries=Config.AI_CACHE_MAX_ENTRIES, ttl_days=Config.AI_CACHE_TTL_DAYS,
+                         categories=ProductivityCategory.__args__)
+
+
+def _sync_config_cache(import_new=True):
+    """
+    Keep the legacy ai_cache section of the config (read by
+    ProductivityTracker.detect_status) in step with the AI cache store:
+    entries the store does not have yet are imported when `import_new`,
+    entries the store has dropped are removed from the in-memory config.
+    The store is what persists; the config file is not rewritten for it
+    (a stale section on disk is pruned again on the next start).
+    """
+    for tracker in _productivity_trackers:
+        section = tracker.config.get("ai_cache")
+        if not section:
+            continue
+        if import_new:
+            _ai_cache.import_entries({r: c for r, c in section.items() if r not in _ai_cache},
+                                     provider="legacy", strict=False)
+        kept = {r: c for r, c in section.items() if r in _ai_cache}
+        if len(kept) != len(section):
+            tracker.config["ai_cache"] = kept
+
+
+def _mirror_config_cache(resource, category):
+    """A new AI result reaches Core's own detect_status fallback too (in memory, like the pruning above)."""
+    for tracker in _productivity_trackers:
+        section = tracker.config.get("ai_cache")
+        if not isinstance(section, dict):
+            section = tracker.config["ai_cache"] = {}
+        section[resource] = category
+
+
+# first start with the store: take over the config entries; afterwards the store is authoritative
+_sync_config_cache(import_new=not len(_ai_cache))
+
+# compiled rules index behind /classify; rebuild() after every rules/overrides mutation below.
+# Core's trackers keep their own detect_status.
+_engine = ClassifierEngine(_tracker, ai_queue=_classify_queue, ai_cache=_ai_cache)
+
+
+def _store_ai_result(resource, category, provider=None):
+    """Write a background AI classification into the AI cache and tell SSE clients."""
+    if category not in ProductivityCategory.__args__:
+        return
+    name, model = provider_identity(provider)
+    _ai_cache.put(resource, category, provider=name, model=model)
+    _mirror_config_cache(resource, category)
+    event_bus.publish("classification", {"resource": resource, "category": category})
+
+
+_classify_queue.on_result(_store_ai_result)
 
 @productivy_bp.route("/classify/<resource>", methods=["GET"])
 def classify(resource: str):
-    return jsonify({"resource": resource, "category": _tracker.detect_status(resource)})
+    category, provisional = _engine.resolve(resource)
+    return jsonify({"resource": resource, "category": category, "provisional": provisional})
 
 @productivy_bp.route("/classify", methods=["POST"])
 def classify_bulk():
     data = request.get_json(silent=True)
     if not isinstance(data, list):
         return ("Send JSON list", 400)
-    return jsonify({r: _tracker.detect_status(r) for r in data})
+    return jsonify(_engine.classify_many(data))
 
 @productivy_bp.route("/rules", methods=["GET"])
 def rules():
@@ -35,6 +98,7 @@ def add_rule(category: str):
     if not body or "resource" not in body:
         return ('{"resource": "..."}', 400)
     _tracker.add_rule(body["resource"], category)
+    _engine.rebuild()
     return jsonify({"message": "added"}), 201
 
 @productivy_bp.route("/overrides", methods=["GET"])
@@ -49,21 +113,58 @@ def add_override():
     if body["category"] not in ProductivityCategory.__args__:
         return ("Invalid category", 400)
     _tracker.add_user_override(body["resource"], body["category"])
+    _engine.rebuild()
     return jsonify({"message": "added"}), 201
 
 @productivy_bp.route("/cache", methods=["GET"])
 def cache():
-    return jsonify(_tracker.config["ai_cache"])
+    return jsonify(_ai_cache.as_dict())
 
 @productivy_bp.route("/cache/<resource>", methods=["DELETE"])
 def clear_cache(resource: str):
-    _tracker.config["ai_cache"].pop(resource.lower(), None)
-    _tracker._save_config()
+    _ai_cache.delete(resource)
+    _sync_config_cache(import_new=False)
     return jsonify({"message": "removed"})
 
+@productivy_bp.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(_ai_cache.stats())
+
+@productivy_bp.route("/cache/export", methods=["GET"])
+def cache_export():
+    return jsonify(_ai_cache.export())
+
+@productivy_bp.route("/cache/import", methods=["POST"])
+def cache_import():
+    body = request.get_json(silent=True)
+    if not isinstance(body, (list, dict)):
+        return ("Send JSON list of entries or {resource: category}", 400)
+    try:
+        imported = _ai_cache.import_entries(body)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"message": "imported", "count": imported})
+
+@productivy_bp.route("/cache/invalidate", methods=["POST"])
+def cache_invalidate():
+    """
+    Body: {"provider": "openai", "model": "..."}  -> drop entries from that provider/model
+          {"keep_current": true}                  -> drop entries not from the active provider
+          {}                                      -> drop everything
+    """
+    body = request.get_json(silent=True) or {}
+    if body.get("keep_current"):
+        removed = _ai_cache.invalidate(keep=provider_identity(_classify_queue.get_provider()))
+    else:
+        removed = _ai_cache.invalidate(provider=body.get("provider"), model=body.get("model"))
+    _sync_config_cache(import_new=False)
+    return jsonify({"message": "invalidated", "removed": removed})
+
 @productivy_bp.route("/stats", methods=["GET"])
 def stats():
-    return jsonify(_tracker.get_stats())
+    return jsonify({**_tracker.get_stats(), "classifier_version": _engine.version})
 
 @productivy_bp.route("/export", methods=["GET"])
 def export():
@@ -86,6 +187,8 @@ def import_rules():
     f.save(tmp)
     try:
         _tracker.import_rules(tmp)
+        _sync_config_cache()
+        _engine.rebuild()
     finally:
         os.remove(tmp)
     return jsonify({"message": "imported"}), 200
\ No newline at end of file
@@ -11,16 +11,53 @@ from flask import jsonify, request, send_file
 from app.api.Activitiy import tracker_bp                    # already created in __init__.py
 from tracker import WindowTracker                 # type: ignore
 from database.config import DatabaseConfig # type: ignore
+from app.services.History.history_feed import HistoryFeed
+from app.services.History.raw_buffer import RawHistoryBuffer, record_to_dict
+from app.services.History.streaming import STREAM_FORMATS, buffer_page, parse_keyset, stream_records
+from app.services.Capture.pipeline import encode_image
+from app.api.Activitiy.config import RAW_HISTORY_CAPACITY, MAX_HISTORY_LIMIT
+from app.core.cache import response_cache
+from app.core.events import event_bus
+import logging
 import threading
+from io import BytesIO
 # Initialize database configuration based on environment
 environment = os.getenv('FLASK_ENV', 'development')
 database_url = DatabaseConfig.get_database_url(environment)
 
 _tracker = WindowTracker(interval=1, session_gap_seconds=30 , database_url=database_url)
 
+# Server-side subscribers (rollups, ...) listen to the tracker history through this feed
+_feed = HistoryFeed(_tracker.history, capacity=RAW_HISTORY_CAPACITY)
+_feed.install()
+
+# Live stream: window changes come from the feed, tracker state is polled by the bus
+def _publish_window(record):
+    window = record_to_dict(record)
+    window.pop("timestamp", None)
+    event_bus.publish_if_changed("window", window)
+
+_feed.on_sample(_publish_window)
+event_bus.register_source("tracker", lambda: {"is_tracking": _tracker.is_tracking, "interval": _tracker.interval})
+
+# Called after the tracker starts / stops (the screenshot pipeline takes over capturing)
+_on_tracker = {"started": [], "stopped": []}
+
+def on_tracker(event, callback):
+    _on_tracker[event].append(callback)
+
+def _notify_tracker(event):
+    for callback in _on_tracker[event]:
+        try:
+            callback()
+        except Exception as e:
+            logging.error(f"Tracker {event} listener failed: {e}")
+
 def _ensure_tracker_started():
     if not _tracker.is_tracking:
         _tracker.start()
+        _feed.install()
+        _notify_tracker("started")
 
 # --------------------------------------------------------------
 # Attach routes to the existing blueprint
@@ -37,6 +74,8 @@ def start():
 @tracker_bp.route("/stop", methods=["POST"])
 def stop():
     _tracker.stop()
+    _feed.flush()
+    _notify_tracker("stopped")
     return jsonify({"message": "stopped"})
 
 @tracker_bp.route("/current", methods=["GET"])
@@ -48,36 +87,56 @@ def current():
 
 @tracker_bp.route("/history", methods=["GET"])
 def history():
+    """
+    Raw history, streamed. Supports ?limit=, ?app=, keyset paging with
+    ?after=<iso timestamp> / ?cursor=<X-Next-Cursor> and ?format=json|ndjson.
+    """
     _ensure_tracker_started()
-    hist = _tracker.history.get_raw_history()
-    return jsonify([h.__dict__ for h in hist])
+    limit = request.args.get("limit", type=int)
+    fmt = request.args.get("format", default="json")
+    if fmt not in STREAM_FORMATS:
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+    try:
+        after, after_seq = parse_keyset(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if after is not None and not limit:
+        limit = MAX_HISTORY_LIMIT
+
+    raw = _tracker.history.raw_history
+    if isinstance(raw, RawHistoryBuffer):
+        hist, cursor = buffer_page(raw, limit, request.args.get("app"), after, after_seq)
+    else:
+        hist, cursor = _tracker.history.get_raw_history(), None
+    return stream_records(hist, fmt, record_to_dict, headers={"X-Next-Cursor": cursor} if cursor else None)
 
 @tracker_bp.route("/sessions", methods=["GET"])
 def sessions():
     _ensure_tracker_started()
     sess = _tracker.history.get_sessions()
     for s in sess:
-        s["windows"] = [w.__dict__ for w in s["windows"]]
+        s["windows"] = [record_to_dict(w) for w in s["windows"]]
     return jsonify(sess)
 
 @tracker_bp.route("/screenshot", methods=["GET"])
 def screenshot():
     _ensure_tracker_started()
     raw = request.args.get("raw") == "1"
+    # PNG by default as before; ?preset=high|balanced|low and/or ?format=webp|jpeg|png
+    preset = request.args.get("preset", "lossless")
+    fmt = request.args.get("format")
     img = _tracker.capturer.capture_active_window()
     if img is None:
         return ("", 404)
+    try:
+        data, mimetype, ext, _ = encode_image(img, preset, fmt)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # encoded in memory, no temp file left behind
+    buf = BytesIO(data)
     if raw:
-        from io import BytesIO
-        buf = BytesIO()
-        img.save(buf, format="PNG")
-        buf.seek(0)
-        return send_file(buf, mimetype="image/png")
-    import tempfile, os
-    fd, tmp = tempfile.mkstemp(suffix=".png")
-    os.close(fd)
-    img.save(tmp, "PNG")
-    return send_file(tmp, as_attachment=True, download_name="screenshot.png")
+        return send_file(buf, mimetype=mimetype)
+    return send_file(buf, mimetype=mimetype, as_attachment=True, download_name=f"screenshot.{ext}")
 
 @tracker_bp.route("/interval", methods=["POST"])
 def set_interval():
@@ -98,6 +157,8 @@ def quick_restart():
     """
     try:
         _tracker.quick_restart()
+        _feed.install()
+        response_cache.invalidate()
         return jsonify({
             "message": "WindowTracker restarted successfully",
             "status": "success"
@@ -116,6 +177,7 @@ def reload_config():
     """
     try:
         _tracker.reload_config_files()
+        response_cache.invalidate()
         return jsonify({
             "message": "Configuration files reloaded successfully",
             "status": "success"
@@ -160,6 +222,8 @@ def restart_with_interval():
             
         # Perform restart
         _tracker.quick_restart()
+        _feed.install()
+        response_cache.invalidate()
         
         return jsonify({
             "message": "WindowTracker restarted with new settings",
@@ -212,6 +276,7 @@ def shutdown_tracker():
     """
     try:
         _tracker.shutdown()
+        _feed.flush()
         return jsonify({
             "message": "WindowTracker shutdown completed successfully",
             "status": "success"
@@ -283,6 +348,8 @@ def force_stop():
         if hasattr(_tracker, 'analytics') and _tracker.analytics:
             if hasattr(_tracker.analytics, 'save_analytics'):
                 _tracker.analytics.save_analytics()
+
+        _feed.flush()
         
         return jsonify({
             "message": "Tracking force stopped and data saved",
@@ -307,6 +374,7 @@ def shutdown_app():
     try:
         # First shutdown the tracker
         _tracker.shutdown()
+        _feed.flush()
         
         # Schedule Flask app shutdown
         def shutdown_server():
@@ -9,15 +9,18 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[4] / "Core"))
 from flask import jsonify, request, send_file
 from app.api.Activitiy import utils_bp
 import psutil, win32gui, win32process, win32con
-from config_manager import PROCESS_NAME_MAP # type: ignore
+from app.api.Activitiy.config_manager_api import _config_store
+
+def _process_map():
+    return _config_store.get("process_map")
 
 @utils_bp.route("/process-map", methods=["GET"])
 def process_map():
-    return jsonify(PROCESS_NAME_MAP)
+    return jsonify(_process_map())
 
 @utils_bp.route("/friendly-name/<exe>", methods=["GET"])
 def friendly_name(exe: str):
-    return jsonify({"exe": exe, "friendly": PROCESS_NAME_MAP.get(exe, exe)})
+    return jsonify({"exe": exe, "friendly": _process_map().get(exe, exe)})
 
 @utils_bp.route("/window-info", methods=["GET"])
 def window_info():
@@ -45,7 +48,7 @@ def process(pid: int):
         return jsonify({
             "pid": proc.pid, "name": proc.name(), "exe": proc.exe(),
             "cmdline": proc.cmdline(), "create_time": proc.create_time(),
-            "status": proc.status(), "friendly": PROCESS_NAME_MAP.get(proc.name(), proc.name())
+            "status": proc.status(), "friendly": _process_map().get(proc.name(), proc.name())
         })
     except psutil.NoSuchProcess:
         return ("", 404)
@@ -64,7 +67,7 @@ def enum_windows():
                     "hwnd": hwnd, "title": win32gui.GetWindowText(hwnd),
                     "class_name": win32gui.GetClassName(hwnd),
                     "pid": pid, "exe": exe,
-                    "friendly": PROCESS_NAME_MAP.get(exe, exe)
+                    "friendly": _process_map().get(exe, exe)
                 })
             except Exception:
                 pass
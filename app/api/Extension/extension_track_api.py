@@ -7,29 +7,66 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parents[4] / "Core"))
 
 import json
+import logging
 from datetime import datetime
 import os
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from extension_tracker import URLTracker         # type: ignore
  
 from app.api.Extension import extension_tracker_bp      # reuse the same tracker instance from tracker_api.py
+from app.api.Activitiy.tracker_api import database_url
+from app.core.config import Config
+from app.services.Extension.commands import CommandQueue, command_key
+from app.services.Extension.ingest import BodyTooLarge, TabDeduper, decode_batch, read_body, triage_batch
+from app.services.Extension.legacy_file import LegacyURLFile
+from app.services.Extension.url_store import URL_EXPORT_COLUMNS, URLEventStore, parse_time
+from app.services.History.export import csv_chunks
+from app.services.History.streaming import STREAM_FORMATS, stream_records
 
 bp = extension_tracker_bp
 
 # Initialize tracker
 tracker = URLTracker()
 
+# URL events live in an indexed table (one INSERT per event) instead of the JSON array file
+url_store = URLEventStore(database_url)
+url_store.import_legacy(tracker.data_file)
+# Core's data file (URLTracker.get_stats, the /stats contract) is still written, off the request path
+legacy_file = LegacyURLFile(tracker)
+_tab_dedupe = TabDeduper()
+
+# Server -> extension commands (polling / SSE), optionally journaled to disk.
+# A long-poll holds a worker thread for its whole wait, so ?wait= is capped
+# by EXTENSION_COMMAND_LONG_POLL_MAX (25 s, under common proxy timeouts;
+# 0 = disabled, plain polling).
+COMMAND_LONG_POLL_MAX = Config.EXTENSION_COMMAND_LONG_POLL_MAX
+COMMAND_HEARTBEAT_SECONDS = 15
+command_queue = CommandQueue(
+    journal_path=os.path.join(Config.STORAGE_FILE_JSON, "extension_commands.jsonl")
+    if Config.EXTENSION_COMMAND_JOURNAL else None
+)
+
 @bp.route('/ping', methods=['GET'])
 def ping():
     """Health check endpoint"""
-    return jsonify({'status': 'ok', 'message': 'URL Tracker Server is running'})
+    return jsonify({
+        'status': 'ok',
+        'message': 'URL Tracker Server is running',
+        # batching preferences for the extension
+        'batch': {
+            'endpoint': '/e-tracker/track-urls',
+            'preferred_size': Config.EXTENSION_BATCH_SIZE,
+            'max_size': Config.EXTENSION_MAX_BATCH_SIZE,
+            'flush_interval_seconds': Config.EXTENSION_FLUSH_INTERVAL,
+            'gzip': True,
+        },
+    })
 
 @bp.route('/track-url', methods=['POST'])
 def track_url():
     """Receive URL data from browser extension"""
     try:
         url_data = request.get_json()
-        print(f"Received URL data: {url_data}")
         if not url_data or 'url' not in url_data:
             return jsonify({'error': 'Invalid data'}), 400
         
@@ -37,55 +74,127 @@ def track_url():
         url_data['server_timestamp'] = datetime.now().isoformat()
         url_data['domain'] = tracker.extract_domain(url_data['url'])
         
-        # Save to both JSON and CSV
-        json_success = tracker.save_url(url_data)
-        # csv_success = tracker.save_to_csv(url_data)
-        
-        if json_success :
-            print(f"Tracked URL: {url_data['url']}")
-            return jsonify({
-                'status': 'success',
-                'message': 'URL tracked successfully',
-                'data': url_data
-            })
-        else:
-            return jsonify({'error': 'Failed to save data'}), 500
+        url_store.add(url_data)
+        legacy_file.add_many([url_data])
+        return jsonify({
+            'status': 'success',
+            'message': 'URL tracked successfully',
+            'data': url_data
+        })
             
     except Exception as e:
-        print(f"Error in track_url: {e}")
+        logging.error(f"Error in track_url: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/track-urls', methods=['POST'])
+def track_urls():
+    """
+    Batch ingest: JSON array (or {"events": [...]}) of url_data dicts, optionally
+    gzip-compressed (Content-Encoding: gzip). Consecutive identical URLs of the
+    same tab are skipped; the batch is written in one transaction.
+    Bodies over EXTENSION_MAX_BODY_BYTES (sent or decompressed) get 413.
+    Returns a status per item in request order.
+    """
+    try:
+        body = read_body(request.stream, request.content_length, Config.EXTENSION_MAX_BODY_BYTES)
+        events = decode_batch(body, request.headers.get('Content-Encoding'), Config.EXTENSION_MAX_BODY_BYTES)
+    except BodyTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if len(events) > Config.EXTENSION_MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch too large (max {Config.EXTENSION_MAX_BATCH_SIZE})'}), 413
+
+    accepted, results, last_url = triage_batch(events, _tab_dedupe, tracker.extract_domain,
+                                               datetime.now().isoformat())
+
+    try:
+        url_store.add_many(accepted)
+    except Exception as e:
+        logging.error(f"Error in track_urls: {e}")
         return jsonify({'error': str(e)}), 500
+    legacy_file.add_many(accepted)
+    # only remember tabs once the batch is stored, so a retried batch is not dropped
+    for tab, url in last_url.items():
+        _tab_dedupe.remember(tab, url)
+
+    return jsonify({
+        'status': 'success',
+        'stored': len(accepted),
+        'results': results,
+    })
 
 @bp.route('/stats', methods=['GET'])
 def get_stats():
-    """Get tracking statistics"""
-    return jsonify(tracker.get_stats())
+    """
+    Get tracking statistics.
+    Version 1 (default): URLTracker.get_stats(), unchanged keys, over Core's
+    data file (still written behind url_events; recomputed when it changes).
+    ?version=2: the url_events aggregate: total_urls, unique_domains,
+    first_visit, last_visit and top_domains ([{"domain", "visits"}], busiest first).
+    """
+    version = request.args.get('version', '1')
+    if version not in ('1', '2'):
+        return jsonify({'error': f'Unsupported stats version: {version}'}), 400
+    try:
+        return jsonify(url_store.stats() if version == '2' else legacy_file.get_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @bp.route('/urls', methods=['GET'])
 def get_urls():
-    """Get all tracked URLs"""
+    """
+    Get tracked URLs, optionally within ?start_date=&end_date= (ISO) and for ?domain=.
+    Streamed from the url_events index; ?format=ndjson gives one event per line.
+    """
+    fmt = request.args.get('format', 'json')
+    if fmt not in STREAM_FORMATS:
+        return jsonify({'error': f'Unsupported format: {fmt}'}), 400
     try:
-        with open(tracker.data_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Optional: Filter by date range
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
-        
-        if start_date or end_date:
-            filtered_data = []
-            for item in data:
-                item_date = datetime.fromisoformat(item['timestamp'].replace('Z', '+00:00'))
-                if start_date and item_date < datetime.fromisoformat(start_date):
-                    continue
-                if end_date and item_date > datetime.fromisoformat(end_date):
-                    continue
-                filtered_data.append(item)
-            data = filtered_data
-        
-        return jsonify({
-            'urls': data,
-            'count': len(data)
-        })
+        start = parse_time(start_date) if start_date else None
+        end = parse_time(end_date) if end_date else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        events = url_store.iter_events(start, end, request.args.get('domain'),
+                                       limit=request.args.get('limit', type=int))
+        return stream_records(events, fmt, envelope='urls')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _day_arg(name):
+    value = request.args.get(name)
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).date().isoformat() if value else None
+
+@bp.route('/domains', methods=['GET'])
+def get_domains():
+    """
+    Per-domain totals (visits, dwell_seconds, first/last seen) from the daily aggregate.
+    ?start_date=&end_date= (ISO dates), ?limit=, ?order=visits|dwell
+    """
+    try:
+        start_day, end_day = _day_arg('start_date'), _day_arg('end_date')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        domains = url_store.domains(start_day, end_day, request.args.get('limit', type=int),
+                                    request.args.get('order', 'visits'))
+        return jsonify({'domains': domains, 'count': len(domains)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/domains/<path:domain>/timeline', methods=['GET'])
+def get_domain_timeline(domain):
+    """One row per day for `domain`; ?start_date=&end_date= (ISO dates)"""
+    try:
+        start_day, end_day = _day_arg('start_date'), _day_arg('end_date')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        return jsonify({'domain': domain, 'days': url_store.timeline(domain, start_day, end_day)})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -96,20 +205,14 @@ def export_data():
     
     try:
         if export_format == 'csv':
-            with open(tracker.csv_file, 'r', encoding='utf-8') as f:
-                csv_data = f.read()
-            return csv_data, 200, {'Content-Type': 'text/csv'}
+            rows = csv_chunks(url_store.iter_events(), URL_EXPORT_COLUMNS)
+            return Response(stream_with_context(rows), mimetype='text/csv')
         else:
-            with open(tracker.data_file, 'r', encoding='utf-8') as f:
-                json_data = f.read()
-            return json_data, 200, {'Content-Type': 'application/json'}
+            return stream_records(url_store.iter_events())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-import requests
-import time
-
 def close_tabs_by_domain(domain: str):
     """
     Send command to browser extension to close tabs for a specific domain
@@ -120,32 +223,14 @@ def close_tabs_by_domain(domain: str):
         if '/' in clean_domain:
             clean_domain = clean_domain.split('/')[0]
         
-        print(f"Attempting to close tabs for domain: {clean_domain}")
-        
-        # Send command to extension via the server endpoint
-        response = requests.post("http://localhost:8000/extension-command", 
-                               json={
-                                   "action": "closeTabsByDomain",
-                                   "domain": clean_domain
-                               },
-                               timeout=10)
+        logging.info(f"Attempting to close tabs for domain: {clean_domain}")
         
-        if response.status_code == 200:
-            result = response.json()
-            print(f"Extension response: {result}")
-            return result
-        else:
-            print(f"Server responded with status {response.status_code}: {response.text}")
-            return {"success": False, "error": f"Server error: {response.status_code}"}
+        # Queued in-process; waiting extensions are woken immediately
+        command = command_queue.push({"action": "closeTabsByDomain", "domain": clean_domain})
+        return {'success': True, 'message': 'Command saved for extension', 'command': command}
             
-    except requests.exceptions.ConnectionError:
-        print("Could not connect to server. Make sure the Flask server is running on localhost:8000")
-        return {"success": False, "error": "Connection refused - server not running"}
-    except requests.exceptions.Timeout:
-        print("Request timed out")
-        return {"success": False, "error": "Request timeout"}
     except Exception as e:
-        print(f"Error closing tabs: {e}")
+        logging.error(f"Error closing tabs: {e}")
         return {"success": False, "error": str(e)}
 
 # Add this endpoint to your Flask server
@@ -161,87 +246,82 @@ def extension_command():
         if not command_data:
             return jsonify({'error': 'No command data provided'}), 400
         
-        print(f"Received extension command: {command_data}")
-        
-        # Save command for extension to poll
-        if save_command_for_extension(command_data):
-            return jsonify({
-                'success': True,
-                'message': 'Command saved for extension',
-                'command': command_data
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to save command'
-            }), 500
+        command = command_queue.push(command_data)
+        return jsonify({
+            'success': True,
+            'message': 'Command saved for extension',
+            'command': command
+        })
         
     except Exception as e:
-        print(f"Error in extension_command: {e}")
+        logging.error(f"Error in extension_command: {e}")
         return jsonify({'error': str(e)}), 500
 
-# Alternative approach: Save commands to a file for extension to poll
-def save_command_for_extension(command_data):
-    """Save command to a file that the extension can poll"""
-    import json
-    import os
-    
-    commands_file = 'config/server/extension_commands.json'
-    
-    try:
-        # Load existing commands
-        if os.path.exists(commands_file):
-            with open(commands_file, 'r') as f:
-                commands = json.load(f)
-        else:
-            commands = []
-        
-        # Add timestamp
-        command_data['timestamp'] = datetime.now().isoformat()
-        command_data['id'] = str(time.time())
-        
-        commands.append(command_data)
-        
-        # Keep only last 100 commands
-        if len(commands) > 100:
-            commands = commands[-100:]
-        
-        # Save back to file
-        with open(commands_file, 'w') as f:
-            json.dump(commands, f, indent=2)
-        
-        return True
-    except Exception as e:
-        print(f"Error saving command: {e}")
-        return False
+def _client_id():
+    return request.args.get('client') or request.headers.get('X-Extension-Client') or 'default'
 
 @bp.route('/get-commands', methods=['GET'])
 def get_commands():
-    """Get pending commands for the extension"""
+    """
+    Get pending commands for the extension (not yet acknowledged by this client).
+    ?wait=<seconds> long-polls until a command arrives (when enabled);
+    ?after=<id> overrides the ack position.
+    """
     try:
-        commands_file = 'config/server/extension_commands.json'
-        
-        if not os.path.exists(commands_file):
-            return jsonify({'commands': []})
-        
-        with open(commands_file, 'r') as f:
-            commands = json.load(f)
-        
+        wait = max(0.0, min(request.args.get('wait', default=0, type=float), COMMAND_LONG_POLL_MAX))
+        after = request.args.get('after')
+        after = command_key(after) if after else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        commands = command_queue.pending(_client_id(), after, timeout=wait)
         return jsonify({'commands': commands})
-        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/commands/ack', methods=['POST'])
+def ack_commands():
+    """Body: {"id": <last executed command id>}"""
+    body = request.get_json(silent=True) or {}
+    try:
+        acked = command_queue.ack(_client_id(), body.get('id'))
+        return jsonify({'success': True, 'acked': acked})
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
 @bp.route('/clear-commands', methods=['POST'])
 def clear_commands():
-    """Clear processed commands"""
+    """
+    Clear processed commands: acknowledges everything this client was handed,
+    so commands queued after its last read stay pending.
+    """
     try:
-        commands_file = 'config/server/extension_commands.json'
-        
-        if os.path.exists(commands_file):
-            os.remove(commands_file)
-        
-        return jsonify({'success': True, 'message': 'Commands cleared'})
-        
+        acked = command_queue.ack(_client_id())
+        return jsonify({'success': True, 'message': 'Commands cleared', 'acked': acked})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@bp.route('/commands/stream', methods=['GET'])
+def stream_commands():
+    """
+    SSE channel: one `command` event per command (id = command id), starting after
+    the client's last ack. Clients still acknowledge via /commands/ack.
+    """
+    commands = command_queue.iter_commands(_client_id(), heartbeat=COMMAND_HEARTBEAT_SECONDS)
+
+    def generate():
+        yield "retry: 3000\n\n"
+        for command in commands:
+            if command is None:
+                yield ": heartbeat\n\n"
+                continue
+            yield f"id: {command['id']}\nevent: command\ndata: {json.dumps(command, default=str)}\n\n"
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@bp.route('/commands/stats', methods=['GET'])
+def command_stats():
+    return jsonify(command_queue.stats())
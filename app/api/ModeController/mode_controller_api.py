@@ -17,6 +17,7 @@ from enums import ModeType, StandardSubMode  # type: ignore
 from app.api.Activitiy.tracker_api import _tracker
 from models import WindowInfo
 from app.api.ModeController import mode_controller_bp
+from app.core.events import event_bus
 
 # Blueprint --------------------------------------------------------------------
 bp = mode_controller_bp
@@ -26,17 +27,27 @@ _controller = _tracker.mode_controller
 # ------------------------------------------------------------------
 # 1) State & info
 # ------------------------------------------------------------------
-@bp.route("/status", methods=["GET"])
-def status():
+def _status_payload():
     mode, sub, focus = _controller.get_current_state()
     session = _controller.get_session_duration()
-    return jsonify({
+    return {
         "mode": mode.name,
         "submode": sub.name if sub else None,
         "focus_type": focus.name if focus else None,
         "is_active": _controller.is_active,
         "session_duration_seconds": session.total_seconds() if session else None
-    })
+    }
+
+
+@bp.route("/status", methods=["GET"])
+def status():
+    return jsonify(_status_payload())
+
+
+# Publish mode changes on /api/stream (topic "modes")
+# (the session timer alone does not count as a change)
+event_bus.register_source("modes", _status_payload,
+                          key=lambda p: {k: v for k, v in p.items() if k != "session_duration_seconds"})
 
 
 # ------------------------------------------------------------------
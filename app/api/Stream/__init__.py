@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+stream_bp = Blueprint('stream', __name__ , url_prefix="/api/stream")
+
+from . import stream_api
@@ -0,0 +1,49 @@
+"""
+server/app/api/stream_api.py
+Server-Sent Events stream fed by the in-process event bus.
+One producer per topic serves every connected dashboard.
+"""
+import json
+
+from flask import Response, request, jsonify
+from app.core.events import event_bus
+from app.api.Stream import stream_bp
+
+bp = stream_bp
+
+HEARTBEAT_SECONDS = 15
+
+def _format_event(event):
+    data = json.dumps(event.data, default=str)
+    return f"id: {event.id}\nevent: {event.topic}\ndata: {data}\n\n"
+
+@bp.route("", methods=["GET"])
+def stream():
+    """
+    GET /api/stream?topics=window,tracker,modes,device
+    Sends the current state of each topic on connect, then only changes.
+    """
+    topics = [t.strip() for t in request.args.get("topics", "").split(",") if t.strip()]
+    sub = event_bus.subscribe(topics or None)
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while not sub.closed:
+                event = sub.get(timeout=HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield _format_event(event)
+        finally:
+            event_bus.unsubscribe(sub)
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@bp.route("/stats", methods=["GET"])
+def stats():
+    """GET /api/stream/stats"""
+    return jsonify(event_bus.stats())
@@ -1,22 +1,64 @@
-from ...services.Widgets.system_metrics import get_cpu_usge as gcu , get_gpu_usage as ggu , get_ram_usge as gru 
+from flask import request
+from ...services.Widgets.system_metrics import MetricsSampler
+from ...core.config import Config
+from ...core.events import event_bus
 from . import widgets_bp 
 
 
+# Background sampler: requests read the latest snapshot instead of blocking for 1s
+sampler = MetricsSampler(
+    interval=Config.SYSTEM_STATS_INTERVAL,
+    history_seconds=Config.SYSTEM_STATS_HISTORY_SECONDS,
+    gpu_interval=Config.SYSTEM_STATS_GPU_INTERVAL,
+    on_sample=lambda snapshot: event_bus.publish("system_stats", _to_response(snapshot)),
+)
+sampler.start()
+
+
+def _to_response(snapshot):
+    return {
+        "CPU_Usage_Per": snapshot["cpu"], 
+        "CPU_Per_Core": snapshot["cpu_per_core"],
+        "RAM_Usage_Per": snapshot["ram_percent"],
+        "RAM_Usage": snapshot["ram_used_mb"] ,
+        "RAM_Total": snapshot["ram_total_mb"],
+        "GPU_Usage_Per": snapshot["gpu"],
+        "Disk_Read_Bps": snapshot["disk_read_bps"],
+        "Disk_Write_Bps": snapshot["disk_write_bps"],
+        "Net_Sent_Bps": snapshot["net_sent_bps"],
+        "Net_Recv_Bps": snapshot["net_recv_bps"],
+        "timestamp": snapshot["timestamp"]
+    }
+
+
+def _parse_window(value):
+    """'60s', '5m', '1h' or plain seconds -> seconds (ValueError unless finite and > 0)"""
+    units = {"s": 1, "m": 60, "h": 3600}
+    value = value.strip().lower()
+    if value and value[-1] in units:
+        seconds = float(value[:-1]) * units[value[-1]]
+    else:
+        seconds = float(value)
+    if not 0 < seconds < float("inf"):  # also rejects nan
+        raise ValueError(value)
+    return seconds
 
 
 #system_stats
 @widgets_bp.route("system_stats", methods=["GET"])
 def start_monitoring_loop():
-    # while True:
-    cpu = gcu()
-    gpu = ggu()
-    rpu , rsu , rst = gru()
-    
-    return {
-        "CPU_Usage_Per": cpu, 
-        "RAM_Usage_Per": rpu,
-        "RAM_Usage": rsu ,
-        "RAM_Total": rst,
-        "GPU_Usage_Per": gpu
-    }
-        
\ No newline at end of file
+    snapshot = sampler.latest()
+    if snapshot is None:
+        # Sampler has not ticked yet
+        snapshot = sampler.sample()
+    response = _to_response(snapshot)
+
+    window = request.args.get("window")
+    if window:
+        try:
+            seconds = _parse_window(window)
+        except ValueError:
+            return {"error": "window must be a positive duration like 60s, 5m or 1h"}, 400
+        response["history"] = [_to_response(s) for s in sampler.history(seconds)]
+
+    return response
@@ -1,9 +1,8 @@
-import requests
 import json
 import os
 from flask import request
 from . import widgets_bp 
-from ...services.Widgets.location_getter import get_lat_lon
+from ...services.Widgets.weather_service import OpenMeteoProvider, WeatherService
 
 # File to persist city data
 from ...core.config import Config
@@ -12,6 +11,10 @@ from pathlib import Path
 # File to persist city data
 STORAGE_FILE = Path(Config.STORAGE_FILE_JSON) / "city_data.json"
 
+# Geocode / forecast cache (swap the provider with _weather.set_provider in tests)
+_weather = WeatherService(OpenMeteoProvider(), STORAGE_FILE.parent)
+_location = None
+
 
 
 
@@ -22,13 +25,15 @@ def set_city():
         return {"error": "Missing city in request"}, 400
     
     city = data["city"]
-    lat, lon = get_lat_lon(city)
+    lat, lon = _weather.geocode(city)
 
     if lat is None or lon is None:
         return {"error": "Could not find location"}, 404
     
     # Save to file
     save_location_to_file(city, lat, lon)
+    # Warm the forecast cache so the next GET doesn't wait
+    _weather.prefetch(lat, lon)
 
     return {"message": f"Location saved for {city}"}, 200
 
@@ -44,17 +49,8 @@ def get_weather():
     longitude = stored_location["lon"]
     location_name = stored_location["city"]
 
-    url = (
-        f"https://api.open-meteo.com/v1/forecast"
-        f"?latitude={latitude}&longitude={longitude}"
-        f"&current=temperature_2m,weather_code,wind_speed_10m,relative_humidity_2m"
-        f"&timezone=auto"
-    )
-
     try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()
+        data = _weather.current_weather(latitude, longitude)
         current = data.get("current", {})
 
         weather_code = current.get("weather_code", -1)
@@ -74,19 +70,26 @@ def get_weather():
 
 # Handle Save/Load Json
 def save_location_to_file(city, lat, lon):
+    global _location
     # Ensure parent directories exist
     STORAGE_FILE.parent.mkdir(parents=True, exist_ok=True)
 
     with open(STORAGE_FILE, "w", encoding="utf-8") as f:
         json.dump({"city": city, "lat": lat, "lon": lon}, f)
+    _location = {"city": city, "lat": lat, "lon": lon}
 
 
 
 def load_location_from_file():
+    global _location
+    # Read once, then served from memory (save_location_to_file keeps it in sync)
+    if _location is not None:
+        return _location
     if not os.path.exists(STORAGE_FILE):
         return {"city": None, "lat": None, "lon": None}
     with open(STORAGE_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+        _location = json.load(f)
+    return _location
 
 
 #Handle Weather Code 
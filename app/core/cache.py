@@ -0,0 +1,122 @@
+"""
+In-process response cache shared by the API blueprints.
+Entries are keyed by endpoint + query args, expire after a TTL, are evicted
+LRU-first and can be invalidated by tag when tracker events change the data.
+Data that changes continuously (every tracker sample) is `touch`ed instead:
+an entry whose tag changed after it was stored is served for at most
+`max_stale` seconds, so polling stays cheap without serving a minute-old view.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from flask import Response, make_response, request
+
+
+class ResponseCache:
+    def __init__(self, maxsize=256, ttl=60, max_stale=5):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries = OrderedDict()  # key -> (expires_at, tags, (body, status, mimetype), stored_at)
+        self._changed = {}             # tag -> monotonic time of its last change
+        self._lock = threading.Lock()
+        self._day = date.today()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "stale": 0}
+
+    # ------------------------------------------------------------------
+    # Decorator
+    # ------------------------------------------------------------------
+    def cached(self, ttl=None, tags=("default",)):
+        """Cache successful responses of a Flask view."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = (request.endpoint, tuple(sorted(kwargs.items())),
+                       tuple(sorted(request.args.items(multi=True))))
+                entry = self._get(key)
+                if entry is not None:
+                    body, status, mimetype = entry
+                    return Response(body, status=status, mimetype=mimetype)
+
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self._put(key, tags, ttl or self.ttl,
+                              (response.get_data(), response.status_code, response.mimetype))
+                return response
+            return wrapper
+        return decorator
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    def _rollover(self):
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self._entries.clear()
+            self._counters["invalidations"] += 1
+
+    def _fresh(self, entry, now):
+        expires_at, tags, _, stored_at = entry
+        if expires_at < now:
+            return False
+        changed = max((self._changed.get(tag, 0) for tag in tags), default=0)
+        if changed > stored_at and now - stored_at >= self.max_stale:
+            self._counters["stale"] += 1
+            return False
+        return True
+
+    def _get(self, key):
+        with self._lock:
+            self._rollover()
+            entry = self._entries.get(key)
+            if entry is None or not self._fresh(entry, time.monotonic()):
+                if entry is not None:
+                    del self._entries[key]
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[2]
+
+    def _put(self, key, tags, ttl, value):
+        with self._lock:
+            now = time.monotonic()
+            self._entries[key] = (now + ttl, frozenset(tags), value, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, tag=None):
+        """Drop every entry carrying `tag` (everything when tag is None)."""
+        with self._lock:
+            if tag is None:
+                self._entries.clear()
+            else:
+                for key in [k for k, entry in self._entries.items() if tag in entry[1]]:
+                    del self._entries[key]
+            self._counters["invalidations"] += 1
+
+    def touch(self, tag):
+        """The data behind `tag` changed; its entries go stale after max_stale seconds."""
+        with self._lock:
+            self._changed[tag] = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_ratio": self._counters["hits"] / lookups if lookups else None,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "max_stale": self.max_stale,
+            }
+
+
+response_cache = ResponseCache()
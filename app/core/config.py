@@ -7,6 +7,11 @@ class Config:
     # Database
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-key-123')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///focusai.sql')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_MB = int(os.getenv('SQLITE_MMAP_MB', 256))
+    SQLITE_CACHE_MB = int(os.getenv('SQLITE_CACHE_MB', 64))
+    SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', 8))
+    SQLITE_MAINTENANCE_INTERVAL = int(os.getenv('SQLITE_MAINTENANCE_INTERVAL', 600))  # seconds, 0 = off
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
     # API Keys
@@ -17,6 +22,41 @@ class Config:
     DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
     SCREENSHOT_INTERVAL = int(os.getenv('SCREENSHOT_INTERVAL', 300))  # 5 minutes
     SCREENSHOT_RETENTION_DAYS = int(os.getenv('SCREENSHOT_RETENTION_DAYS', 7))
+    SCREENSHOT_PRESET = os.getenv('SCREENSHOT_PRESET', 'balanced')  # lossless / high / balanced / low
+    SCREENSHOT_DEDUP_THRESHOLD = int(os.getenv('SCREENSHOT_DEDUP_THRESHOLD', 2))  # changed blocks needed to keep a frame
+    SCREENSHOT_THUMB_CACHE_MB = int(os.getenv('SCREENSHOT_THUMB_CACHE_MB', 32))
+    SYSTEM_STATS_INTERVAL = float(os.getenv('SYSTEM_STATS_INTERVAL', 2))  # seconds
+    SYSTEM_STATS_HISTORY_SECONDS = int(os.getenv('SYSTEM_STATS_HISTORY_SECONDS', 600))
+    SYSTEM_STATS_GPU_INTERVAL = float(os.getenv('SYSTEM_STATS_GPU_INTERVAL', 10))
+    AI_CLASSIFY_WORKERS = int(os.getenv('AI_CLASSIFY_WORKERS', 2))
+    AI_CLASSIFY_BATCH_SIZE = int(os.getenv('AI_CLASSIFY_BATCH_SIZE', 10))
+    AI_CLASSIFY_CONCURRENCY = int(os.getenv('AI_CLASSIFY_CONCURRENCY', 2))  # per provider
+    AI_CLASSIFY_RATE_PER_MINUTE = int(os.getenv('AI_CLASSIFY_RATE_PER_MINUTE', 60))  # per provider
+    AI_CLASSIFY_MAX_PENDING = int(os.getenv('AI_CLASSIFY_MAX_PENDING', 1000))  # more are not queued
+    AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', 50000))
+    AI_CACHE_TTL_DAYS = int(os.getenv('AI_CACHE_TTL_DAYS', 90))  # 0 = never expire
+    CONFIG_FLUSH_DEBOUNCE = float(os.getenv('CONFIG_FLUSH_DEBOUNCE', 1.0))  # seconds
+    EXTENSION_BATCH_SIZE = int(os.getenv('EXTENSION_BATCH_SIZE', 50))  # preferred events per batch
+    EXTENSION_MAX_BATCH_SIZE = int(os.getenv('EXTENSION_MAX_BATCH_SIZE', 1000))
+    EXTENSION_FLUSH_INTERVAL = float(os.getenv('EXTENSION_FLUSH_INTERVAL', 10))  # seconds
+    EXTENSION_MAX_BODY_BYTES = int(os.getenv('EXTENSION_MAX_BODY_BYTES', 8 * 1024 * 1024))  # batch body, as sent and decompressed
+    EXTENSION_COMMAND_JOURNAL = os.getenv('EXTENSION_COMMAND_JOURNAL', 'False').lower() == 'true'
+    EXTENSION_COMMAND_LONG_POLL_MAX = float(os.getenv('EXTENSION_COMMAND_LONG_POLL_MAX', 25))  # seconds, 0 = off
+    BACKUP_RETENTION_DAYS = int(os.getenv('BACKUP_RETENTION_DAYS', 14))  # 0 = keep all
+    BACKUP_COMPRESSION = os.getenv('BACKUP_COMPRESSION', 'gzip')  # gzip / zstd / none
+    BACKUP_PAGES_PER_STEP = int(os.getenv('BACKUP_PAGES_PER_STEP', 256))
+    BACKUP_STEP_SLEEP = float(os.getenv('BACKUP_STEP_SLEEP', 0.02))  # seconds between backup steps
+    CORE_RAW_TABLE = os.getenv('CORE_RAW_TABLE')  # Core's raw record table; unset = detect it
+    CORE_RAW_WRITE_BEHIND = os.getenv('CORE_RAW_WRITE_BEHIND', 'True').lower() == 'true'  # batch Core's inserts
+    RAW_ARCHIVE_MAX_GAP = float(os.getenv('RAW_ARCHIVE_MAX_GAP', 5))  # seconds; a longer gap starts a new span
+    SUMMARY_LIVE_TTL = float(os.getenv('SUMMARY_LIVE_TTL', 30))  # seconds a current-period summary is reused
+    RETENTION_CORE_RAW_DAYS = int(os.getenv('RETENTION_CORE_RAW_DAYS', 30))  # Core's raw table, like cleanup_old_data
+    RETENTION_SESSIONS_DAYS = int(os.getenv('RETENTION_SESSIONS_DAYS', 365))
+    RETENTION_HOURLY_ROLLUPS_DAYS = int(os.getenv('RETENTION_HOURLY_ROLLUPS_DAYS', 90))
+    RETENTION_URL_EVENTS_DAYS = int(os.getenv('RETENTION_URL_EVENTS_DAYS', 90))
+    RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 2000))
+    RETENTION_INTERVAL_HOURS = float(os.getenv('RETENTION_INTERVAL_HOURS', 24))  # server-owned tables; 0 = manual only
+    RETENTION_MIGRATE_AUTO_VACUUM = os.getenv('RETENTION_MIGRATE_AUTO_VACUUM', 'True').lower() == 'true'  # one full VACUUM on older files
     
     # Security
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-change-this')
@@ -33,6 +73,8 @@ class Config:
     DATA_DIR = os.path.join(APP_DIR, 'FocusAI')
     SCREENSHOTS_DIR = os.path.join(DATA_DIR, 'screenshots')
     LOGS_DIR = os.path.join(DATA_DIR, 'logs')
+    BACKUP_DIR = os.path.join(DATA_DIR, 'backups')
+    CORE_RAW_ARCHIVE_DIR = os.path.join(DATA_DIR, 'archive', 'core_raw')
     STORAGE_FILE = os.path.join(APP_DIR, 'backend', 'instance')
     STORAGE_FILE_JSON = os.path.join(STORAGE_FILE, 'Jsons')
 
@@ -0,0 +1,223 @@
+"""
+In-memory, copy-on-write store for the runtime configuration sections
+(process map, categories, prefixes, ...).
+
+- readers get the current immutable snapshot without locking
+- a mutation copies only the touched section, applies the operation and
+  swaps the snapshot atomically (global + per-section version counters)
+- every accepted operation is appended to a write-ahead journal before the
+  caller gets an answer; a debounced flusher hands pending operations to the
+  section's persist function and truncates the journal (temp file + rename)
+- subscribers are called with (section, value, version) after each change
+  so derived indexes are rebuilt only when their section changed
+"""
+import copy
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+
+class ConfigSection:
+    """
+    `load()` returns the initial value, `ops` maps an operation name to
+    fn(value, *args) -> (ok, result) that mutates the (private) copy it is
+    given, `persist(op, args)` writes one accepted operation to the backing files.
+    An op returns (None, None) when the snapshot does not hold what it changes:
+    it is then written straight through persist, without journal, version
+    bump or notification, and the caller gets persist's answer.
+    """
+
+    def __init__(self, name, load, ops, persist=None):
+        self.name = name
+        self.load = load
+        self.ops = ops
+        self.persist = persist
+
+
+class ConfigStore:
+    def __init__(self, journal_path, debounce=1.0):
+        self.journal_path = Path(journal_path)
+        self.debounce = debounce
+        self.version = 0
+        self._sections = {}
+        self._snapshot = {}
+        self._versions = {}
+        self._pending = []
+        self._subscribers = []
+        self._write_lock = threading.RLock()
+        self._journal_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self._stats = {"flushes": 0, "flushed_ops": 0, "errors": 0, "last_error": None}
+
+    # ------------------------------------------------------------------
+    # Setup
+    # ------------------------------------------------------------------
+    def register(self, section):
+        value = section.load()
+        with self._write_lock:
+            self._sections[section.name] = section
+            self._snapshot = {**self._snapshot, section.name: value}
+            self._versions[section.name] = 0
+
+    def replay_journal(self):
+        """Re-apply operations that were accepted but never flushed (crash/kill)."""
+        try:
+            lines = self.journal_path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return 0
+        replayed = 0
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line
+            if entry.get("section") not in self._sections:
+                continue
+            # ops already present in the loaded files are rejected here and dropped
+            ok, _ = self._apply(entry["section"], entry["op"], entry["args"], journal=False)
+            if ok:
+                self._pending.append((entry["section"], entry["op"], entry["args"]))
+                replayed += 1
+        self._schedule_flush()
+        return replayed
+
+    def subscribe(self, callback, sections=None):
+        """callback(section, value, version); `sections` limits which changes are delivered."""
+        self._subscribers.append((callback, set(sections) if sections else None))
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def get(self, section):
+        """Current value of a section. Treat it as read-only, it is shared."""
+        return self._snapshot[section]
+
+    def snapshot(self):
+        return self._snapshot
+
+    def section_version(self, section):
+        return self._versions.get(section, 0)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def apply(self, section, op, *args):
+        """Run `op` on `section`; returns the op result (False/None when rejected)."""
+        ok, result = self._apply(section, op, list(args), journal=True)
+        if ok:
+            self._schedule_flush()
+        return result
+
+    def _apply(self, section, op, args, journal):
+        with self._write_lock:
+            value = copy.deepcopy(self._snapshot[section])
+            ok, result = self._sections[section].ops[op](value, *args)
+            if ok:
+                if journal:
+                    self._journal(section, op, args)
+                    self._pending.append((section, op, args))
+                self._snapshot = {**self._snapshot, section: value}
+                self.version += 1
+                self._versions[section] = self._versions.get(section, 0) + 1
+                version = self.version
+        if ok is None:  # nothing in the snapshot changes
+            return self._write_through(section, op, args) if journal else (False, None)
+        if not ok:
+            return False, result
+        self._notify(section, value, version)
+        return True, result
+
+    def _write_through(self, section, op, args):
+        persist = self._sections[section].persist
+        if persist is None:
+            return False, False
+        self.flush()  # earlier ops (e.g. the category's creation) reach the files first
+        with self._flush_lock:
+            try:
+                ok = bool(persist(op, args))
+            except Exception as e:
+                logging.error(f"Config write-through of {section}.{op} failed: {e}")
+                return False, False
+        return ok, ok
+
+    def _notify(self, section, value, version):
+        for callback, sections in list(self._subscribers):
+            if sections is None or section in sections:
+                try:
+                    callback(section, value, version)
+                except Exception as e:
+                    logging.error(f"Config subscriber failed for '{section}': {e}")
+
+    # ------------------------------------------------------------------
+    # Journal / flush
+    # ------------------------------------------------------------------
+    def _journal(self, section, op, args):
+        line = json.dumps({"section": section, "op": op, "args": args}) + "\n"
+        with self._journal_lock:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _schedule_flush(self):
+        with self._journal_lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.debounce, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Persist pending operations and truncate the journal."""
+        with self._flush_lock:
+            with self._write_lock:
+                with self._journal_lock:
+                    self._timer = None
+                pending, self._pending = self._pending, []
+
+            # slow file writes happen outside the write lock
+            failed = []
+            for index, (section, op, args) in enumerate(pending):
+                persist = self._sections[section].persist
+                if persist is None:
+                    continue
+                try:
+                    persist(op, args)
+                except Exception as e:
+                    logging.error(f"Config flush failed for {section}.{op}: {e}")
+                    self._stats["errors"] += 1
+                    self._stats["last_error"] = str(e)
+                    failed = pending[index:]
+                    break
+
+            with self._write_lock:
+                self._stats["flushes"] += 1
+                self._stats["flushed_ops"] += len(pending) - len(failed)
+                self._pending = failed + self._pending
+                self._rewrite_journal(self._pending)
+        if failed:
+            self._schedule_flush()
+
+    def _rewrite_journal(self, entries):
+        with self._journal_lock:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.journal_path.with_suffix(self.journal_path.suffix + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                for section, op, args in entries:
+                    f.write(json.dumps({"section": section, "op": op, "args": args}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.journal_path)
+
+    def stats(self):
+        return {
+            **self._stats,
+            "version": self.version,
+            "sections": dict(self._versions),
+            "pending_ops": len(self._pending),
+            "debounce": self.debounce,
+        }
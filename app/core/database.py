@@ -0,0 +1,206 @@
+"""
+Shared SQLAlchemy engines for the server-side stores.
+
+One engine per database URL, so every store shares the same pool. SQLite
+file databases get a tuned profile:
+- WAL journal, synchronous=NORMAL, busy timeout, mmap and page cache
+  pragmas applied to every new connection
+- writes are serialised by one in-process writer lock (WAL allows one
+  writer and many readers), so threads queue here instead of spinning on
+  SQLITE_BUSY; the wait is measured
+- a maintenance thread runs a passive WAL checkpoint and PRAGMA optimize
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import Config
+
+
+def _is_sqlite_file(url):
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+class SharedEngine:
+    """
+    Engine facade: `connect()` for readers, `begin()` for writers (serialised).
+    Anything else is forwarded to the SQLAlchemy engine.
+    """
+
+    def __init__(self, database_url):
+        self.engine = create_engine(database_url, **self._engine_options(database_url))
+        self.is_sqlite = _is_sqlite_file(self.engine.url)
+        self._write_lock = threading.RLock()
+        self._stats_lock = threading.Lock()  # counters are bumped from every request thread
+        self._stats = {
+            "writes": 0, "reads": 0, "contended_writes": 0, "busy_errors": 0,
+            "write_wait_ms_total": 0.0, "write_wait_ms_max": 0.0,
+            "checkpoints": 0, "last_checkpoint": None, "last_optimize": None,
+        }
+        if self.is_sqlite:
+            event.listen(self.engine, "connect", self._apply_pragmas)
+            with self.engine.connect() as conn:
+                mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+            logging.info(f"SQLite engine ready ({self.engine.url.database}, journal_mode={mode})")
+
+    @staticmethod
+    def _engine_options(database_url):
+        if not _is_sqlite_file(make_url(database_url)):
+            return {}
+        return {
+            "pool_size": Config.SQLITE_POOL_SIZE,
+            "max_overflow": Config.SQLITE_POOL_SIZE,
+            "pool_pre_ping": False,
+            "connect_args": {"timeout": Config.SQLITE_BUSY_TIMEOUT_MS / 1000, "check_same_thread": False},
+        }
+
+    @staticmethod
+    def _apply_pragmas(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        try:
+            # only takes effect on a new database file; RetentionManager converts an existing one once
+            cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={int(Config.SQLITE_BUSY_TIMEOUT_MS)}")
+            cursor.execute(f"PRAGMA mmap_size={int(Config.SQLITE_MMAP_MB) * 1024 * 1024}")
+            cursor.execute(f"PRAGMA cache_size=-{int(Config.SQLITE_CACHE_MB) * 1024}")  # negative = KiB
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        finally:
+            cursor.close()
+
+    # ------------------------------------------------------------------
+    # Connections
+    # ------------------------------------------------------------------
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def connect(self):
+        self._count("reads")
+        return self.engine.connect()
+
+    @contextmanager
+    def begin(self):
+        """Write transaction; waits for the single writer slot first."""
+        started = time.perf_counter()
+        if not self._write_lock.acquire(blocking=False):
+            self._count("contended_writes")
+            self._write_lock.acquire()
+        waited = (time.perf_counter() - started) * 1000
+        try:
+            with self._stats_lock:
+                self._stats["writes"] += 1
+                self._stats["write_wait_ms_total"] += waited
+                self._stats["write_wait_ms_max"] = max(self._stats["write_wait_ms_max"], waited)
+            with self.engine.begin() as conn:
+                yield conn
+        except OperationalError as e:
+            if "locked" in str(e) or "busy" in str(e):
+                self._count("busy_errors")  # another process held the database past busy_timeout
+            raise
+        finally:
+            self._write_lock.release()
+
+    @contextmanager
+    def autocommit(self):
+        """
+        Connection outside any transaction (VACUUM, incremental_vacuum, ...),
+        holding the writer slot like begin().
+        """
+        with self._write_lock:
+            self._count("writes")
+            with self.engine.connect() as conn:
+                yield conn.execution_options(isolation_level="AUTOCOMMIT")
+
+    def __getattr__(self, name):
+        if name == "engine":
+            raise AttributeError(name)
+        return getattr(self.engine, name)
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+    def checkpoint(self, mode="PASSIVE"):
+        """WAL checkpoint; returns (busy, wal_pages, checkpointed_pages)."""
+        if not self.is_sqlite:
+            return None
+        with self._write_lock, self.engine.connect() as conn:
+            result = tuple(conn.exec_driver_sql(f"PRAGMA wal_checkpoint({mode})").one())
+        with self._stats_lock:
+            self._stats["checkpoints"] += 1
+            self._stats["last_checkpoint"] = {"mode": mode, "busy": result[0], "wal_pages": result[1],
+                                              "checkpointed": result[2], "at": time.time()}
+        return result
+
+    def optimize(self):
+        if not self.is_sqlite:
+            return
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA optimize")
+        with self._stats_lock:
+            self._stats["last_optimize"] = time.time()
+
+    def maintain(self):
+        try:
+            self.checkpoint()
+            self.optimize()
+        except Exception as e:
+            logging.error(f"SQLite maintenance failed for {self.engine.url.database}: {e}")
+
+    def stats(self):
+        with self._stats_lock:
+            counters = dict(self._stats)
+        writes = counters["writes"] or 1
+        stats = {
+            **counters,
+            "url": self.engine.url.render_as_string(hide_password=True),
+            "avg_write_wait_ms": round(counters["write_wait_ms_total"] / writes, 3),
+            "pool": self.engine.pool.status(),
+        }
+        if self.is_sqlite:
+            with self.engine.connect() as conn:
+                stats["pragmas"] = {
+                    name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                    for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size")
+                }
+        return stats
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+_maintenance = None
+
+
+def get_engine(database_url):
+    """The shared engine for `database_url` (created on first use)."""
+    with _engines_lock:
+        engine = _engines.get(database_url)
+        if engine is None:
+            engine = _engines[database_url] = SharedEngine(database_url)
+            _start_maintenance()
+        return engine
+
+
+def _start_maintenance():
+    global _maintenance
+    if _maintenance is not None or not Config.SQLITE_MAINTENANCE_INTERVAL:
+        return
+
+    def run():
+        while True:
+            time.sleep(Config.SQLITE_MAINTENANCE_INTERVAL)
+            for engine in list(_engines.values()):
+                engine.maintain()
+
+    _maintenance = threading.Thread(target=run, name="sqlite-maintenance", daemon=True)
+    _maintenance.start()
+
+
+def engine_stats():
+    return [engine.stats() for engine in list(_engines.values())]
@@ -0,0 +1,146 @@
+"""
+In-process publish/subscribe bus behind the /api/stream SSE endpoint.
+Producers publish state changes per topic; every subscriber keeps only the
+latest pending event per topic, so a slow client skips intermediate states
+instead of growing an unbounded queue.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+Event = namedtuple("Event", ("id", "topic", "data"))
+
+
+class Subscription:
+    def __init__(self, topics=None):
+        self.topics = set(topics) if topics else None
+        self.coalesced = 0
+        self.closed = False
+        self._pending = OrderedDict()
+        self._latest = {}  # topic -> id of the newest event accepted
+        self._cond = threading.Condition()
+
+    def wants(self, topic):
+        return self.topics is None or topic in self.topics
+
+    def push(self, event):
+        """Queue `event`; an event older than one already seen for its topic is dropped."""
+        with self._cond:
+            if self._latest.get(event.topic, 0) >= event.id:
+                return False
+            self._latest[event.topic] = event.id
+            if event.topic in self._pending:
+                self.coalesced += 1
+            self._pending[event.topic] = event
+            self._pending.move_to_end(event.topic)
+            self._cond.notify()
+            return True
+
+    def get(self, timeout=None):
+        """Next event, or None when `timeout` elapses (time for a heartbeat)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self.closed, timeout=timeout)
+            if self._pending:
+                return self._pending.popitem(last=False)[1]
+            return None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+
+class EventBus:
+    """
+    Topics are plain strings ("window", "tracker", "modes", ...).
+    Polled sources (`register_source`) are sampled by a single producer thread
+    that only runs while at least one client is subscribed.
+    """
+
+    def __init__(self, poll_interval=1.0):
+        self.poll_interval = poll_interval
+        self._subscribers = set()
+        self._last = {}
+        self._sources = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._poller = None
+
+    # ------------------------------------------------------------------
+    # Publishing
+    # ------------------------------------------------------------------
+    def publish(self, topic, data):
+        with self._lock:
+            self._seq += 1
+            event = Event(self._seq, topic, data)
+            self._last[topic] = event
+            subscribers = [s for s in self._subscribers if s.wants(topic)]
+        for sub in subscribers:
+            sub.push(event)
+        return event
+
+    def publish_if_changed(self, topic, data, key=None):
+        """
+        Publish only when `data` differs from the last event of the topic.
+        `key` picks the part that counts as a change (e.g. without ticking timers).
+        """
+        last = self._last.get(topic)
+        if last is not None:
+            if (key(last.data) if key else last.data) == (key(data) if key else data):
+                return False
+        self.publish(topic, data)
+        return True
+
+    def register_source(self, topic, fn, key=None):
+        """Poll `fn()` while clients are connected; publish when its value changes."""
+        self._sources[topic] = (fn, key)
+
+    # ------------------------------------------------------------------
+    # Subscribing
+    # ------------------------------------------------------------------
+    def subscribe(self, topics=None):
+        sub = Subscription(topics)
+        with self._lock:
+            self._subscribers.add(sub)
+            # pushed under the lock, so no publish can slip in between snapshot and push
+            for event in sorted((e for t, e in self._last.items() if sub.wants(t)), key=lambda e: e.id):
+                sub.push(event)
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll_sources, name="event-bus-poller", daemon=True)
+                self._poller.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        sub.close()
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def topics(self):
+        return sorted(set(self._sources) | set(self._last))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "topics": self.topics(),
+                "last_event_id": self._seq,
+                "coalesced": sum(s.coalesced for s in self._subscribers),
+            }
+
+    def _poll_sources(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    return
+                sources = list(self._sources.items())
+            for topic, (fn, key) in sources:
+                try:
+                    self.publish_if_changed(topic, fn(), key)
+                except Exception as e:
+                    logging.error(f"Event source '{topic}' failed: {e}")
+
+
+event_bus = EventBus()
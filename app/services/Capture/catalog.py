@@ -0,0 +1,414 @@
+"""
+server/app/services/Capture/catalog.py
+Indexed catalog of saved screenshots.
+
+One row per file (timestamp, relative path, size, hash, app, session),
+written when the pipeline saves a frame. Files saved by anything else
+(Core's ImageCapturer loop, older versions) are indexed by reconcile():
+the first one scans the folder once, later ones only the day folders
+changed since the previous scan (a folder's mtime moves when a file is
+created in it), so a reconcile costs the new files, not the whole tree.
+History, storage info and
+retention cleanup are index range queries instead of walks over the
+screenshot folder. Thumbnail variants are written next to the capture
+(under .thumbs/) and served through a bounded in-memory LRU.
+"""
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+from PIL import Image
+from sqlalchemy import text
+
+from app.core.database import get_engine
+from app.services.Capture.pipeline import WEBP_SUPPORTED
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS screenshots (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts          REAL NOT NULL,
+        path        TEXT NOT NULL UNIQUE,
+        bytes       INTEGER NOT NULL DEFAULT 0,
+        width       INTEGER,
+        height      INTEGER,
+        hash        TEXT,
+        mimetype    TEXT,
+        app         TEXT,
+        session_id  TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_screenshots_ts ON screenshots (ts)",
+    "CREATE INDEX IF NOT EXISTS ix_screenshots_app_ts ON screenshots (app, ts)",
+    "CREATE TABLE IF NOT EXISTS screenshot_meta (key TEXT PRIMARY KEY, value TEXT)",
+)
+
+_INSERT = text("""
+    INSERT OR REPLACE INTO screenshots (ts, path, bytes, width, height, hash, mimetype, app, session_id)
+    VALUES (:ts, :path, :bytes, :width, :height, :hash, :mimetype, :app, :session_id)
+""")
+
+_INSERT_MISSING = text("""
+    INSERT OR IGNORE INTO screenshots (ts, path, bytes, width, height, hash, mimetype, app, session_id)
+    VALUES (:ts, :path, :bytes, :width, :height, :hash, :mimetype, :app, :session_id)
+""")
+
+COLUMNS = ("id", "ts", "path", "bytes", "width", "height", "hash", "mimetype", "app", "session_id")
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp"}
+
+# variant -> longest side in px
+THUMBNAIL_SIZES = {"thumb": 320, "preview": 960}
+THUMB_DIR = ".thumbs"
+
+# seconds a file's mtime may trail the previous scan's start (coarse filesystem clocks)
+RECONCILE_SLACK = 2.0
+
+
+class ThumbnailCache:
+    """LRU of encoded thumbnails bounded by total bytes."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            if len(data) > self.max_bytes:
+                return
+            self._items[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def discard(self, key):
+        with self._lock:
+            data = self._items.pop(key, None)
+            if data is not None:
+                self._size -= len(data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._items),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hit_ratio": self.hits / lookups if lookups else None,
+        }
+
+
+def _render_thumbnail(img, max_side):
+    img = img.copy()
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="WEBP" if WEBP_SUPPORTED else "JPEG", quality=70)
+    return buf.getvalue()
+
+
+class ScreenshotCatalog:
+    def __init__(self, database_url, base_folder, cache_bytes=32 * 1024 * 1024):
+        self.engine = get_engine(database_url)
+        self.base_folder = Path(base_folder)
+        self.thumbnails = ThumbnailCache(cache_bytes)
+        self._reconcile_lock = threading.Lock()
+        with self.engine.begin() as conn:
+            for statement in SCHEMA:
+                conn.execute(text(statement))
+
+    # ------------------------------------------------------------------
+    # Paths
+    # ------------------------------------------------------------------
+    def relative(self, path):
+        path = Path(path)
+        try:
+            return path.resolve().relative_to(self.base_folder.resolve()).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    @staticmethod
+    def _inside(base, path):
+        """`path` resolved; ValueError when it escapes `base` ('../', absolute or symlinked paths)."""
+        path = path.resolve()
+        if not path.is_relative_to(base.resolve()):
+            raise ValueError("path is outside the screenshot folder")
+        return path
+
+    def absolute(self, rel_path):
+        return self._inside(self.base_folder, self.base_folder / rel_path)
+
+    def thumbnail_path(self, rel_path, variant):
+        root = self.base_folder / THUMB_DIR / variant
+        return self._inside(root, root / (rel_path + ".webp"))
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+    def add(self, record, img=None):
+        """Catalog one saved screenshot (a pipeline record); pre-renders thumbnails from `img`."""
+        row = {
+            "ts": datetime.fromisoformat(record["timestamp"]).timestamp(),
+            "path": self.relative(record["filepath"]),
+            "bytes": record.get("bytes", 0),
+            "width": record.get("width"),
+            "height": record.get("height"),
+            "hash": record.get("hash"),
+            "mimetype": record.get("mimetype"),
+            "app": record.get("app"),
+            "session_id": record.get("session_id"),
+        }
+        with self.engine.begin() as conn:
+            conn.execute(_INSERT, row)
+        if img is not None:
+            for variant, max_side in THUMBNAIL_SIZES.items():
+                try:
+                    self._write_thumbnail(row["path"], variant, _render_thumbnail(img, max_side))
+                except Exception as e:
+                    logging.error(f"Thumbnail {variant} for {row['path']} failed: {e}")
+        return row
+
+    def _write_thumbnail(self, rel_path, variant, data):
+        target = self.thumbnail_path(rel_path, variant)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(target.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+        self.thumbnails.put((rel_path, variant), data)
+
+    def reconcile(self, full_scan=True):
+        """
+        Index the files saved since the previous reconcile (file mtime as ts);
+        returns how many rows were added. Only the top folder and the day
+        folders modified since then are listed. Without a previous scan the
+        whole folder is scanned once, unless full_scan is False (then nothing
+        is done). A reconcile already running is not waited for.
+        """
+        if not self.base_folder.exists() or not self._reconcile_lock.acquire(blocking=False):
+            return 0
+        try:
+            since = self._get_meta("reconciled_at")
+            if since is None and not full_scan:
+                return 0
+            started = time.time()
+            since = float(since) - RECONCILE_SLACK if since is not None else None
+            rows = [self._file_row(entry) for entry in self._new_files(since)]
+            added = 0
+            if rows:
+                with self.engine.begin() as conn:
+                    # already indexed paths (the pipeline's rows, the slack) are ignored
+                    added = conn.execute(_INSERT_MISSING, rows).rowcount
+                if added:
+                    logging.info(f"Indexed {added} screenshots saved outside the pipeline")
+            self._set_meta("reconciled_at", repr(started))
+            return added
+        finally:
+            self._reconcile_lock.release()
+
+    def _new_files(self, since=None):
+        """Image files of the top folder and its day folders with mtime >= since (all when None)."""
+        folders = [self.base_folder]
+        while folders:
+            with os.scandir(folders.pop()) as entries:
+                for entry in entries:
+                    if entry.name == THUMB_DIR:
+                        continue
+                    stat = entry.stat()
+                    if entry.is_dir():
+                        if since is None or stat.st_mtime >= since:
+                            folders.append(entry.path)
+                    elif (os.path.splitext(entry.name)[1].lower() in IMAGE_SUFFIXES
+                          and (since is None or stat.st_mtime >= since)):
+                        yield entry
+
+    def _file_row(self, entry):
+        stat = entry.stat()
+        suffix = os.path.splitext(entry.name)[1].lower()
+        return {
+            "ts": stat.st_mtime, "path": self.relative(entry.path), "bytes": stat.st_size,
+            "width": None, "height": None, "hash": None,
+            "mimetype": f"image/{'jpeg' if suffix == '.jpg' else suffix[1:]}",
+            "app": None, "session_id": None,
+        }
+
+    def _get_meta(self, key):
+        with self.engine.connect() as conn:
+            row = conn.execute(text("SELECT value FROM screenshot_meta WHERE key = :key"), {"key": key}).first()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("INSERT INTO screenshot_meta (key, value) VALUES (:key, :value) "
+                     "ON CONFLICT (key) DO UPDATE SET value = excluded.value"),
+                {"key": key, "value": value},
+            )
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _where(start=None, end=None, app=None, session_id=None):
+        where, params = [], {}
+        if app:
+            where.append("app = :app")
+            params["app"] = app
+        if session_id:
+            where.append("session_id = :session_id")
+            params["session_id"] = session_id
+        if start is not None:
+            where.append("ts >= :start")
+            params["start"] = start
+        if end is not None:
+            where.append("ts < :end")
+            params["end"] = end
+        return (f"WHERE {' AND '.join(where)}" if where else ""), params
+
+    @staticmethod
+    def to_dict(row):
+        entry = dict(row)
+        entry["timestamp"] = datetime.fromtimestamp(entry.pop("ts")).isoformat()
+        return entry
+
+    def query(self, start=None, end=None, app=None, session_id=None, limit=None, newest_first=False):
+        clause, params = self._where(start, end, app, session_id)
+        sql = (f"SELECT {', '.join(COLUMNS)} FROM screenshots {clause} "
+               f"ORDER BY ts {'DESC' if newest_first else 'ASC'}, id")
+        if limit:
+            sql += " LIMIT :limit"
+            params["limit"] = limit
+        with self.engine.connect() as conn:
+            return [self.to_dict(r) for r in conn.execute(text(sql), params).mappings()]
+
+    def get(self, shot_id):
+        with self.engine.connect() as conn:
+            row = conn.execute(text(f"SELECT {', '.join(COLUMNS)} FROM screenshots WHERE id = :id"),
+                               {"id": shot_id}).mappings().first()
+        return self.to_dict(row) if row else None
+
+    def get_by_path(self, rel_path):
+        with self.engine.connect() as conn:
+            row = conn.execute(text(f"SELECT {', '.join(COLUMNS)} FROM screenshots WHERE path = :path"),
+                               {"path": rel_path}).mappings().first()
+        return self.to_dict(row) if row else None
+
+    def storage_info(self):
+        with self.engine.connect() as conn:
+            count, total, first, last = conn.execute(text(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0), MIN(ts), MAX(ts) FROM screenshots"
+            )).one()
+            by_day = conn.execute(text(
+                "SELECT date(ts, 'unixepoch', 'localtime') AS day, COUNT(*) AS files, SUM(bytes) AS bytes "
+                "FROM screenshots GROUP BY day ORDER BY day"
+            )).mappings().all()
+        return {
+            "total_files": count,
+            "total_bytes": total,
+            "total_size_mb": round(total / (1024 * 1024), 2),
+            "oldest": datetime.fromtimestamp(first).isoformat() if first else None,
+            "newest": datetime.fromtimestamp(last).isoformat() if last else None,
+            "by_day": [dict(r) for r in by_day],
+            "thumbnail_cache": self.thumbnails.stats(),
+        }
+
+    # ------------------------------------------------------------------
+    # Thumbnails
+    # ------------------------------------------------------------------
+    def thumbnail(self, rel_path, variant="thumb"):
+        """Encoded thumbnail bytes: LRU, then the pre-rendered file, then rendered from the original."""
+        if variant not in THUMBNAIL_SIZES:
+            raise ValueError(f"variant must be one of {sorted(THUMBNAIL_SIZES)}")
+        key = (rel_path, variant)
+        data = self.thumbnails.get(key)
+        if data is not None:
+            return data
+        target = self.thumbnail_path(rel_path, variant)
+        if target.exists():
+            data = target.read_bytes()
+            self.thumbnails.put(key, data)
+            return data
+        source = self.absolute(rel_path)
+        if not source.exists():
+            return None
+        with Image.open(source) as img:
+            data = _render_thumbnail(img, THUMBNAIL_SIZES[variant])
+        self._write_thumbnail(rel_path, variant, data)
+        return data
+
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+    def delete_range(self, start=None, end=None, batch_size=500):
+        """Delete files (and thumbnails) with start <= ts < end, in index-ordered chunks."""
+        clause, params = self._where(start, end)
+        removed = freed = 0
+        while True:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text(
+                    f"SELECT id, path, bytes FROM screenshots {clause} ORDER BY ts, id LIMIT :batch"
+                ), {**params, "batch": batch_size}).all()
+            if not rows:
+                break
+            for _, rel_path, size in rows:
+                self._unlink(rel_path)
+                freed += size or 0
+            with self.engine.begin() as conn:
+                conn.execute(text("DELETE FROM screenshots WHERE id = :id"), [{"id": r[0]} for r in rows])
+            removed += len(rows)
+        self._prune_empty_dirs()
+        return {"deleted": removed, "freed_bytes": freed}
+
+    def delete_before(self, cutoff):
+        return self.delete_range(end=cutoff)
+
+    def _unlink(self, rel_path):
+        try:
+            paths = [self.absolute(rel_path)] + [self.thumbnail_path(rel_path, v) for v in THUMBNAIL_SIZES]
+        except ValueError as e:
+            logging.error(f"Not deleting {rel_path}: {e}")
+            paths = []
+        for path in paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.error(f"Could not delete {path}: {e}")
+        for variant in THUMBNAIL_SIZES:
+            self.thumbnails.discard((rel_path, variant))
+
+    def _prune_empty_dirs(self):
+        # only day folders (one level) and their thumbnail mirrors, not a full walk
+        roots = [self.base_folder] + [self.base_folder / THUMB_DIR / v for v in THUMBNAIL_SIZES]
+        for root in roots:
+            if not root.exists():
+                continue
+            for folder in root.iterdir():
+                if folder.is_dir() and folder.name != THUMB_DIR:
+                    try:
+                        folder.rmdir()
+                    except OSError:
+                        pass  # not empty
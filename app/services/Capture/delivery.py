@@ -0,0 +1,52 @@
+"""
+server/app/services/Capture/delivery.py
+Conditional responses for saved screenshots and their thumbnails.
+
+A saved capture never changes, so it is sent with a strong ETag of its
+bytes (If-None-Match -> 304), Range support (206) and an immutable
+one-year cache lifetime. The digest of a file is cached per (path, size,
+mtime), so a file is hashed once however often it is requested.
+"""
+import hashlib
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+
+from flask import send_file
+
+IMMUTABLE_MAX_AGE = 365 * 86400
+
+
+@lru_cache(maxsize=4096)
+def file_digest(path, size, mtime_ns):
+    """Hash of the file bytes; cached per (path, size, mtime) so a file is read once."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def image_etag(filepath, data=None):
+    """Strong ETag from the bytes sent: `data` when given (thumbnails), else the file."""
+    if data is not None:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+    stat = Path(filepath).stat()
+    return file_digest(str(filepath), stat.st_size, stat.st_mtime_ns)
+
+
+def send_image(filepath, data=None, as_attachment=False):
+    """
+    Conditional send of a saved capture (`filepath`) or of its rendered
+    variant (`data`, WebP or JPEG bytes); call inside a request.
+    """
+    if data is not None:
+        mimetype = "image/webp" if data[:4] == b"RIFF" else "image/jpeg"
+        response = send_file(BytesIO(data), mimetype=mimetype, conditional=True, etag=image_etag(filepath, data),
+                             max_age=IMMUTABLE_MAX_AGE)
+    else:
+        response = send_file(filepath, as_attachment=as_attachment, conditional=True, etag=image_etag(filepath),
+                             max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
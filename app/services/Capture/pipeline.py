@@ -0,0 +1,242 @@
+"""
+server/app/services/Capture/pipeline.py
+Periodic screenshot pipeline: capture -> perceptual dedup -> background encode -> disk.
+
+The capture thread only grabs the frame and reduces it to a 64x36
+grayscale block fingerprint; frames where fewer than `threshold` blocks
+changed since the last kept frame are dropped before any encoding. Kept frames are handed to an
+encoder thread (WebP/JPEG preset, optional downscale) through a small
+bounded queue, so a slow disk never delays the next capture.
+"""
+import hashlib
+import io
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+from PIL import Image, features
+
+# preset -> (format, quality, longest side in px or None)
+ENCODE_PRESETS = {
+    "lossless": ("PNG", None, None),
+    "high": ("WEBP", 90, None),
+    "balanced": ("WEBP", 75, 1600),
+    "low": ("JPEG", 60, 1280),
+}
+MIMETYPES = {"PNG": "image/png", "WEBP": "image/webp", "JPEG": "image/jpeg"}
+EXTENSIONS = {"PNG": "png", "WEBP": "webp", "JPEG": "jpg"}
+WEBP_SUPPORTED = features.check("webp")
+
+
+def fingerprint(img, size=(64, 36)):
+    """Grayscale block means; one byte per block."""
+    return img.convert("L").resize(size, Image.BOX).tobytes()
+
+
+def changed_blocks(a, b, tolerance=6):
+    """Number of blocks whose brightness moved by more than `tolerance`."""
+    if a is None or b is None or len(a) != len(b):
+        return len(a or b or b"")
+    return sum(1 for x, y in zip(a, b) if abs(x - y) > tolerance)
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def encode_image(img, preset="balanced", fmt=None):
+    """
+    Encode a PIL image into memory.
+    Returns (bytes, mimetype, extension, (width, height)).
+    `fmt` (png/webp/jpeg) overrides the preset's format, keeping its quality/size.
+    """
+    fmt_name, quality, max_side = ENCODE_PRESETS.get(preset, ENCODE_PRESETS["balanced"])
+    if fmt:
+        fmt_name = {"jpg": "JPEG"}.get(fmt.lower(), fmt.upper())
+        if fmt_name not in MIMETYPES:
+            raise ValueError(f"Unsupported image format: {fmt}")
+    if fmt_name == "WEBP" and not WEBP_SUPPORTED:
+        fmt_name = "JPEG"
+
+    if max_side and max(img.size) > max_side:
+        img = img.copy()
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+    if fmt_name == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    options = {}
+    if quality is not None and fmt_name != "PNG":
+        options["quality"] = quality
+    if fmt_name == "WEBP":
+        options["method"] = 4
+    elif fmt_name == "PNG":
+        options["optimize"] = False
+    buf = io.BytesIO()
+    img.save(buf, format=fmt_name, **options)
+    return buf.getvalue(), MIMETYPES[fmt_name], EXTENSIONS[fmt_name], img.size
+
+
+class ScreenshotPipeline:
+    def __init__(self, capture, base_folder, interval=300, preset="balanced",
+                 threshold=2, queue_size=4, on_saved=None, context=None):
+        self.capture = capture
+        self.base_folder = Path(base_folder)
+        self.interval = interval
+        self.preset = preset
+        self.threshold = threshold
+        self.on_saved = on_saved      # on_saved(record, img)
+        self.context = context        # context() -> extra record fields at capture time (app, session_id)
+        self.recent = deque(maxlen=500)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._last_print = None
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()  # capture and encode threads both count; start() holds _lock while joining
+        self._stats = {"captured": 0, "skipped_duplicates": 0, "saved": 0, "dropped": 0,
+                       "errors": 0, "bytes_written": 0, "encode_ms_total": 0.0, "capture_ms_total": 0.0}
+
+    @property
+    def is_running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        with self._lock:
+            if self.is_running and not self._stop.is_set():
+                return
+            # a stop() is still winding down (the encoder drains its queue):
+            # wait for those threads instead of reporting the old run as running
+            for thread in self._threads:
+                thread.join()
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._capture_loop, name="screenshot-capture", daemon=True),
+                threading.Thread(target=self._encode_loop, name="screenshot-encode", daemon=True),
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self):
+        """Stop capturing; frames already queued are still written."""
+        self._stop.set()
+
+    def set_interval(self, seconds):
+        """Seconds between captures; ValueError unless a finite positive number."""
+        if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or not 0 < seconds < float("inf"):
+            raise ValueError("interval must be a positive number of seconds")
+        self.interval = seconds
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+
+    # ------------------------------------------------------------------
+    # Capture stage
+    # ------------------------------------------------------------------
+    def capture_once(self):
+        """Capture one frame; returns True when it was queued for encoding."""
+        started = time.perf_counter()
+        img = self.capture()
+        if img is None:
+            return False
+        frame_print = fingerprint(img)
+        self._count(captured=1, capture_ms_total=(time.perf_counter() - started) * 1000)
+        if self._last_print is not None and changed_blocks(frame_print, self._last_print) < self.threshold:
+            self._count(skipped_duplicates=1)
+            return False
+        self._last_print = frame_print
+        extra = {}
+        if self.context:
+            try:
+                extra = self.context() or {}
+            except Exception as e:
+                logging.error(f"Screenshot context lookup failed: {e}")
+        item = (datetime.now(), img, content_hash(frame_print), extra)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # encoder is behind: keep the newest frame
+            try:
+                self._queue.get_nowait()
+                self._count(dropped=1)
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(item)
+        return True
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.capture_once()
+            except Exception as e:
+                self._count(errors=1)
+                logging.error(f"Screenshot capture failed: {e}")
+            self._stop.wait(self.interval)
+
+    # ------------------------------------------------------------------
+    # Encode stage
+    # ------------------------------------------------------------------
+    def _encode_loop(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            try:
+                self._save(*item)
+            except Exception as e:
+                self._count(errors=1)
+                logging.error(f"Screenshot encode failed: {e}")
+
+    def _save(self, taken_at, img, frame_hash, extra=None):
+        started = time.perf_counter()
+        data, mimetype, ext, size = encode_image(img, self.preset)
+        self._count(encode_ms_total=(time.perf_counter() - started) * 1000)
+
+        folder = self.base_folder / taken_at.strftime("%Y-%m-%d")
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"{taken_at.strftime('%H%M%S')}_{frame_hash}.{ext}"
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        record = {
+            "timestamp": taken_at.isoformat(),
+            "filepath": str(path),
+            "hash": frame_hash,
+            "bytes": len(data),
+            "width": size[0],
+            "height": size[1],
+            "mimetype": mimetype,
+            **(extra or {}),
+        }
+        self._count(saved=1, bytes_written=len(data))
+        self.recent.append(record)
+        if self.on_saved:
+            self.on_saved(record, img)
+        return record
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        captured = stats["captured"] or 1
+        saved = stats["saved"] or 1
+        return {
+            **{k: v for k, v in stats.items() if not k.endswith("_total")},
+            "is_running": self.is_running,
+            "interval_sec": self.interval,
+            "preset": self.preset,
+            "dedup_threshold": self.threshold,
+            "queue_depth": self._queue.qsize(),
+            "avg_capture_ms": round(stats["capture_ms_total"] / captured, 2),
+            "avg_encode_ms": round(stats["encode_ms_total"] / saved, 2),
+        }
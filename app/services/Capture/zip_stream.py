@@ -0,0 +1,75 @@
+"""
+server/app/services/Capture/zip_stream.py
+Zip archive written straight into a streamed response.
+
+zipfile writes to a non-seekable sink using data descriptors, so each
+member is yielded as soon as it is written and memory stays at one
+member, however many files the archive holds. Images are already
+compressed, so members are stored rather than deflated.
+"""
+import io
+import logging
+import zipfile
+from pathlib import Path
+
+
+class _Sink(io.RawIOBase):
+    """Write-only, non-seekable buffer drained after every member."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def drain(self):
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def folder_members(base_folder, names):
+    """(arcname, path) pairs for the names that are files inside `base_folder` (no traversal)."""
+    base = Path(base_folder).resolve()
+    members = []
+    for name in names:
+        if not isinstance(name, str):
+            continue
+        path = (base / name).resolve()
+        if base in path.parents and path.is_file():
+            members.append((name, path))
+    return members
+
+
+def iter_zip(members, chunk_size=256 * 1024):
+    """
+    Yield zip bytes for `members`, an iterable of (arcname, path) pairs.
+    Missing or unreadable files are skipped.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for arcname, path in members:
+            try:
+                with open(path, "rb") as src, archive.open(arcname, mode="w") as dst:
+                    while True:
+                        block = src.read(chunk_size)
+                        if not block:
+                            break
+                        dst.write(block)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            except OSError as e:
+                logging.error(f"Skipping {path} in zip download: {e}")
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
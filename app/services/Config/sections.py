@@ -0,0 +1,91 @@
+"""
+server/app/services/Config/sections.py
+In-memory operations for the config_manager sections held by ConfigStore.
+Each op mutates the private copy it is given and returns (ok, result),
+mirroring the return values of the matching config_manager function.
+"""
+
+
+def upsert_mapping(process_map, exe, friendly):
+    process_map[exe] = friendly
+    return True, True
+
+
+PROCESS_MAP_OPS = {"upsert": upsert_mapping}
+
+
+# get_all_categories() is kept in the shape config_manager returns it:
+# {name: [patterns]}, or a plain list of names. The list shape carries no
+# patterns, so pattern ops there change nothing in the snapshot: they go
+# straight to config_manager (None, see ConfigSection).
+
+def create_category(categories, name):
+    if name in categories:
+        return False, False
+    if isinstance(categories, dict):
+        categories[name] = []
+    else:
+        categories.append(name)
+    return True, True
+
+
+def delete_category(categories, name):
+    if name not in categories:
+        return False, False
+    if isinstance(categories, dict):
+        del categories[name]
+    else:
+        categories.remove(name)
+    return True, True
+
+
+def add_pattern(categories, name, pattern):
+    if not isinstance(categories, dict):
+        return (None, None) if name in categories else (False, False)
+    patterns = categories.get(name)
+    if patterns is None or pattern in patterns:
+        return False, False
+    patterns.append(pattern)
+    return True, True
+
+
+def remove_pattern(categories, name, pattern):
+    if not isinstance(categories, dict):
+        return (None, None) if name in categories else (False, False)
+    patterns = categories.get(name)
+    if patterns is None or pattern not in patterns:
+        return False, False
+    patterns.remove(pattern)
+    return True, True
+
+
+CATEGORY_OPS = {
+    "create": create_category,
+    "delete": delete_category,
+    "add_pattern": add_pattern,
+    "remove_pattern": remove_pattern,
+}
+
+
+def add_prefix(prefixes, prefix):
+    if prefix in prefixes:
+        return False, False
+    prefixes.append(prefix)
+    return True, True
+
+
+def remove_prefix(prefixes, prefix):
+    if prefix not in prefixes:
+        return False, False
+    prefixes.remove(prefix)
+    return True, True
+
+
+PREFIX_OPS = {"add": add_prefix, "remove": remove_prefix}
+
+
+def load_categories(value):
+    """Private copy of get_all_categories() in the same shape."""
+    if isinstance(value, dict):
+        return {name: list(patterns or []) for name, patterns in value.items()}
+    return list(value or [])
@@ -0,0 +1,198 @@
+"""
+server/app/services/Extension/commands.py
+In-memory command channel from the server to browser extensions.
+
+Command ids are strings, as before: the push time (str(time.time())),
+bumped when needed so they strictly increase and compare as numbers.
+Each client acknowledges the last id it has executed, so a command issued
+between a read and an ack is never lost. A client id seen for the first
+time starts at server start: it gets every command pushed since then,
+including those pushed before its first poll, but not the journaled
+backlog of earlier runs. Waiting readers (long-poll / SSE) are woken on push. An optional
+append-only journal keeps commands and acks across restarts.
+Past `max_commands` only commands every known client has acknowledged are
+evicted; unacknowledged ones are kept up to `max_unacked`, and dropping one
+beyond that is logged and counted.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+
+def command_key(command_id):
+    """Numeric position of a command id (string or number); ValueError when it is not one."""
+    try:
+        return float(command_id)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid command id: {command_id!r}")
+
+
+class CommandQueue:
+    def __init__(self, max_commands=100, journal_path=None, max_unacked=1000):
+        self.max_commands = max_commands
+        self.max_unacked = max(max_unacked, max_commands)
+        self.journal_path = Path(journal_path) if journal_path else None
+        self._commands = deque()
+        self._acked = {}        # client -> last acknowledged id
+        self._delivered = {}    # client -> last id handed out (for legacy clear)
+        self._last = 0.0        # newest id, as a number
+        self._journaled = 0     # commands appended since start (journal compaction)
+        self._dropped = 0       # unacknowledged commands evicted past max_unacked
+        self._cond = threading.Condition()
+        if self.journal_path:
+            self._load_journal()
+        self._start = self._last  # where clients without an ack start
+
+    # ------------------------------------------------------------------
+    # Journal (optional)
+    # ------------------------------------------------------------------
+    def _load_journal(self):
+        try:
+            lines = self.journal_path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            try:
+                position = command_key(entry.get("id", 0))
+            except ValueError:
+                continue
+            if "ack" in entry:
+                self._acked[entry["ack"]] = max(self._acked.get(entry["ack"], 0.0), position)
+                continue
+            self._commands.append(entry)
+            self._last = max(self._last, position)
+        self._trim()
+        # keep the journal bounded to what is still in memory
+        self._rewrite_journal()
+
+    def _rewrite_journal(self):
+        try:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.journal_path.with_suffix(self.journal_path.suffix + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                for command in self._commands:
+                    f.write(json.dumps(command, default=str) + "\n")
+                for client, acked in self._acked.items():
+                    f.write(json.dumps({"ack": client, "id": acked}) + "\n")
+            tmp.replace(self.journal_path)
+        except OSError as e:
+            logging.error(f"Command journal rewrite failed: {e}")
+
+    def _journal(self, entry):
+        try:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+        except OSError as e:
+            logging.error(f"Command journal append failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Producer
+    # ------------------------------------------------------------------
+    def push(self, command):
+        with self._cond:
+            stamp = time.time()
+            self._last = stamp if stamp > self._last else self._last + 1e-6
+            command = {**command, "id": str(self._last), "timestamp": datetime.now().isoformat()}
+            self._commands.append(command)
+            self._trim()
+            if self.journal_path:
+                self._journal(command)
+                self._journaled += 1
+                if self._journaled % self.max_commands == 0:
+                    self._rewrite_journal()
+            self._cond.notify_all()
+        return command
+
+    def _trim(self):
+        """Evict past max_commands what every client has acknowledged, past max_unacked anything."""
+        acked = min(self._acked.values(), default=self._last)
+        while len(self._commands) > self.max_commands and command_key(self._commands[0]["id"]) <= acked:
+            self._commands.popleft()
+        while len(self._commands) > self.max_unacked:
+            dropped = self._commands.popleft()
+            self._dropped += 1
+            logging.warning(f"Command {dropped['id']} dropped unacknowledged: {self.max_unacked} commands are pending")
+
+    # ------------------------------------------------------------------
+    # Consumers
+    # ------------------------------------------------------------------
+    def _position(self, client):
+        """Last acknowledged id of `client`; a new client starts at server start."""
+        if client not in self._acked:
+            self._acked[client] = self._start
+            if self.journal_path:
+                self._journal({"ack": client, "id": str(self._start)})
+        return self._acked[client]
+
+    def _pending(self, client, after):
+        start = self._position(client) if after is None else after
+        return [c for c in self._commands if command_key(c["id"]) > start]
+
+    def pending(self, client="default", after=None, timeout=0):
+        """
+        Commands newer than the client's last ack (or `after`); with a timeout
+        this blocks until at least one is available (long-poll).
+        """
+        with self._cond:
+            if timeout:
+                self._cond.wait_for(lambda: self._pending(client, after), timeout=timeout)
+            commands = self._pending(client, after)
+            if commands:
+                self._delivered[client] = max(self._delivered.get(client, 0.0), command_key(commands[-1]["id"]))
+            return commands
+
+    def ack(self, client="default", up_to=None):
+        """Acknowledge every command up to `up_to` (default: the last one delivered)."""
+        with self._cond:
+            position = self._position(client)  # a client acking before its first read starts at server start
+            up_to = self._delivered.get(client, position) if up_to is None else command_key(up_to)
+            self._acked[client] = max(position, up_to)
+            if self.journal_path:
+                self._journal({"ack": client, "id": str(self._acked[client])})
+            return str(self._acked[client])
+
+    def iter_commands(self, client="default", heartbeat=15.0):
+        """
+        Generator for SSE: yields each new command once (None on idle heartbeat).
+        Starts after the client's last ack, so reconnects resume where they left off.
+        """
+        with self._cond:
+            cursor = self._position(client)
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending(client, cursor), timeout=heartbeat)
+                commands = self._pending(client, cursor)
+                if commands:
+                    cursor = command_key(commands[-1]["id"])
+                    self._delivered[client] = max(self._delivered.get(client, 0.0), cursor)
+            if not commands:
+                yield None
+            for command in commands:
+                yield command
+
+    def clear(self):
+        with self._cond:
+            self._commands.clear()
+            if self.journal_path:
+                self._rewrite_journal()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": len(self._commands),
+                "last_id": str(self._last),
+                "max_commands": self.max_commands,
+                "max_unacked": self.max_unacked,
+                "dropped": self._dropped,
+                "clients": {c: {"acked": str(self._acked.get(c, 0.0)), "delivered": str(self._delivered.get(c, 0.0))}
+                            for c in set(self._acked) | set(self._delivered)},
+                "journal": str(self.journal_path) if self.journal_path else None,
+            }
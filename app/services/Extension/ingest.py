@@ -0,0 +1,126 @@
+"""
+server/app/services/Extension/ingest.py
+Helpers for the batched /e-tracker/track-urls endpoint.
+"""
+import json
+import threading
+import zlib
+from collections import OrderedDict
+
+DEFAULT_MAX_BODY = 8 * 1024 * 1024
+
+
+class BodyTooLarge(ValueError):
+    """The request body (as sent or once decompressed) is over the limit."""
+
+
+def read_body(stream, content_length, max_size=None):
+    """
+    The raw request body, at most `max_size` bytes: a declared Content-Length
+    over the limit is refused before anything is read, and a body without one
+    (chunked) is read only up to the limit. Raises BodyTooLarge.
+    """
+    max_size = max_size or DEFAULT_MAX_BODY
+    if content_length is not None and content_length > max_size:
+        raise BodyTooLarge(f"Body larger than {max_size} bytes")
+    body = stream.read(max_size + 1)
+    if len(body) > max_size:
+        raise BodyTooLarge(f"Body larger than {max_size} bytes")
+    return body
+
+
+def _gunzip(body, max_size):
+    """Decompress gzip member by member in bounded steps; ValueError past `max_size`."""
+    out, size = [], 0
+    while body:
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunk = body
+        while chunk:
+            try:
+                data = decoder.decompress(chunk, max_size - size + 1)
+            except zlib.error as e:
+                raise ValueError(f"Invalid gzip body: {e}")
+            size += len(data)
+            if size > max_size:
+                raise BodyTooLarge(f"Decompressed body larger than {max_size} bytes")
+            out.append(data)
+            chunk = decoder.unconsumed_tail
+        if not decoder.eof:
+            raise ValueError("Invalid gzip body: truncated")
+        body = decoder.unused_data
+    return b"".join(out)
+
+
+def decode_batch(body, content_encoding=None, max_size=None):
+    """
+    List of events from a request body: a JSON array or {"events": [...]},
+    optionally gzip-compressed (decoded size capped at `max_size`).
+    Raises ValueError when malformed.
+    """
+    if (content_encoding or "").lower() == "gzip" or body[:2] == b"\x1f\x8b":
+        body = _gunzip(body, max_size or DEFAULT_MAX_BODY)
+    data = json.loads(body)
+    if isinstance(data, dict):
+        data = data.get("events")
+    if not isinstance(data, list):
+        raise ValueError("Body must be a JSON array of URL events or {\"events\": [...]}")
+    for index, event in enumerate(data):
+        if isinstance(event, dict) and not isinstance(tab_key(event), (str, int, float, type(None))):
+            raise ValueError(f"Event {index}: tabId must be a string or a number")
+    return data
+
+
+def tab_key(event):
+    return event.get("tabId", event.get("tab_id"))
+
+
+def triage_batch(events, deduper, extract_domain, server_timestamp):
+    """
+    Per-item outcome of a decoded batch, in request order: 'invalid' (not an
+    object, no url, or the domain cannot be extracted), 'duplicate' (same URL
+    as the tab's previous event, in this batch or an earlier one) or 'stored'.
+    Returns (accepted events, results, {tab: last accepted url}); the caller
+    remembers the tabs in `deduper` once the accepted events are stored.
+    """
+    results, accepted, last_url = [], [], {}
+    for index, url_data in enumerate(events):
+        if not isinstance(url_data, dict) or not url_data.get("url"):
+            results.append({"index": index, "status": "invalid", "error": "Invalid data"})
+            continue
+        tab = tab_key(url_data)
+        previous = last_url[tab] if tab in last_url else deduper.last(tab)
+        if tab is not None and previous == url_data["url"]:
+            results.append({"index": index, "status": "duplicate"})
+            continue
+        try:
+            url_data["server_timestamp"] = server_timestamp
+            url_data["domain"] = extract_domain(url_data["url"])
+        except Exception as e:
+            results.append({"index": index, "status": "invalid", "error": str(e)})
+            continue
+        last_url[tab] = url_data["url"]
+        accepted.append(url_data)
+        results.append({"index": index, "status": "stored"})
+    return accepted, results, last_url
+
+
+class TabDeduper:
+    """Remembers the last URL per tab (bounded, LRU) to drop consecutive repeats."""
+
+    def __init__(self, max_tabs=1000):
+        self.max_tabs = max_tabs
+        self._last = OrderedDict()
+        self._lock = threading.Lock()
+
+    def last(self, tab):
+        with self._lock:
+            return self._last.get(tab)
+
+    def remember(self, tab, url):
+        if tab is None:
+            return
+        with self._lock:
+            self._last[tab] = url
+            self._last.move_to_end(tab)
+            while len(self._last) > self.max_tabs:
+                self._last.popitem(last=False)
@@ -0,0 +1,96 @@
+"""
+server/app/services/Extension/legacy_file.py
+Keeps Core's URLTracker data file written behind the url_events table.
+
+The file belongs to Core: URLTracker.save_url appends to it and
+URLTracker.get_stats describes it (the /stats contract). The request path
+only inserts into url_events; the events it stored are queued here and a
+background thread hands them to URLTracker.save_url one by one, so the
+file still receives every event without a page view waiting on Core's
+file rewrite. get_stats() is memoised on the file's size and mtime, so
+polling /stats reads the file once per change instead of once per call.
+"""
+import logging
+import os
+import threading
+from collections import deque
+
+
+class LegacyURLFile:
+    def __init__(self, tracker, max_pending=100_000):
+        self.tracker = tracker
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._writing = False
+        self._cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._memo = None  # (file signature, get_stats() result)
+        self._counters = {"written": 0, "errors": 0, "dropped": 0}
+        self._thread = threading.Thread(target=self._run, name="url-legacy-file", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def add_many(self, events):
+        """Queue events already stored in url_events for Core's file."""
+        dropped = 0
+        with self._cond:
+            for event in events:
+                if len(self._pending) >= self.max_pending:
+                    self._pending.popleft()
+                    dropped += 1
+                self._pending.append(event)
+            self._counters["dropped"] += dropped
+            self._cond.notify_all()
+        if dropped:
+            logging.warning(f"URL legacy file behind: {dropped} events not written to {self.tracker.data_file}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                event = self._pending.popleft()
+                self._writing = True
+            self._write(event)
+
+    def _write(self, event):
+        try:
+            ok = self.tracker.save_url(dict(event))
+        except Exception as e:
+            ok = False
+            logging.error(f"Writing URL event to {getattr(self.tracker, 'data_file', '?')} failed: {e}")
+        with self._cond:
+            self._counters["written" if ok is not False else "errors"] += 1
+            self._writing = False
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until every queued event has been handed to Core (tests, shutdown)."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def _signature(self):
+        try:
+            st = os.stat(self.tracker.data_file)
+        except (OSError, AttributeError, TypeError):
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def get_stats(self):
+        """URLTracker.get_stats(), recomputed only when the data file changed."""
+        signature = self._signature()
+        with self._stats_lock:
+            if signature is not None and self._memo is not None and self._memo[0] == signature:
+                return self._memo[1]
+            stats = self.tracker.get_stats()
+            if signature is not None:
+                self._memo = (signature, stats)
+            return stats
+
+    def stats(self):
+        with self._cond:
+            return {**self._counters, "pending": len(self._pending)}
@@ -0,0 +1,302 @@
+"""
+server/app/services/Extension/url_store.py
+Indexed storage for browser-extension URL events.
+
+Each tracked URL is one INSERT (no file rewrite), and range queries use
+the (ts) / (domain, ts) indexes and a streaming cursor instead of loading
+the whole history. A per-domain, per-day aggregate (visits, first/last
+seen, dwell time) is maintained in the same transaction as the insert.
+"""
+import json
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.core.database import get_engine
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS url_events (
+        id                INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts                REAL NOT NULL,
+        timestamp         TEXT,
+        server_timestamp  TEXT,
+        url               TEXT NOT NULL,
+        domain            TEXT,
+        title             TEXT,
+        payload           TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_url_events_ts ON url_events (ts)",
+    "CREATE INDEX IF NOT EXISTS ix_url_events_domain_ts ON url_events (domain, ts)",
+    """
+    CREATE TABLE IF NOT EXISTS url_domain_daily (
+        domain          TEXT NOT NULL,
+        day             TEXT NOT NULL,
+        visits          INTEGER NOT NULL DEFAULT 0,
+        first_seen      REAL,
+        last_seen       REAL,
+        dwell_seconds   REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (domain, day)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_url_domain_daily_day ON url_domain_daily (day)",
+)
+
+# columns of the CSV export (the full event stays in the JSON export)
+URL_EXPORT_COLUMNS = ("timestamp", "server_timestamp", "url", "domain", "title")
+
+# A gap longer than this between two events is idle time, not dwell on the page
+DWELL_CAP_SECONDS = 1800
+
+_UPSERT_DAILY = text("""
+    INSERT INTO url_domain_daily (domain, day, visits, first_seen, last_seen, dwell_seconds)
+    VALUES (:domain, :day, :visits, :first_seen, :last_seen, :dwell_seconds)
+    ON CONFLICT (domain, day) DO UPDATE SET
+        visits = visits + excluded.visits,
+        first_seen = MIN(first_seen, excluded.first_seen),
+        last_seen = MAX(last_seen, excluded.last_seen),
+        dwell_seconds = dwell_seconds + excluded.dwell_seconds
+""")
+
+_INSERT = text("""
+    INSERT INTO url_events (ts, timestamp, server_timestamp, url, domain, title, payload)
+    VALUES (:ts, :timestamp, :server_timestamp, :url, :domain, :title, :payload)
+""")
+
+
+def parse_time(value):
+    """Epoch seconds for an ISO string ('Z' allowed); naive values are local time."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _to_row(event):
+    stamp = event.get("timestamp") or event.get("server_timestamp")
+    try:
+        ts = parse_time(stamp)
+    except (AttributeError, TypeError, ValueError):
+        ts = datetime.now().timestamp()
+    return {
+        "ts": ts,
+        "timestamp": event.get("timestamp"),
+        "server_timestamp": event.get("server_timestamp"),
+        "url": event["url"],
+        "domain": event.get("domain"),
+        "title": event.get("title"),
+        "payload": json.dumps(event, default=str),
+    }
+
+
+def _day(ts):
+    return datetime.fromtimestamp(ts).date().isoformat()
+
+
+class _DailyDeltas:
+    """
+    Aggregate deltas for a batch of rows in time order. Dwell of an event is
+    the time until the next event (capped), credited to the earlier event's domain.
+    """
+
+    def __init__(self, last):
+        self.last = last  # (domain, ts) of the newest event already counted
+        self.deltas = {}
+
+    def _slot(self, domain, ts):
+        domain = domain or ""  # url_domain_daily.domain is NOT NULL
+        key = (domain, _day(ts))
+        if key not in self.deltas:
+            self.deltas[key] = {"domain": domain, "day": key[1], "visits": 0,
+                                "first_seen": ts, "last_seen": ts, "dwell_seconds": 0.0}
+        return self.deltas[key]
+
+    def add(self, domain, ts):
+        domain = domain or ""
+        if self.last is not None and ts >= self.last[1]:
+            gap = ts - self.last[1]
+            if gap <= DWELL_CAP_SECONDS:
+                self._slot(*self.last)["dwell_seconds"] += gap
+        slot = self._slot(domain, ts)
+        slot["visits"] += 1
+        slot["first_seen"] = min(slot["first_seen"], ts)
+        slot["last_seen"] = max(slot["last_seen"], ts)
+        if self.last is None or ts >= self.last[1]:
+            self.last = (domain, ts)
+
+    def rows(self):
+        return list(self.deltas.values())
+
+
+class URLEventStore:
+    def __init__(self, database_url):
+        self.engine = get_engine(database_url)
+        self._ingest_lock = threading.Lock()
+        with self.engine.begin() as conn:
+            for statement in SCHEMA:
+                conn.execute(text(statement))
+            self._last = conn.execute(text(
+                "SELECT domain, ts FROM url_events ORDER BY ts DESC, id DESC LIMIT 1"
+            )).first()
+            has_daily = conn.execute(text("SELECT 1 FROM url_domain_daily LIMIT 1")).first()
+        if self._last is not None:
+            self._last = (self._last[0] or "", self._last[1])
+            if not has_daily:
+                self.rebuild_daily()
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+    def add(self, event):
+        self.add_many([event])
+
+    def add_many(self, events):
+        rows = [_to_row(e) for e in events]
+        if not rows:
+            return 0
+        with self._ingest_lock:
+            deltas = _DailyDeltas(self._last)
+            for row in sorted(rows, key=lambda r: r["ts"]):
+                deltas.add(row["domain"], row["ts"])
+            with self.engine.begin() as conn:
+                conn.execute(_INSERT, rows)
+                conn.execute(_UPSERT_DAILY, deltas.rows())
+            self._last = deltas.last
+        return len(rows)
+
+    def rebuild_daily(self, batch_size=5000):
+        """Recompute url_domain_daily from url_events (backfill for existing data)."""
+        with self._ingest_lock:
+            deltas = _DailyDeltas(None)
+            with self.engine.connect() as conn:
+                result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+                    text("SELECT domain, ts FROM url_events ORDER BY ts, id"))
+                for domain, ts in result:
+                    deltas.add(domain, ts)
+            with self.engine.begin() as conn:
+                conn.execute(text("DELETE FROM url_domain_daily"))
+                if deltas.rows():
+                    conn.execute(_UPSERT_DAILY, deltas.rows())
+            self._last = deltas.last
+
+    def import_legacy(self, path):
+        """One-time import of the old JSON array file while the table is still empty."""
+        with self.engine.connect() as conn:
+            if conn.execute(text("SELECT 1 FROM url_events LIMIT 1")).first():
+                return 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        events = [e for e in data if isinstance(e, dict) and e.get("url")]
+        count = self.add_many(events)
+        logging.info(f"Imported {count} URL events from {path}")
+        return count
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _where(start=None, end=None, domain=None):
+        where, params = [], {}
+        if domain:
+            where.append("domain = :domain")
+            params["domain"] = domain
+        if start is not None:
+            where.append("ts >= :start")
+            params["start"] = start
+        if end is not None:
+            where.append("ts <= :end")
+            params["end"] = end
+        return (f"WHERE {' AND '.join(where)}" if where else ""), params
+
+    def iter_events(self, start=None, end=None, domain=None, limit=None, batch_size=500):
+        """Yield stored event dicts in time order through a streaming cursor."""
+        clause, params = self._where(start, end, domain)
+        sql = f"SELECT payload FROM url_events {clause} ORDER BY ts, id"
+        if limit:
+            sql += " LIMIT :limit"
+            params["limit"] = limit
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(text(sql), params)
+            for (payload,) in result:
+                yield json.loads(payload)
+
+    def count(self, start=None, end=None, domain=None):
+        clause, params = self._where(start, end, domain)
+        with self.engine.connect() as conn:
+            return conn.execute(text(f"SELECT COUNT(*) FROM url_events {clause}"), params).scalar()
+
+    def stats(self):
+        """Totals from the daily aggregate: O(domains x days), not O(events)."""
+        with self.engine.connect() as conn:
+            total, domains, first, last = conn.execute(text(
+                "SELECT COALESCE(SUM(visits), 0), COUNT(DISTINCT domain), MIN(first_seen), MAX(last_seen) "
+                "FROM url_domain_daily"
+            )).one()
+        return {
+            "total_urls": total,
+            "unique_domains": domains,
+            "first_visit": datetime.fromtimestamp(first).isoformat() if first else None,
+            "last_visit": datetime.fromtimestamp(last).isoformat() if last else None,
+            "top_domains": [{"domain": d["domain"], "visits": d["visits"]} for d in self.domains(limit=10)],
+        }
+
+    # ------------------------------------------------------------------
+    # Domain aggregates
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _day_where(start_day=None, end_day=None, domain=None):
+        where, params = [], {}
+        if domain:
+            where.append("domain = :domain")
+            params["domain"] = domain
+        if start_day:
+            where.append("day >= :start_day")
+            params["start_day"] = start_day
+        if end_day:
+            where.append("day <= :end_day")
+            params["end_day"] = end_day
+        return (f"WHERE {' AND '.join(where)}" if where else ""), params
+
+    @staticmethod
+    def _isoformat(ts):
+        return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+    def domains(self, start_day=None, end_day=None, limit=None, order="visits"):
+        """Per-domain totals over [start_day, end_day] (ISO dates), busiest first."""
+        clause, params = self._day_where(start_day, end_day)
+        order_by = "dwell DESC" if order == "dwell" else "visits DESC"
+        sql = (f"SELECT domain, SUM(visits) AS visits, SUM(dwell_seconds) AS dwell, "
+               f"MIN(first_seen) AS first_seen, MAX(last_seen) AS last_seen, COUNT(*) AS days "
+               f"FROM url_domain_daily {clause} GROUP BY domain ORDER BY {order_by}, domain")
+        if limit:
+            sql += " LIMIT :limit"
+            params["limit"] = limit
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(sql), params).mappings().all()
+        return [{
+            "domain": r["domain"],
+            "visits": r["visits"],
+            "dwell_seconds": round(r["dwell"] or 0, 1),
+            "first_seen": self._isoformat(r["first_seen"]),
+            "last_seen": self._isoformat(r["last_seen"]),
+            "active_days": r["days"],
+        } for r in rows]
+
+    def timeline(self, domain, start_day=None, end_day=None):
+        """Per-day rows for one domain, oldest first."""
+        clause, params = self._day_where(start_day, end_day, domain)
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(
+                f"SELECT day, visits, dwell_seconds, first_seen, last_seen "
+                f"FROM url_domain_daily {clause} ORDER BY day"
+            ), params).mappings().all()
+        return [{
+            "day": r["day"],
+            "visits": r["visits"],
+            "dwell_seconds": round(r["dwell_seconds"] or 0, 1),
+            "first_seen": self._isoformat(r["first_seen"]),
+            "last_seen": self._isoformat(r["last_seen"]),
+        } for r in rows]
@@ -0,0 +1,271 @@
+"""
+server/app/services/History/archive.py
+Cold tier for raw window samples.
+
+Raw records older than their retention are collapsed into run-length spans
+(consecutive samples with the same app/title/status/window_type become
+one start + duration row) and appended to one gzip'd NDJSON file per
+month. Each append is a separate gzip member, so files never need
+rewriting; readers decompress the members in order. A manifest keeps
+per-month counts, the last archived (timestamp, id), so a batch that
+was archived but not yet deleted is never written twice, and the run
+still open at the end of the last batch, so a run is not split where
+the retention batches are.
+
+An append is announced first: the manifest records each month file's size
+before the batch is written, and only the manifest saved after the append
+carries the new last_key. If the process dies in between, the next start
+truncates the files back to the recorded sizes, so the batch (still in the
+table, since retention deletes after archiving) is archived exactly once.
+"""
+import gzip
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ARCHIVE_PREFIX = "raw_samples_"
+ARCHIVE_SUFFIX = ".ndjson.gz"
+SPAN_FIELDS = ("app", "title", "status", "window_type")
+
+
+def _parse(value):
+    """Datetime of a stored timestamp; None when it is missing or unparsable."""
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def compact_samples(rows, max_gap=5.0, interval=1.0, run=None):
+    """
+    Run-length encode samples (dicts with timestamp + SPAN_FIELDS, oldest first).
+    A run ends when a field changes, the month changes or two samples are more
+    than `max_gap` apart. Rows without a valid timestamp are skipped.
+    Returns (closed spans, open run): the last run may continue in the next
+    batch, so it is handed back instead of closed; pass it in as `run`.
+    """
+    spans = []
+    last_ts = _parse(run["last"]) if run else None
+    for row in rows:
+        ts = _parse(row.get("timestamp"))
+        if ts is None:
+            continue
+        fields = {f: row.get(f) for f in SPAN_FIELDS}
+        if (run is not None and all(run[f] == fields[f] for f in SPAN_FIELDS)
+                and run["start"][:7] == ts.isoformat()[:7]
+                and (ts - last_ts).total_seconds() <= max_gap):
+            run["samples"] += 1
+        else:
+            if run is not None:
+                spans.append(close_run(run, interval))
+            run = {"start": ts.isoformat(), "samples": 1, **fields}
+        run["last"] = ts.isoformat()
+        last_ts = ts
+    return spans, run
+
+
+def close_run(run, interval):
+    """Span of a run: it ends one sampling interval after its last sample."""
+    start = _parse(run["start"])
+    end = _parse(run["last"]) + timedelta(seconds=interval)
+    return {"start": run["start"], "end": end.isoformat(), "duration": (end - start).total_seconds(),
+            "samples": run["samples"], **{f: run[f] for f in SPAN_FIELDS}}
+
+
+def span_to_sample(span):
+    """Archived span in the samples export row layout (plus duration / samples)."""
+    return {"id": None, "timestamp": span["start"], **{f: span.get(f) for f in SPAN_FIELDS},
+            "duration": span["duration"], "samples": span["samples"]}
+
+
+def span_samples(span, interval):
+    """The samples of a span, spread evenly from its start to its last sample (oldest first)."""
+    start = _parse(span["start"])
+    last = start + timedelta(seconds=max(span["duration"] - interval, 0))
+    step = (last - start) / (span["samples"] - 1) if span["samples"] > 1 else timedelta(0)
+    for i in range(span["samples"]):
+        yield {"timestamp": (start + step * i).isoformat(), **{f: span.get(f) for f in SPAN_FIELDS}}
+
+
+class RawSampleArchive:
+    def __init__(self, archive_dir, max_gap=5.0, interval=1.0):
+        self.archive_dir = Path(archive_dir)
+        self.max_gap = max_gap
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._manifest_path = self.archive_dir / "manifest.json"
+        self._manifest = self._load_manifest()
+        self._recover()
+
+    # ------------------------------------------------------------------
+    # Manifest
+    # ------------------------------------------------------------------
+    def _load_manifest(self):
+        try:
+            return json.loads(self._manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"last_key": None, "months": {}}
+
+    def _save_manifest(self):
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._manifest_path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._manifest_path)
+
+    def _recover(self):
+        """Undo an append whose batch never reached the manifest (crash between the two saves)."""
+        pending = self._manifest.pop("pending", None)
+        if not pending:
+            return
+        for month, size in pending.items():
+            path = self.month_path(month)
+            try:
+                if path.stat().st_size > size:
+                    with open(path, "r+b") as f:
+                        f.truncate(size)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    logging.warning(f"Raw sample archive {month}: dropped an unfinished append")
+            except FileNotFoundError:
+                pass
+        self._save_manifest()
+
+    def month_path(self, month):
+        return self.archive_dir / f"{ARCHIVE_PREFIX}{month}{ARCHIVE_SUFFIX}"
+
+    # ------------------------------------------------------------------
+    # Write
+    # ------------------------------------------------------------------
+    def archive_rows(self, rows):
+        """
+        Archive a batch of raw rows (dicts with id, timestamp, SPAN_FIELDS),
+        oldest first. Returns the number of spans written. Safe to call again with
+        rows that were already archived (they are skipped). Rows without a valid
+        timestamp are not archived (retention deletes them with the batch).
+        """
+        with self._lock:
+            last_key = self._manifest["last_key"]
+            if last_key is not None:
+                rows = [r for r in rows if (r["timestamp"], r["id"]) > tuple(last_key)]
+            rows = [r for r in rows if _parse(r["timestamp"]) is not None]
+            if not rows:
+                return 0
+            run = self._manifest.get("open")
+            # on a copy: the manifest's run only changes with last_key
+            spans, run = compact_samples(rows, self.max_gap, self.interval, dict(run) if run else None)
+            by_month = {}
+            for span in spans:
+                by_month.setdefault(span["start"][:7], []).append(span)
+
+            # announce the append (sizes to truncate back to) before touching the files
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            if by_month:
+                self._manifest["pending"] = {
+                    month: self.month_path(month).stat().st_size if self.month_path(month).exists() else 0
+                    for month in by_month}
+                self._save_manifest()
+            try:
+                for month, month_spans in sorted(by_month.items()):
+                    data = "".join(json.dumps(s, separators=(",", ":")) + "\n" for s in month_spans)
+                    with open(self.month_path(month), "ab") as f:
+                        f.write(gzip.compress(data.encode("utf-8"), compresslevel=9))
+                        f.flush()
+                        os.fsync(f.fileno())
+            except OSError:
+                self._recover()  # a partial append must not stay in front of the retry
+                raise
+
+            for row in rows:
+                entry = self._month(row["timestamp"][:7], row["timestamp"])
+                entry["samples"] += 1
+                entry["last"] = row["timestamp"]
+            for month, month_spans in by_month.items():
+                self._month(month, month_spans[0]["start"])["spans"] += len(month_spans)
+            self._manifest["open"] = run
+            self._manifest["last_key"] = [rows[-1]["timestamp"], rows[-1]["id"]]
+            self._manifest.pop("pending", None)
+            self._save_manifest()
+            return len(spans)
+
+    def _month(self, month, first):
+        return self._manifest["months"].setdefault(month, {"spans": 0, "samples": 0, "first": first})
+
+    # ------------------------------------------------------------------
+    # Read
+    # ------------------------------------------------------------------
+    def months(self, start=None, end=None):
+        start_month = start.isoformat()[:7] if start else None
+        end_month = end.isoformat()[:7] if end else None
+        return [m for m in sorted(self._manifest["months"])
+                if (start_month is None or m >= start_month) and (end_month is None or m <= end_month)]
+
+    def iter_spans(self, start=None, end=None, app=None):
+        """
+        Spans overlapping [start, end), oldest first; only the matching month files
+        are read. The run still open at the end of the last batch comes last.
+        """
+        start_iso = start.isoformat() if start else None
+        end_iso = end.isoformat() if end else None
+        with self._lock:
+            run = self._manifest.get("open")
+            run = close_run(run, self.interval) if run else None
+
+        def wanted(span):
+            return not ((app and span.get("app") != app)
+                        or (start_iso and span["end"] <= start_iso)
+                        or (end_iso and span["start"] >= end_iso))
+
+        for month in self.months(start, end):
+            path = self.month_path(month)
+            if not path.exists():  # the month's only run is still open
+                continue
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        span = json.loads(line)
+                        if wanted(span):
+                            yield span
+            except (OSError, EOFError) as e:
+                logging.error(f"Reading raw sample archive {month} failed: {e}")
+        if run and wanted(run):
+            yield run
+
+    def iter_samples(self, start=None, end=None, app=None):
+        return (span_to_sample(s) for s in self.iter_spans(start, end, app))
+
+    @property
+    def archived_from(self):
+        """Timestamp of the oldest archived sample (None if nothing is archived)."""
+        months = self._manifest["months"]
+        return months[min(months)]["first"] if months else None
+
+    @property
+    def archived_until(self):
+        """Timestamp of the newest archived sample (None if nothing is archived)."""
+        last_key = self._manifest["last_key"]
+        return last_key[0] if last_key else None
+
+    def stats(self):
+        months = {}
+        for month, entry in self._manifest["months"].items():
+            path = self.month_path(month)
+            months[month] = {**entry, "bytes": path.stat().st_size if path.exists() else 0}
+        spans = sum(m["spans"] for m in months.values()) + bool(self._manifest.get("open"))
+        samples = sum(m["samples"] for m in months.values())
+        return {
+            "archive_dir": str(self.archive_dir),
+            "archived_until": self.archived_until,
+            "samples": samples,
+            "spans": spans,
+            "compaction_ratio": round(samples / spans, 1) if spans else None,
+            "bytes": sum(m["bytes"] for m in months.values()),
+            "months": months,
+        }
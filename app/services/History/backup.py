@@ -0,0 +1,198 @@
+"""
+server/app/services/History/backup.py
+Online backups of the tracker database as background jobs.
+
+The copy uses the SQLite online backup API a few hundred pages at a time
+and sleeps between steps, reading from one pinned WAL snapshot, so the
+writers (tracker thread, request threads) keep committing meanwhile. The snapshot is then compressed
+(gzip, or zstd when `zstandard` is installed) and backups older than the
+retention window are pruned.
+"""
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy.engine import make_url
+
+BACKUP_PREFIX = "focusai_backup_"
+COMPRESSIONS = ("gzip", "zstd", "none")
+_SUFFIXES = {"gzip": ".db.gz", "zstd": ".db.zst", "none": ".db"}
+
+
+def zstd_available():
+    try:
+        import zstandard  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def sqlite_path(database_url):
+    """Filesystem path of a SQLite database URL (None for other databases / :memory:)."""
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return None
+    return Path(url.database)
+
+
+def _compress(source, target, compression, chunk_size=1024 * 1024):
+    if compression == "zstd":
+        import zstandard  # optional dependency, checked by zstd_available()
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            zstandard.ZstdCompressor(level=10, threads=-1).copy_stream(src, dst, read_size=chunk_size)
+    else:
+        with open(source, "rb") as src, gzip.open(target, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, chunk_size)
+
+
+class BackupManager:
+    """One backup at a time on a worker thread; jobs are tracked in memory."""
+
+    def __init__(self, database_url, backup_dir, retention_days=14, pages_per_step=256,
+                 step_sleep=0.02, compression="gzip", max_jobs=20):
+        self.source = sqlite_path(database_url)
+        self.backup_dir = Path(backup_dir)
+        self.retention_days = retention_days
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.compression = compression
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._running = None
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+    def start(self, compression=None):
+        """Queue a backup; returns the job (the running one if a backup is in progress)."""
+        if self.source is None:
+            raise ValueError("Online backup is only available for SQLite file databases")
+        compression = compression or self.compression
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"compression must be one of {COMPRESSIONS}")
+        if compression == "zstd" and not zstd_available():
+            raise ValueError("zstd compression requires the zstandard package")
+        with self._lock:
+            if self._running is not None:
+                return dict(self._jobs[self._running])
+            job = {
+                "job_id": uuid.uuid4().hex[:12],
+                "status": "queued",
+                "compression": compression,
+                "pages_total": None,
+                "pages_done": 0,
+                "progress": 0.0,
+                "created_at": datetime.now().isoformat(),
+                "finished_at": None,
+                "path": None,
+                "bytes": None,
+                "pruned": 0,
+                "error": None,
+            }
+            self._jobs[job["job_id"]] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+            self._running = job["job_id"]
+        threading.Thread(target=self._run, args=(job,), name="db-backup", daemon=True).start()
+        return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def jobs(self):
+        with self._lock:
+            return [dict(j) for j in reversed(self._jobs.values())]
+
+    def _update(self, job, **fields):
+        with self._lock:
+            job.update(fields)
+
+    def _run(self, job):
+        started = time.perf_counter()
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        snapshot = self.backup_dir / f".{BACKUP_PREFIX}{stamp}.db.partial"
+        target = self.backup_dir / f"{BACKUP_PREFIX}{stamp}{_SUFFIXES[job['compression']]}"
+        try:
+            self._update(job, status="running")
+            self._copy(snapshot, job)
+            if job["compression"] == "none":
+                os.replace(snapshot, target)
+            else:
+                self._update(job, status="compressing")
+                partial = target.with_name(target.name + ".partial")
+                _compress(snapshot, partial, job["compression"])
+                os.replace(partial, target)
+            pruned = self.prune()
+            self._update(job, status="done", path=str(target), bytes=target.stat().st_size, pruned=pruned,
+                         duration_sec=round(time.perf_counter() - started, 2))
+            logging.info(f"Database backup {job['job_id']} written to {target}")
+        except Exception as e:
+            logging.error(f"Database backup {job['job_id']} failed: {e}")
+            self._update(job, status="failed", error=str(e))
+        finally:
+            snapshot.unlink(missing_ok=True)
+            with self._lock:
+                job["finished_at"] = datetime.now().isoformat()
+                self._running = None
+
+    def _copy(self, snapshot, job):
+        def progress(_status, remaining, total):
+            self._update(job, pages_total=total, pages_done=total - remaining,
+                         progress=round((total - remaining) / total, 4) if total else 1.0)
+            if remaining and self.step_sleep:
+                time.sleep(self.step_sleep)  # let the writer in between steps
+
+        source = sqlite3.connect(str(self.source), timeout=30, isolation_level=None)
+        target = sqlite3.connect(snapshot)
+        try:
+            if source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+                # Pin one WAL snapshot: otherwise every commit from another connection
+                # restarts the backup, and at 1 Hz tracking it would never finish.
+                # (In rollback-journal mode this read lock would block writers instead.)
+                source.execute("BEGIN")
+                source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            source.backup(target, pages=self.pages_per_step, progress=progress)
+        finally:
+            if source.in_transaction:
+                source.execute("COMMIT")
+            target.close()
+            source.close()
+        self._update(job, progress=1.0)
+
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+    def list_backups(self):
+        if not self.backup_dir.exists():
+            return []
+        return [{"path": str(p), "bytes": p.stat().st_size,
+                 "created_at": datetime.fromtimestamp(p.stat().st_mtime).isoformat()} for p in self._files()]
+
+    def _files(self):
+        """Finished backups, oldest first."""
+        files = [p for p in self.backup_dir.glob(f"{BACKUP_PREFIX}*") if not p.name.endswith(".partial")]
+        return sorted(files, key=lambda p: p.stat().st_mtime)
+
+    def prune(self):
+        """Delete backups older than retention_days; the newest one is always kept."""
+        if not self.retention_days or not self.backup_dir.exists():
+            return 0
+        cutoff = time.time() - self.retention_days * 86400
+        removed = 0
+        for path in self._files()[:-1]:
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
@@ -0,0 +1,249 @@
+"""
+server/app/services/History/core_raw.py
+WindowHistory's own raw record table, seen from the server.
+
+Core persists every raw window record through its SQLAlchemy session and
+commits it on the tracker thread. The table is found by reflection:
+Config.CORE_RAW_TABLE, or else the only table that is not the server's
+own and has timestamp / app / title columns. It is the one store of raw
+samples: reads are time-ranged and streamed, so the server never loads
+Core's whole history to read a window of it, and a retention policy
+trims it in batches.
+
+With Config.CORE_RAW_WRITE_BEHIND (on by default) a before_flush listener
+on Core's own session factory takes Core's pending raw record out of the
+flush and hands its column values to the write-behind SampleWriter,
+which inserts them into the same table in batches. The tracker's commit
+then has nothing to write, and Core's table still gets every row, a few
+seconds later. While the writer is not healthy, Core writes its records
+itself. Without a table or session factory everything here is disabled
+and Core behaves as before.
+"""
+import logging
+import threading
+from types import SimpleNamespace
+
+from sqlalchemy import DateTime, MetaData, Table, and_, event, func, inspect, select
+from sqlalchemy import inspect as inspect_object
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
+
+from app.services.History.retention import RetentionPolicy
+from app.services.History.rollups import record_time
+
+APP_COLUMNS = ("app", "app_name")
+TITLE_COLUMNS = ("title", "window_title")
+SERVER_TABLES = ("raw_samples",)  # the server's former copy of the samples
+SESSION_FACTORY_ATTRIBUTES = ("SessionLocal", "session_factory", "_session_factory", "Session", "session")
+
+
+def find_raw_table(engine, name=None):
+    """Reflected Table of Core's raw records (None when there is no single candidate)."""
+    inspector = inspect(engine)
+    names = [name] if name else [t for t in inspector.get_table_names() if t not in SERVER_TABLES]
+    candidates = []
+    for table_name in names:
+        columns = {c["name"] for c in inspector.get_columns(table_name)}
+        if "timestamp" in columns and columns & set(APP_COLUMNS) and columns & set(TITLE_COLUMNS):
+            candidates.append(table_name)
+    if len(candidates) != 1:
+        if candidates:
+            logging.warning(f"Several tables look like Core's raw records ({candidates}); set CORE_RAW_TABLE")
+        return None
+    return Table(candidates[0], MetaData(), autoload_with=engine)
+
+
+def core_session_factory(history):
+    """
+    The session factory Core's WindowHistory persists through (None when it
+    cannot be found): a sessionmaker / scoped_session / Session on the history
+    or on its database manager.
+    """
+    for owner in (history, getattr(history, "db_manager", None), getattr(history, "db", None)):
+        for name in SESSION_FACTORY_ATTRIBUTES:
+            value = getattr(owner, name, None) if owner is not None else None
+            if isinstance(value, (sessionmaker, scoped_session, Session)):
+                return value
+    return None
+
+
+def factory_engine(factory):
+    """The engine a session factory (sessionmaker / scoped_session / Session) is bound to, or None."""
+    if isinstance(factory, scoped_session):
+        factory = factory.session_factory
+    if isinstance(factory, sessionmaker):
+        return factory.kw.get("bind")
+    if isinstance(factory, Session):
+        return factory.bind
+    return None
+
+
+def core_engine_stats(factory, shared):
+    """
+    How Core's own engine relates to the shared one (`shared`, a SharedEngine).
+    Core's tracker thread commits through its own engine, so those commits are
+    outside the shared writer lock and its counters; only the raw inserts the
+    write-behind queue takes over are covered.
+    """
+    bind = factory_engine(factory)
+    stats = {
+        "found": bind is not None,
+        "shared": bind is not None and bind is shared.engine,
+        "writer_lock": False,
+        "note": "Core's commits run on Core's engine: not serialised by the writer lock, not in the "
+                "engine counters (diverted raw inserts are, through the write-behind queue)",
+    }
+    if bind is not None:
+        stats["url"] = bind.url.render_as_string(hide_password=True)
+        if bind.url.get_backend_name() == "sqlite":
+            with bind.connect() as conn:
+                stats["pragmas"] = {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                                    for name in ("journal_mode", "synchronous", "busy_timeout")}
+    return stats
+
+
+def column_values(obj):
+    """
+    {column: value} of a pending ORM object, without the unset (None) ones,
+    so the table's defaults and autoincrement apply when it is inserted.
+    """
+    values = {}
+    for attr in inspect_object(obj).mapper.column_attrs:
+        value = getattr(obj, attr.key)
+        if value is not None:
+            values[attr.columns[0].name] = value
+    return values
+
+
+class CoreRawTable:
+    def __init__(self, engine, name=None):
+        self.engine = engine
+        self.table = None
+        try:
+            self.table = find_raw_table(engine.engine, name)
+        except Exception as e:
+            logging.error(f"Reflecting Core's raw record table failed: {e}")
+        if self.table is None:
+            logging.warning("Core's raw record table was not found; its rows stay Core-only")
+        self._lock = threading.Lock()
+        self._target = None
+        self._writer = None
+        self._stats = {"diverted": 0, "kept": 0}
+
+    @property
+    def name(self):
+        return self.table.name if self.table is not None else None
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def _column(self, names):
+        return next(c for c in self.table.c if c.name in names)
+
+    def _value(self, dt):
+        """A datetime as the timestamp column compares it (DateTime columns take datetimes)."""
+        return dt if isinstance(self.table.c.timestamp.type, DateTime) else dt.isoformat()
+
+    def _stored(self, dt):
+        """A datetime in the column's storage format, for textual SQL."""
+        process = self.table.c.timestamp.type.bind_processor(self.engine.engine.dialect)
+        value = self._value(dt)
+        return process(value) if process else value
+
+    def first_timestamp(self):
+        """Datetime of Core's oldest raw record (None when the table is empty or unknown)."""
+        if self.table is None:
+            return None
+        with self.engine.connect() as conn:
+            value = conn.execute(select(func.min(self.table.c.timestamp))).scalar()
+        return record_time(SimpleNamespace(timestamp=value))
+
+    def iter_records(self, after=None, before=None, app=None, limit=None, newest=False, batch_size=500):
+        """
+        Core's records with after < timestamp < before (datetimes), oldest first,
+        through a streaming cursor. With newest=True and a limit the page is the
+        newest `limit` records of the range. Records are dicts named like the
+        tracker's (app, title, timestamp, ...; no primary key).
+        """
+        table, ts = self.table, self.table.c.timestamp
+        app_column = self._column(APP_COLUMNS)
+        where = []
+        if after is not None:
+            where.append(ts > self._value(after))
+        if before is not None:
+            where.append(ts < self._value(before))
+        if app:
+            where.append(app_column == app)
+        query = select(table).where(and_(*where)) if where else select(table)
+        order = [ts, *table.primary_key.columns]
+        if newest and limit:
+            page = query.order_by(*(c.desc() for c in order)).limit(limit).subquery()
+            query = select(page).order_by(*(page.c[c.name] for c in order))
+        else:
+            query = query.order_by(*order)
+            if limit:
+                query = query.limit(limit)
+        keys = {c.name for c in table.primary_key.columns}
+        title_column = self._column(TITLE_COLUMNS).name
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+            for row in result.mappings():
+                record = {k: v for k, v in row.items() if k not in keys}
+                record["app"] = record.pop(app_column.name)
+                record["title"] = record.pop(title_column)
+                yield record
+
+    def retention_policy(self, days, archive=None):
+        """RetentionPolicy trimming Core's raw records in batches (None without a table)."""
+        if self.table is None:
+            return None
+        keys = list(self.table.primary_key.columns)
+        key = keys[0].name if len(keys) == 1 else "rowid"
+        columns = (f"{key} AS id", "timestamp", f"{self._column(APP_COLUMNS).name} AS app",
+                   f"{self._column(TITLE_COLUMNS).name} AS title",
+                   *(c for c in ("status", "window_type") if c in self.table.c))
+        return RetentionPolicy("core_raw", self.name, "timestamp", days, cutoff=self._stored, key=key,
+                               archive=archive, columns=columns)
+
+    # ------------------------------------------------------------------
+    # Write-behind for Core's per-sample INSERT
+    # ------------------------------------------------------------------
+    def divert_inserts(self, target, writer):
+        """
+        Start taking Core's raw record INSERTs out of the flushes of `target`,
+        Core's own session factory (sessionmaker / scoped_session) or Session,
+        and queueing them on `writer` (a SampleWriter). While writer.healthy()
+        is false every record is left to Core. A diverted record is detached
+        from Core's session and never gets its primary key; Core does not read
+        it back (the record stays in raw_history).
+        """
+        if self.table is None or self._target is not None:
+            return False
+        if target is None:
+            logging.warning("Core's session factory was not found; its raw inserts stay in Core")
+            return False
+        event.listen(target, "before_flush", self._before_flush)
+        self._target = target
+        self._writer = writer
+        logging.info(f"Core's {self.name} inserts go through the write-behind queue")
+        return True
+
+    def _before_flush(self, session, _context, _instances):
+        pending = [obj for obj in session.new if getattr(getattr(obj, "__table__", None), "name", None) == self.name]
+        if not pending:
+            return
+        if not self._writer.healthy():
+            for _ in pending:
+                self._count("kept")  # the queue is behind or failing: Core writes it itself
+            return
+        for obj in pending:
+            session.expunge(obj)
+            self._writer.enqueue(obj.__table__, column_values(obj))
+            self._count("diverted")
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return {"table": self.name, "write_behind": self._target is not None, **self._stats}
@@ -0,0 +1,254 @@
+"""
+server/app/services/History/export.py
+Streaming export encoders (CSV, NDJSON, gzip'd columnar JSON, Arrow IPC).
+Every encoder consumes an iterator of row dicts and yields chunks,
+so an export never holds more than one row group in memory.
+"""
+import csv
+import gzip
+import io
+import json
+import logging
+import zlib
+
+SESSION_COLUMNS = (
+    "session_id", "app_name", "start_time", "end_time", "total_duration",
+    "context_changes", "titles_seen", "status_changes", "window_count",
+)
+# archived rows are run-length spans; raw rows have one interval and 1 sample
+SAMPLE_COLUMNS = ("id", "timestamp", "app", "title", "status", "window_type", "duration", "samples")
+
+# Arrow types per dataset (pyarrow type factory names); lists are JSON-encoded strings
+SESSION_ARROW_TYPES = {
+    "session_id": "string", "app_name": "string", "start_time": "string", "end_time": "string",
+    "total_duration": "float64", "context_changes": "int64", "titles_seen": "string",
+    "status_changes": "string", "window_count": "int64",
+}
+SAMPLE_ARROW_TYPES = {
+    "id": "int64", "timestamp": "string", "app": "string", "title": "string", "status": "string",
+    "window_type": "string", "duration": "float64", "samples": "int64",
+}
+ARROW_TYPES = {SESSION_COLUMNS: SESSION_ARROW_TYPES, SAMPLE_COLUMNS: SAMPLE_ARROW_TYPES}
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "columnar": ("application/gzip", "columns.json.gz"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+ROW_GROUP_SIZE = 5000
+
+_END = object()
+
+
+def session_row(s):
+    return {
+        "session_id": s.session_id,
+        "app_name": s.app_name,
+        "start_time": s.start_time.isoformat(),
+        "end_time": s.end_time.isoformat() if s.end_time else None,
+        "total_duration": s.total_duration,
+        "context_changes": s.context_changes,
+        "titles_seen": s.titles_seen,
+        "status_changes": s.status_changes,
+        "window_count": s.window_count,
+    }
+
+
+def _cell(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _row_groups(rows, size=ROW_GROUP_SIZE):
+    group = []
+    for row in rows:
+        group.append(row)
+        if len(group) >= size:
+            yield group
+            group = []
+    if group:
+        yield group
+
+
+# ------------------------------------------------------------------
+# Encoders
+# ------------------------------------------------------------------
+def csv_chunks(rows, columns):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for group in _row_groups(rows, 500):
+        for row in group:
+            writer.writerow([_cell(row.get(c)) for c in columns])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def ndjson_chunks(rows, columns):
+    for group in _row_groups(rows, 500):
+        yield "".join(
+            json.dumps({c: row.get(c) for c in columns}, default=str, separators=(",", ":")) + "\n"
+            for row in group
+        )
+
+
+def columnar_chunks(rows, columns):
+    """
+    Gzip stream of JSON lines; each line is one row group laid out per column:
+    {"rows": n, "columns": {"app": [...], "timestamp": [...], ...}}
+    """
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for group in _row_groups(rows):
+        block = {"rows": len(group), "columns": {c: [row.get(c) for row in group] for c in columns}}
+        data = gz.compress((json.dumps(block, default=str, separators=(",", ":")) + "\n").encode("utf-8"))
+        if data:
+            yield data
+    yield gz.flush()
+
+
+def _arrow_types(columns):
+    declared = ARROW_TYPES.get(tuple(columns), {})
+    return {c: declared.get(c, "string") for c in columns}
+
+
+def arrow_schema(columns):
+    """The declared Arrow schema of a dataset's columns (string for undeclared ones)."""
+    import pyarrow as pa  # optional dependency, checked by arrow_available()
+
+    return pa.schema([pa.field(c, getattr(pa, t)()) for c, t in _arrow_types(columns).items()])
+
+
+def _arrow_cell(value, arrow_type):
+    value = _cell(value)
+    if value is None:
+        return None
+    if arrow_type == "string":
+        return value if isinstance(value, str) else str(value)
+    return int(value) if arrow_type == "int64" else float(value)
+
+
+def arrow_chunks(rows, columns):
+    """Arrow IPC stream, one record batch per row group, all against the dataset's schema. Requires pyarrow."""
+    import pyarrow as pa  # optional dependency, checked by arrow_available()
+
+    types = _arrow_types(columns)
+    schema = arrow_schema(columns)
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+    for group in _row_groups(rows, ROW_GROUP_SIZE):
+        data = {c: [_arrow_cell(row.get(c), types[c]) for row in group] for c in columns}
+        writer.write_batch(pa.RecordBatch.from_pydict(data, schema=schema))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    writer.close()
+    yield sink.getvalue()
+
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+ENCODERS = {
+    "csv": csv_chunks,
+    "ndjson": ndjson_chunks,
+    "columnar": columnar_chunks,
+    "arrow": arrow_chunks,
+}
+
+
+# ------------------------------------------------------------------
+# Error handling around the encoders
+# ------------------------------------------------------------------
+def _error_csv(error):
+    buf = io.StringIO()
+    csv.writer(buf).writerow(["error", error])
+    return buf.getvalue()
+
+
+ERROR_TRAILERS = {
+    "csv": _error_csv,
+    "ndjson": lambda error: json.dumps({"error": error}) + "\n",
+    # a gzip stream may hold several members; readers decompress them in order
+    "columnar": lambda error: gzip.compress((json.dumps({"error": error}) + "\n").encode("utf-8")),
+}
+
+
+def _guarded(rows):
+    """
+    (rows, errors): the first row is read right away, so an error there raises
+    to the caller; a later one is logged, appended to `errors` and ends `rows`.
+    """
+    iterator = iter(rows)
+    first = next(iterator, _END)
+    errors = []
+
+    def generate():
+        if first is _END:
+            return
+        count = 1
+        yield first
+        try:
+            for row in iterator:
+                yield row
+                count += 1
+        except Exception as e:
+            logging.error(f"Export failed after {count} rows: {e}")
+            errors.append(str(e))
+
+    return generate(), errors
+
+
+def export_chunks(fmt, rows, columns):
+    """
+    Chunks of the export in `fmt`. An error before the first row raises here
+    (and becomes a normal error response). A later error ends the file with an
+    error record in the format's own terms: an "error" row (csv), an
+    {"error": ...} line (ndjson, columnar). Arrow has no place for one, so the
+    stream is cut off instead of ending as a complete file.
+    """
+    rows, errors = _guarded(rows)
+
+    def generate():
+        yield from ENCODERS[fmt](rows, columns)
+        if errors:
+            if fmt not in ERROR_TRAILERS:
+                raise RuntimeError(errors[0])
+            yield ERROR_TRAILERS[fmt](errors[0])
+
+    return generate()
+
+
+def json_document_chunks(rows, dataset, export_info, statistics, dumps=json.dumps):
+    """
+    {"export_info": ..., "<dataset>": [rows], "statistics": ...} written
+    incrementally; `statistics` is called once the rows are out. Errors are
+    handled as in export_chunks; a later one replaces the statistics with an
+    "error" key, so the document stays valid JSON.
+    """
+    rows, errors = _guarded(rows)
+
+    def generate():
+        yield '{"export_info":' + dumps(export_info) + "," + dumps(dataset) + ":["
+        for i, row in enumerate(rows):
+            yield ("," if i else "") + dumps(row)
+        if not errors:
+            try:
+                yield '],"statistics":' + dumps(statistics()) + "}\n"
+                return
+            except Exception as e:
+                logging.error(f"Export statistics failed: {e}")
+                errors.append(str(e))
+        yield '],"error":' + dumps(errors[0]) + "}\n"
+
+    return generate()
@@ -0,0 +1,74 @@
+"""
+server/app/services/History/history_feed.py
+Observes WindowTracker.history and fans out raw samples and closed sessions
+to server-side subscribers (rollups, persistence, caches...).
+"""
+import logging
+import threading
+
+from app.services.History.raw_buffer import RawHistoryBuffer
+
+
+class HistoryFeed:
+    """
+    Hooks into a WindowHistory instance without modifying Core.
+    raw_history is swapped for a bounded RawHistoryBuffer; every raw sample
+    the tracker appends is forwarded to the sample listeners; when
+    `current_session` changes the previous session is reported as closed. `flush()` is called on stop / shutdown.
+    """
+
+    def __init__(self, history, capacity):
+        self.history = history
+        self.capacity = capacity
+        self._sample_listeners = []
+        self._session_listeners = []
+        self._flush_listeners = []
+        self._last_session = None
+        self._lock = threading.Lock()
+
+    def install(self):
+        """(Re)attach the ring buffer to history.raw_history."""
+        raw = self.history.raw_history
+        if not isinstance(raw, RawHistoryBuffer):
+            self.history.raw_history = RawHistoryBuffer(self.capacity, raw, on_append=self._on_sample)
+        self._last_session = getattr(self.history, "current_session", None)
+
+    def on_sample(self, callback):
+        self._sample_listeners.append(callback)
+        return callback
+
+    def on_session_closed(self, callback):
+        self._session_listeners.append(callback)
+        return callback
+
+    def on_flush(self, callback):
+        self._flush_listeners.append(callback)
+        return callback
+
+    def flush(self):
+        """Ask every subscriber to persist what it buffered (stop / shutdown)."""
+        self.poll()
+        self._notify(self._flush_listeners)
+
+    def poll(self):
+        """Check for a session switch outside of the sample path (e.g. on shutdown)."""
+        current = getattr(self.history, "current_session", None)
+        with self._lock:
+            previous = self._last_session
+            if current is previous:
+                return
+            self._last_session = current
+        if previous is not None:
+            self._notify(self._session_listeners, previous)
+
+    def _on_sample(self, record):
+        self._notify(self._sample_listeners, record)
+        self.poll()
+
+    @staticmethod
+    def _notify(listeners, *payload):
+        for callback in listeners:
+            try:
+                callback(*payload)
+            except Exception as e:
+                logging.error(f"History feed listener {callback} failed: {e}")
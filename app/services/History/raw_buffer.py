@@ -0,0 +1,264 @@
+"""
+server/app/services/History/raw_buffer.py
+Fixed-capacity ring buffer used as WindowHistory.raw_history.
+Core's record objects are kept as they are (their repeated app / status /
+window type strings are interned) and indexed per app, so memory stays
+flat and `app=` tail queries never scan the buffer.
+"""
+import sys
+import threading
+from bisect import bisect_right
+from collections import deque
+from collections.abc import MutableSequence
+from itertools import islice
+
+_INTERNED = ("app", "status", "window_type")
+
+
+def compact_record(record):
+    """Intern the low-cardinality strings of a record in place; returns the record."""
+    for name in _INTERNED:
+        value = getattr(record, name, None)
+        if type(value) is str:
+            try:
+                setattr(record, name, sys.intern(value))
+            except AttributeError:  # frozen / slotted record: keep the original string
+                return record
+    return record
+
+
+def record_to_dict(record):
+    """JSON-ready dict of a tracker record (same as the former `r.__dict__`)."""
+    if isinstance(record, dict):
+        return dict(record)
+    return dict(record.__dict__)
+
+
+class RawHistoryBuffer(MutableSequence):
+    """
+    Ring buffer with the list API (indexing, slicing, append / extend /
+    insert / pop / del / remove, copy, sort, reverse, ==, +) so Core can
+    keep using it as `raw_history`; appending past `capacity` drops the
+    oldest record.
+    Each stored record gets a sequence number; the per-app index keeps the
+    sequence numbers of that app in order and is trimmed as records leave.
+    """
+
+    def __init__(self, capacity, iterable=(), on_append=None):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._lock = threading.RLock()
+        self._reset(list(iterable)[-capacity:])
+        self._on_append = on_append
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    def _reset(self, records, next_seq=None):
+        """Replace the contents; the sequence numbers keep increasing."""
+        records = records[-self.capacity:]
+        next_seq = len(records) if next_seq is None else max(next_seq, len(records))
+        self._slots = [None] * self.capacity
+        self._by_app = {}
+        self._first = self._next_seq = next_seq - len(records)
+        for record in records:
+            self._store(compact_record(record))
+
+    def _store(self, record):
+        if self._next_seq - self._first == self.capacity:
+            self._drop_first()
+        self._slots[self._next_seq % self.capacity] = record
+        self._by_app.setdefault(getattr(record, "app", None), deque()).append(self._next_seq)
+        self._next_seq += 1
+
+    def _drop_first(self):
+        slot = self._first % self.capacity
+        evicted, self._slots[slot] = self._slots[slot], None
+        self._unindex(evicted, left=True)
+        self._first += 1
+
+    def _drop_last(self):
+        self._next_seq -= 1
+        slot = self._next_seq % self.capacity
+        evicted, self._slots[slot] = self._slots[slot], None
+        self._unindex(evicted, left=False)
+        return evicted
+
+    def _unindex(self, record, left):
+        app = getattr(record, "app", None)
+        seqs = self._by_app.get(app)
+        if seqs:
+            seqs.popleft() if left else seqs.pop()
+            if not seqs:
+                del self._by_app[app]
+
+    def _records(self):
+        return [self._slots[seq % self.capacity] for seq in range(self._first, self._next_seq)]
+
+    # ------------------------------------------------------------------
+    # MutableSequence
+    # ------------------------------------------------------------------
+    def __len__(self):
+        return self._next_seq - self._first
+
+    def __getitem__(self, index):
+        with self._lock:
+            if isinstance(index, slice):
+                return [self._slots[(self._first + i) % self.capacity] for i in range(*index.indices(len(self)))]
+            return self._slots[(self._first + self._position(index)) % self.capacity]
+
+    def __setitem__(self, index, value):
+        with self._lock:
+            records = self._records()
+            if isinstance(index, slice):
+                records[index] = list(value)
+            else:
+                records[self._position(index)] = value
+            self._reset(records, self._next_seq)
+
+    def __delitem__(self, index):
+        with self._lock:
+            if not isinstance(index, slice):
+                position = self._position(index)
+                if position == 0:
+                    return self._drop_first()
+                if position == len(self) - 1:
+                    return self._drop_last()
+            records = self._records()
+            del records[index]
+            self._reset(records, self._next_seq)
+
+    def insert(self, index, value):
+        with self._lock:
+            records = self._records()
+            records.insert(index, value)
+            self._reset(records, self._next_seq + 1)
+
+    def _position(self, index):
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("raw history index out of range")
+        return index
+
+    def append(self, record):
+        record = compact_record(record)
+        with self._lock:
+            self._store(record)
+        if self._on_append:
+            self._on_append(record)
+
+    def extend(self, records):
+        for record in list(records):
+            self.append(record)
+
+    def pop(self, index=-1):
+        with self._lock:
+            if not len(self):
+                raise IndexError("pop from empty raw history")
+            record = self[index]
+            del self[index]
+            return record
+
+    def clear(self):
+        with self._lock:
+            self._reset([], self._next_seq)
+
+    # list-only methods Core may use on raw_history
+    def copy(self):
+        with self._lock:
+            return self._records()
+
+    def reverse(self):
+        with self._lock:
+            self._reset(self._records()[::-1], self._next_seq)
+
+    def sort(self, *, key=None, reverse=False):
+        with self._lock:
+            self._reset(sorted(self._records(), key=key, reverse=reverse), self._next_seq)
+
+    def __iter__(self):
+        return iter(self.copy())
+
+    def __reversed__(self):
+        return reversed(self.copy())
+
+    def __eq__(self, other):
+        if isinstance(other, (list, RawHistoryBuffer)):
+            return self.copy() == list(other)
+        return NotImplemented
+
+    def __add__(self, other):
+        return self.copy() + list(other)
+
+    def __radd__(self, other):
+        return list(other) + self.copy()
+
+    def __repr__(self):
+        return f"RawHistoryBuffer(capacity={self.capacity}, len={len(self)})"
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def tail(self, limit=None, app=None):
+        """
+        Same records as the former `raw_history[-limit:] if limit else raw_history`,
+        filtered by `app` afterwards. Oldest first.
+        """
+        return [record for _, record in self.items(limit, app)]
+
+    def items(self, limit=None, app=None, after_seq=None):
+        """
+        [(seq, record)] oldest first.
+        Without `after_seq` this is `raw_history[-limit:]` (everything when
+        limit is 0 / None) filtered by `app`; with it, the first `limit`
+        records whose sequence number is greater (keyset paging).
+        """
+        with self._lock:
+            if after_seq is not None:
+                if app is not None:
+                    # the app's index is ascending: binary search, then slice from there
+                    index = self._by_app.get(app, ())
+                    start = bisect_right(index, after_seq)
+                    seqs = list(islice(index, start, start + max(0, limit) if limit else None))
+                else:
+                    seqs = range(max(self._first, after_seq + 1), self._next_seq)
+                    if limit:
+                        seqs = seqs[:max(0, limit)]
+            else:
+                window = range(self._first, self._next_seq)
+                if limit:
+                    window = window[-limit:]
+                if app is None:
+                    seqs = window
+                else:
+                    # walk the app's index back to the start of the window
+                    seqs = []
+                    for seq in reversed(self._by_app.get(app, ())):
+                        if seq < window.start:
+                            break
+                        seqs.append(seq)
+                    seqs.reverse()
+            return [(seq, self._slots[seq % self.capacity]) for seq in seqs]
+
+    def seq_before_time(self, ts, key):
+        """
+        Sequence number of the last record with key(record) <= ts (binary search,
+        timestamps are appended in order). first_seq - 1 when every record is newer.
+        """
+        with self._lock:
+            lo, hi = self._first, self._next_seq
+            while lo < hi:
+                mid = (lo + hi) // 2
+                value = key(self._slots[mid % self.capacity])
+                if value is not None and value <= ts:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            return lo - 1
+
+    def apps(self):
+        with self._lock:
+            return {app: len(seqs) for app, seqs in self._by_app.items()}
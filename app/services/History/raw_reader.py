@@ -0,0 +1,190 @@
+"""
+server/app/services/History/raw_reader.py
+Raw window records for /raw?source=database across the places they live,
+oldest first: the archive of WindowHistory's table (one record per
+run-length span, with duration and samples), then WindowHistory's own
+table (streamed). Each tier covers the time from its first record to the
+start of the next one, so a sample stored twice is read once.
+Every tier is read with a time-ranged, limited query. When Core's table
+is not known the records come from WindowHistory.get_raw_history_from_db,
+as before the tiers existed: a newest-`limit` page is one call with the
+limit, a keyset page filters the list Core returns. Records are dicts;
+raw_record_to_dict gives every tier's timestamps the form jsonify gave
+Core's records.
+"""
+from collections import deque
+from datetime import datetime, timedelta
+from functools import partial
+from itertools import islice
+from types import SimpleNamespace
+
+from app.services.History.raw_buffer import record_to_dict
+from app.services.History.rollups import record_time
+
+
+class HistoryRangeUnavailable(ValueError):
+    """The requested records are only in Core's table, which is not known, and there is no WindowHistory."""
+
+
+def _parse(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) and value else None
+
+
+def raw_record_to_dict(record):
+    """
+    JSON-ready dict of a record from any tier. A timestamp read back as text
+    (archive, textual column) becomes a datetime again, so it is encoded like
+    the datetimes of Core's records were by jsonify.
+    """
+    row = record_to_dict(record)
+    if isinstance(row.get("timestamp"), str):
+        row["timestamp"] = record_time(SimpleNamespace(timestamp=row["timestamp"])) or row["timestamp"]
+    return row
+
+
+class RawRecordReader:
+    def __init__(self, core=None, core_archive=None, history=None):
+        """
+        `core` is a CoreRawTable (None: no Core records), `core_archive`
+        the RawSampleArchive of Core's table and `history` the WindowHistory
+        read when Core's table is not known.
+        """
+        self.core = core
+        self.core_archive = core_archive
+        self.history = history
+
+    # ------------------------------------------------------------------
+    # Tiers
+    # ------------------------------------------------------------------
+    def _tiers(self):
+        """[(start, read)] oldest first; read is None when Core's records cannot be read at all."""
+        tiers = []
+        if self.core is not None:
+            if self.core.table is None:
+                tiers.append((datetime.min, self._from_history if self.history is not None else None))
+            else:
+                if self.core_archive is not None:
+                    tiers.append((_parse(self.core_archive.archived_from),
+                                  partial(self._archived, self.core_archive)))
+                tiers.append((self.core.first_timestamp(), self.core.iter_records))
+        return [(start, read) for start, read in tiers if start is not None]
+
+    def _ranges(self, after=None, before=None):
+        """[(read, end)] of the tiers holding records with after < timestamp < before."""
+        tiers = self._tiers()
+        ranges = []
+        for i, (start, read) in enumerate(tiers):
+            # a later tier wins where they overlap
+            end = min((later for later, _ in tiers[i + 1:]), default=None)
+            if before is not None:
+                end = before if end is None else min(end, before)
+            if end is not None and (end <= start or (after is not None and end <= after)):
+                continue
+            ranges.append((read, end))
+        return ranges
+
+    @staticmethod
+    def _archived(archive, after=None, before=None, app=None, limit=None, newest=False):
+        after_iso = after.isoformat() if after else None
+        before_iso = before.isoformat() if before else None
+        samples = (s for s in archive.iter_samples(after, before, app)
+                   if (after_iso is None or s["timestamp"] > after_iso)
+                   and (before_iso is None or s["timestamp"] < before_iso))
+        if newest and limit:
+            return list(deque(samples, maxlen=limit))
+        return islice(samples, limit) if limit else samples
+
+    def _from_history(self, after=None, before=None, app=None, limit=None, newest=False):
+        """Core's records through get_raw_history_from_db, same contract as the other tiers."""
+        if newest and limit and after is None and before is None:
+            records = sorted(self.history.get_raw_history_from_db(limit, app) or [],
+                             key=lambda r: record_time(r) or datetime.min)
+            return [record_to_dict(r) for r in records]
+        records = self.history.get_raw_history_from_db(None, app) or []
+        if len(records) > 1 and (record_time(records[0]) or datetime.max) > (record_time(records[-1]) or datetime.min):
+            records = reversed(records)  # Core's list is newest first: walk it in place
+        records = (record_to_dict(r) for r, ts in ((r, record_time(r)) for r in records)
+                   if ts is not None and (after is None or ts > after) and (before is None or ts < before))
+        if newest and limit:
+            return list(deque(records, maxlen=limit))
+        return islice(records, limit) if limit else records
+
+    def _oldest(self, app, after=None, before=None, limit=None):
+        """First `limit` records after `after`, streamed tier by tier."""
+        ranges = self._ranges(after, before)
+        if any(read is None for read, _ in ranges):
+            raise HistoryRangeUnavailable("These records are only in Core's table, which is not known")
+
+        def generate():
+            remaining = limit
+            for read, end in ranges:
+                for record in read(after, end, app, remaining):
+                    yield record
+                    if remaining is not None:
+                        remaining -= 1
+                if remaining == 0:
+                    return
+
+        return generate()
+
+    def _newest(self, app, before, limit):
+        """The newest `limit` records before `before`, oldest first."""
+        pages = []
+        for read, end in reversed(self._ranges(None, before)):
+            if read is None:
+                raise HistoryRangeUnavailable("These records are only in Core's table, which is not known")
+            page = list(read(None, end, app, limit, True))
+            pages.append(page)
+            limit -= len(page)
+            if limit <= 0:
+                break
+        return [record for page in reversed(pages) for record in page]
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def page(self, limit=None, app=None, after=None, after_id=None):
+        """
+        (records, next_key). With `after` the `limit` records after that
+        timestamp, otherwise the newest `limit` (everything, streamed, when
+        limit is None). next_key is (timestamp, 0) of the last record (None
+        when it is not known up front). `after_id` is accepted for the keys
+        of older clients and ignored: Core's records are paged by timestamp.
+        """
+        if after is not None:
+            records = self._oldest(app, _parse(after), None, limit)
+            if not limit:
+                return records, None
+            records = list(records)
+            return iter(records), _key(records[-1]) if records else None
+        if not limit:
+            return self._oldest(app), None
+        records = self._newest(app, None, limit)
+        return iter(records), _key(records[-1]) if records else None
+
+    def samples_between(self, start, end, app=None):
+        """
+        Sample rows with start <= timestamp < end for exports, oldest first:
+        the archive's spans, then Core's records (only when its table is
+        known). Every row has duration and samples (one sampling interval
+        and 1 for single records).
+        """
+        interval = self.core_archive.interval if self.core_archive is not None else 1
+        after = start - timedelta(microseconds=1)
+        return (_sample_row(record, interval) for read, tier_end in self._ranges(after, end)
+                if read is not None for record in read(after, tier_end, app))
+
+
+def _sample_row(record, interval):
+    """A Core record or archived span in the samples export layout."""
+    if "samples" in record:
+        return record
+    ts = record_time(SimpleNamespace(timestamp=record.get("timestamp")))
+    return {"id": None, "timestamp": ts.isoformat() if ts else None, "app": record.get("app"),
+            "title": record.get("title"), "status": record.get("status"),
+            "window_type": record.get("window_type"), "duration": interval, "samples": 1}
+
+
+def _key(record):
+    ts = record_time(SimpleNamespace(timestamp=record.get("timestamp")))
+    return (ts.isoformat() if ts else "", 0)
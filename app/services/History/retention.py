@@ -0,0 +1,280 @@
+"""
+server/app/services/History/retention.py
+Retention cleanup for the server-side history tables.
+
+Each policy deletes rows older than its own cutoff in bounded batches
+selected through the table's time index, one short transaction per
+batch with a pause in between, so the tracker's inserts never wait for
+more than one batch. Runs as a background job (manual or scheduled);
+extra steps the caller passes (e.g. Core's own cleanup) run after the
+policies, so a table with a policy reaches them already trimmed, and the
+job ends with an incremental vacuum. auto_vacuum=INCREMENTAL only applies
+to database files created with it, so the first job on an older file
+converts it with one full VACUUM (migrate_vacuum=False leaves that to the
+operator: PRAGMA auto_vacuum=INCREMENTAL; VACUUM;). Vacuum statements run
+on an autocommit connection, outside any transaction.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, text
+
+from app.core.database import get_engine
+
+_AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+class RetentionPolicy:
+    """
+    Rows of `table` whose `column` is older than `days` are deleted.
+    `cutoff(dt)` converts the cutoff datetime into the column's storage
+    format; `where` narrows the policy (e.g. one rollup granularity);
+    `children` are (table, column) pairs keyed by the deleted `key` values;
+    `archive(rows)` receives each batch (dicts of `columns`) before it is deleted.
+    """
+
+    def __init__(self, name, table, column, days, cutoff=lambda dt: dt.timestamp(),
+                 where=None, key=None, children=(), archive=None, columns=()):
+        self.name = name
+        self.table = table
+        self.column = column
+        self.days = days
+        self.cutoff = cutoff
+        self.where = where
+        self.key = key
+        self.children = children
+        self.archive = archive
+        self.columns = columns
+
+    def as_dict(self):
+        return {"name": self.name, "table": self.table, "column": self.column, "days": self.days,
+                "archived": self.archive is not None}
+
+
+class RetentionManager:
+    def __init__(self, database_url, policies, batch_size=2000, pause=0.05, vacuum_pages=2000, max_jobs=20,
+                 migrate_vacuum=True):
+        self.engine = get_engine(database_url)
+        self.policies = OrderedDict((p.name, p) for p in policies)
+        self.batch_size = batch_size
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self.migrate_vacuum = migrate_vacuum
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._running = None
+        self._schedule = None
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+    def start(self, days=None, names=None, steps=()):
+        """
+        Start a cleanup job (returns the running one if a cleanup is in progress).
+        `names` selects the policies (None = all of them, [] = none); `days`
+        overrides the selected policies only, for this run.
+        `steps` are (name, callable) pairs run after the policies, each reported as its own step.
+        """
+        names = list(self.policies) if names is None else list(names)
+        unknown = [n for n in names if n not in self.policies]
+        if unknown:
+            raise ValueError(f"Unknown retention policies: {unknown}")
+        with self._lock:
+            if self._running is not None:
+                return self._copy(self._jobs[self._running])
+            job = {
+                "job_id": uuid.uuid4().hex[:12],
+                "status": "queued",
+                "created_at": datetime.now().isoformat(),
+                "finished_at": None,
+                "policies": {n: {"days": days if days is not None else self.policies[n].days,
+                                 "deleted": 0, "batches": 0, "status": "pending"} for n in names},
+                "steps": {n: {"status": "pending"} for n, _ in steps},
+                "deleted": 0,
+                "vacuum_migrated": False,
+                "vacuumed_pages": 0,
+                "error": None,
+            }
+            self._jobs[job["job_id"]] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+            self._running = job["job_id"]
+        threading.Thread(target=self._run, args=(job, list(steps)), name="retention", daemon=True).start()
+        return self._copy(job)
+
+    @staticmethod
+    def _copy(job):
+        return {**job, "steps": {n: dict(s) for n, s in job["steps"].items()},
+                "policies": {n: dict(p) for n, p in job["policies"].items()}}
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._copy(job) if job else None
+
+    def jobs(self):
+        with self._lock:
+            return [self._copy(j) for j in reversed(self._jobs.values())]
+
+    def _update(self, record, **fields):
+        with self._lock:
+            record.update(fields)
+
+    def _add(self, record, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                record[name] = record.get(name, 0) + count
+
+    def _run(self, job, steps=()):
+        started = time.perf_counter()
+        try:
+            self._update(job, status="running")
+            for name, progress in job["policies"].items():
+                if not progress["days"]:
+                    self._update(progress, status="skipped")  # 0 / None = keep forever
+                    continue
+                self._update(progress, status="running")
+                self._apply(self.policies[name], progress, job)
+                self._update(progress, status="done")
+            for name, step in steps:
+                progress = job["steps"][name]
+                self._update(progress, status="running")
+                try:
+                    step()
+                except Exception:
+                    self._update(progress, status="failed")
+                    raise
+                self._update(progress, status="done")
+            if self.migrate_vacuum and self.auto_vacuum() not in (None, "incremental"):
+                self._update(job, status="migrating")
+                self._update(job, vacuum_migrated=self.enable_incremental_vacuum())
+            self._update(job, status="vacuuming")
+            self._update(job, vacuumed_pages=self.incremental_vacuum())
+            self._update(job, status="done", duration_sec=round(time.perf_counter() - started, 2))
+            logging.info(f"Retention job {job['job_id']} deleted {job['deleted']} rows")
+        except Exception as e:
+            logging.error(f"Retention job {job['job_id']} failed: {e}")
+            self._update(job, status="failed", error=str(e))
+        finally:
+            with self._lock:
+                job["finished_at"] = datetime.now().isoformat()
+                self._running = None
+
+    # ------------------------------------------------------------------
+    # Batched deletes
+    # ------------------------------------------------------------------
+    def _apply(self, policy, progress, job):
+        cutoff = policy.cutoff(datetime.now() - timedelta(days=progress["days"]))
+        where = f"{policy.column} < :cutoff" + (f" AND {policy.where}" if policy.where else "")
+        key = policy.key or "rowid"
+        columns = ", ".join([f"{key} AS _key", *policy.columns])
+        # archived batches need a total order (the archive watermark is (column, key))
+        order = f"{policy.column}, {key}" if policy.archive is not None else policy.column
+        select = text(f"SELECT {columns} FROM {policy.table} WHERE {where} ORDER BY {order} LIMIT :batch")
+        delete = text(f"DELETE FROM {policy.table} WHERE {key} IN :keys").bindparams(
+            bindparam("keys", expanding=True))
+        child_deletes = [
+            text(f"DELETE FROM {table} WHERE {column} IN :keys").bindparams(bindparam("keys", expanding=True))
+            for table, column in policy.children
+        ]
+        while True:
+            # expired rows are never updated, so the batch can be read outside the write lock
+            with self.engine.connect() as conn:
+                rows = [dict(r) for r in conn.execute(select, {"cutoff": cutoff, "batch": self.batch_size}).mappings()]
+            if not rows:
+                return
+            if policy.archive is not None:
+                policy.archive(rows)  # written before the rows are deleted
+                self._add(progress, archived=len(rows))
+            keys = [r["_key"] for r in rows]
+            with self.engine.begin() as conn:
+                for statement in child_deletes:
+                    conn.execute(statement, {"keys": keys})
+                conn.execute(delete, {"keys": keys})
+            self._add(progress, deleted=len(keys), batches=1)
+            self._add(job, deleted=len(keys))
+            if len(keys) < self.batch_size:
+                return
+            time.sleep(self.pause)  # let queued writers (tracker, ingest) through
+
+    def auto_vacuum(self):
+        """'none', 'full' or 'incremental' (None when the database is not a SQLite file)."""
+        if not getattr(self.engine, "is_sqlite", False):
+            return None
+        with self.engine.connect() as conn:
+            return _AUTO_VACUUM_MODES.get(conn.exec_driver_sql("PRAGMA auto_vacuum").scalar())
+
+    def enable_incremental_vacuum(self):
+        """
+        One-time conversion of an existing file to auto_vacuum=INCREMENTAL: a full
+        VACUUM rewrites the database (writers wait for it). True when it ran.
+        """
+        if self.auto_vacuum() in (None, "incremental"):
+            return False
+        started = time.perf_counter()
+        with self.engine.autocommit() as conn:
+            conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+        logging.info(f"Database converted to auto_vacuum=INCREMENTAL in {time.perf_counter() - started:.1f}s")
+        return True
+
+    def incremental_vacuum(self):
+        """Return free pages to the OS in steps; only with auto_vacuum=INCREMENTAL."""
+        if self.auto_vacuum() != "incremental":
+            return 0
+        released = 0
+        while True:
+            with self.engine.autocommit() as conn:
+                free = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+                if not free:
+                    return released
+                # executescript steps the pragma to completion (execute() frees a single page);
+                # on the autocommit connection there is no transaction for it to commit
+                conn.connection.driver_connection.executescript(
+                    f"PRAGMA incremental_vacuum({min(free, self.vacuum_pages)});")
+                remaining = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+            if remaining >= free:
+                return released
+            released += free - remaining
+            time.sleep(self.pause)
+
+    def freelist_pages(self):
+        if not getattr(self.engine, "is_sqlite", False):
+            return None
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+
+    # ------------------------------------------------------------------
+    # Schedule
+    # ------------------------------------------------------------------
+    def schedule(self, interval_hours, names=None):
+        """Run the cleanup of `names` (None = every policy) every `interval_hours` (first run after one interval)."""
+        if not interval_hours or self._schedule is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval_hours * 3600)
+                try:
+                    self.start(names=names)
+                except Exception as e:
+                    logging.error(f"Scheduled retention cleanup failed to start: {e}")
+
+        self._schedule = threading.Thread(target=run, name="retention-schedule", daemon=True)
+        self._schedule.start()
+
+    def status(self):
+        return {
+            "policies": [p.as_dict() for p in self.policies.values()],
+            "batch_size": self.batch_size,
+            "pause_sec": self.pause,
+            "running": self._running,
+            "auto_vacuum": self.auto_vacuum(),
+            "free_pages": self.freelist_pages(),
+            "jobs": self.jobs()[:5],
+        }
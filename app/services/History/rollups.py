@@ -0,0 +1,395 @@
+"""
+server/app/services/History/rollups.py
+Pre-aggregated per-app / per-status / per-context totals in hour, day,
+week and month buckets. Updated incrementally from raw samples and
+committed when a session closes, so the usage and context endpoints
+never rescan history. The backfill and the exact edges of a window read
+Core's raw table (and its archive), so the store is only ready when
+that table is known; until then the endpoints ask Core.
+
+The seconds are WindowHistory's session arithmetic: a session runs from
+its first sample to its last, and ends when the app changes or two
+samples are more than the session gap apart. So the time between two
+consecutive samples of the same app, at most max_gap apart, is credited
+to the earlier sample's app / status / context; a switch to another app
+or a longer gap credits nothing. One difference remains: a period total
+splits a session at the bucket boundary, where Core counts the whole
+session in the period it started in.
+"""
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import text
+
+from app.core.database import get_engine
+from app.services.History.archive import span_samples
+
+GRANULARITIES = ("hour", "day", "week", "month")
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS rollup_buckets (
+        granularity  TEXT NOT NULL,
+        bucket_start TEXT NOT NULL,
+        app_name     TEXT NOT NULL,
+        status       TEXT NOT NULL,
+        context      TEXT NOT NULL,
+        seconds      REAL NOT NULL DEFAULT 0,
+        samples      INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (granularity, bucket_start, app_name, status, context)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_meta (
+        key   TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """,
+)
+
+_UPSERT = text("""
+    INSERT INTO rollup_buckets (granularity, bucket_start, app_name, status, context, seconds, samples)
+    VALUES (:granularity, :bucket_start, :app_name, :status, :context, :seconds, :samples)
+    ON CONFLICT (granularity, bucket_start, app_name, status, context)
+    DO UPDATE SET seconds = seconds + excluded.seconds,
+                  samples = samples + excluded.samples
+""")
+
+
+# ------------------------------------------------------------------
+# Record / bucket helpers
+# ------------------------------------------------------------------
+def record_time(record):
+    """Return the record timestamp as a naive datetime (None if missing)."""
+    value = getattr(record, "timestamp", None)
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+
+def record_key(record):
+    """(app, status, context) triple used as rollup dimensions."""
+    context = getattr(record, "context", None) or getattr(record, "window_type", None)
+    return (
+        getattr(record, "app", None) or "unknown",
+        getattr(record, "status", None) or "unknown",
+        context or "unknown",
+    )
+
+
+def bucket_start(granularity, ts):
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def period_bounds(period, offset=0, now=None):
+    """(start, end) of the period `offset` steps back from now."""
+    now = now or datetime.now()
+    start = bucket_start(period, now)
+    if period == "hour":
+        start -= timedelta(hours=offset)
+        return start, start + timedelta(hours=1)
+    if period == "day":
+        start -= timedelta(days=offset)
+        return start, start + timedelta(days=1)
+    if period == "week":
+        start -= timedelta(weeks=offset)
+        return start, start + timedelta(weeks=1)
+    if period == "month":
+        month_index = start.year * 12 + start.month - 1 - offset
+        start = start.replace(year=month_index // 12, month=month_index % 12 + 1)
+        next_index = month_index + 1
+        return start, start.replace(year=next_index // 12, month=next_index % 12 + 1)
+    raise ValueError(f"Unknown period: {period}")
+
+
+class _Accumulator:
+    """Turns an ordered stream of raw samples into bucket deltas."""
+
+    def __init__(self, max_gap):
+        self.max_gap = max_gap
+        self.pending = defaultdict(lambda: [0.0, 0])
+        self.last = None
+
+    def add(self, record):
+        ts = record_time(record)
+        if ts is None:
+            return
+        previous, self.last = self.last, (ts, record_key(record))
+        if previous is None:
+            return
+        prev_ts, prev_key = previous
+        delta = (ts - prev_ts).total_seconds()
+        if delta <= 0 or delta > self.max_gap or prev_key[0] != self.last[1][0]:
+            return
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(granularity, prev_ts).isoformat()
+            entry = self.pending[(granularity, bucket) + prev_key]
+            entry[0] += delta
+            entry[1] += 1
+
+    def drain(self):
+        pending, self.pending = self.pending, defaultdict(lambda: [0.0, 0])
+        return pending
+
+
+class RebuildRunning(Exception):
+    """A rollup rebuild is already in progress."""
+
+
+class RollupStore:
+    """
+    Incremental rollup tables stored next to the tracker data.
+
+    Samples are accumulated in memory (tracker thread, O(1) per sample)
+    and written as one batch of upserts when a session closes.
+    """
+
+    def __init__(self, database_url, max_gap_seconds=30, core=None, core_archive=None, flush_samples=None):
+        """
+        `core` is the CoreRawTable the backfill streams WindowHistory's records
+        from, `core_archive` the RawSampleArchive its older records moved to.
+        `flush_samples` drains the write-behind queue into Core's table, so a
+        rebuild sees every sample taken before it starts.
+        """
+        self.engine = get_engine(database_url)
+        self.max_gap = max_gap_seconds
+        self.core = core
+        self.core_archive = core_archive
+        self.flush_samples = flush_samples
+        self._live = _Accumulator(max_gap_seconds)
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()  # one rebuild at a time
+        self._job = None  # latest background rebuild
+        self._ready = None
+        with self.engine.begin() as conn:
+            for statement in _SCHEMA:
+                conn.execute(text(statement))
+
+    # -------------------------- ingest -----------------------------
+    def add_sample(self, record):
+        with self._lock:
+            self._live.add(record)
+
+    def on_session_closed(self, _session=None):
+        self.flush()
+
+    def flush(self):
+        """Write pending deltas to the rollup tables."""
+        with self._lock:
+            pending = self._live.drain()
+        self._write(pending)
+
+    def _write(self, pending):
+        if not pending:
+            return
+        rows = [
+            {
+                "granularity": granularity, "bucket_start": bucket,
+                "app_name": app, "status": status, "context": context,
+                "seconds": seconds, "samples": samples,
+            }
+            for (granularity, bucket, app, status, context), (seconds, samples) in pending.items()
+        ]
+        with self.engine.begin() as conn:
+            conn.execute(_UPSERT, rows)
+
+    # -------------------------- rebuild ----------------------------
+    @property
+    def has_source(self):
+        """Core's raw table is known (the rollups can be built and read)."""
+        return self.core is not None and self.core.table is not None
+
+    def start_rebuild(self):
+        """Rebuild on a worker thread; returns the job. Raises RebuildRunning if one is in progress."""
+        if not self._rebuild_lock.acquire(blocking=False):
+            raise RebuildRunning("A rollup rebuild is already running")
+        job = {"job_id": uuid.uuid4().hex[:12], "status": "running", "records": None,
+               "started_at": datetime.now().isoformat(), "finished_at": None, "error": None}
+        with self._lock:
+            self._job = job
+
+        def run():
+            try:
+                count = self._rebuild()
+                fields = {"status": "done", "records": count}
+            except Exception as e:
+                logging.error(f"Rollup rebuild failed: {e}")
+                fields = {"status": "failed", "error": str(e)}
+            finally:
+                self._rebuild_lock.release()
+            with self._lock:
+                job.update(fields, finished_at=datetime.now().isoformat())
+
+        threading.Thread(target=run, name="rollup-rebuild", daemon=True).start()
+        return dict(job)
+
+    def rebuild_job(self):
+        """The latest background rebuild (None before the first)."""
+        with self._lock:
+            return dict(self._job) if self._job else None
+
+    def rebuild(self, batch_size=5000):
+        """Rebuild in the calling thread. Raises RebuildRunning if one is in progress."""
+        if not self._rebuild_lock.acquire(blocking=False):
+            raise RebuildRunning("A rollup rebuild is already running")
+        try:
+            return self._rebuild(batch_size)
+        finally:
+            self._rebuild_lock.release()
+
+    def _rebuild(self, batch_size=5000):
+        """
+        Backfill the rollups from the stored raw records, oldest first.
+        The archive of Core's table and then Core's table are streamed,
+        archived spans as evenly spaced samples; deltas are written every
+        `batch_size` records, so memory stays bounded by the bucket count.
+        Samples still in the write-behind queue are flushed first; the live
+        buckets start at the first sample after that, which the backfill ends on.
+        """
+        if not self.has_source:
+            logging.warning("Rollups not rebuilt: Core's raw record table is unknown")
+            return 0
+        with self._lock:
+            # readers fall back to WindowHistory meanwhile; samples from now on go to the live buckets
+            self._ready = False
+            with self.engine.begin() as conn:
+                conn.execute(text("DELETE FROM rollup_buckets"))
+                conn.execute(text("DELETE FROM rollup_meta WHERE key = 'backfilled_at'"))
+            until = datetime.now()
+            if self.flush_samples is not None:
+                self.flush_samples()
+            self._live = _Accumulator(self.max_gap)
+
+        backfill = _Accumulator(self.max_gap)
+        count = 0
+        for record in self._raw_records(until):
+            backfill.add(record)
+            count += 1
+            if count % batch_size == 0:
+                self._write(backfill.drain())
+        self._write(backfill.drain())
+        with self._lock:
+            self._set_meta("backfilled_at", datetime.now().isoformat())
+            self._ready = True
+        logging.info(f"Rollups rebuilt from {count} raw records")
+        return count
+
+    def _raw_records(self, until):
+        """Raw records older than `until`, oldest first: Core's archive, then Core's table."""
+        first = min(self.core.first_timestamp() or until, until)
+        if self.core_archive is not None:
+            for span in self.core_archive.iter_spans(None, first):
+                for sample in span_samples(span, self.core_archive.interval):
+                    if sample["timestamp"] < first.isoformat():
+                        yield SimpleNamespace(**sample)
+        yield from (SimpleNamespace(**record) for record in self.core.iter_records(before=until))
+
+    def ensure_backfilled(self):
+        if self.has_source and not self.is_ready():
+            try:
+                self.rebuild()
+            except RebuildRunning:
+                pass  # the running rebuild backfills
+
+    def is_ready(self):
+        if not self.has_source:
+            return False
+        if self._ready is None:
+            self._ready = self._get_meta("backfilled_at") is not None
+        return self._ready
+
+    def _get_meta(self, key):
+        with self.engine.connect() as conn:
+            row = conn.execute(text("SELECT value FROM rollup_meta WHERE key = :key"), {"key": key}).first()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("INSERT INTO rollup_meta (key, value) VALUES (:key, :value) "
+                     "ON CONFLICT (key) DO UPDATE SET value = excluded.value"),
+                {"key": key, "value": value},
+            )
+
+    # -------------------------- queries ----------------------------
+    def _bucket_rows(self, granularity, starts):
+        """[(bucket_start, app, status, context, seconds)] for the given buckets, pending included."""
+        starts = [s.isoformat() for s in starts]
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text("SELECT bucket_start, app_name, status, context, seconds FROM rollup_buckets "
+                     "WHERE granularity = :granularity AND bucket_start >= :first AND bucket_start <= :last"),
+                {"granularity": granularity, "first": min(starts), "last": max(starts)},
+            ).all()
+        wanted = set(starts)
+        rows = [tuple(r) for r in rows if r[0] in wanted]
+        with self._lock:
+            for (g, bucket, app, status, context), (seconds, _) in self._live.pending.items():
+                if g == granularity and bucket in wanted:
+                    rows.append((bucket, app, status, context, seconds))
+        return rows
+
+    def usage_by_period(self, period, offset=0, now=None):
+        """{app: seconds} for a day / week / month period."""
+        start, _ = period_bounds(period, offset, now)
+        usage = defaultdict(float)
+        for _, app, _, _, seconds in self._bucket_rows(period, [start]):
+            usage[app] += seconds
+        return dict(usage)
+
+    def context_breakdown(self, app_name, hours=24, now=None):
+        """
+        {context: seconds} for one app over exactly the last `hours`: hour
+        buckets from the first whole hour in the window, Core's table for the
+        part of the hour before it.
+        """
+        now = now or datetime.now()
+        start = now - timedelta(hours=hours)
+        first = bucket_start("hour", start)
+        if first < start:
+            first += timedelta(hours=1)
+        contexts = defaultdict(float)
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text("SELECT context, SUM(seconds) FROM rollup_buckets "
+                     "WHERE granularity = 'hour' AND bucket_start >= :first AND app_name = :app "
+                     "GROUP BY context"),
+                {"first": first.isoformat(), "app": app_name},
+            ).all()
+        for context, seconds in rows:
+            contexts[context] += seconds
+        with self._lock:
+            for (g, bucket, app, _, context), (seconds, _) in self._live.pending.items():
+                if g == "hour" and app == app_name and bucket >= first.isoformat():
+                    contexts[context] += seconds
+        if first > start:
+            # a delta belongs to its earlier sample, so read max_gap past the whole hour
+            partial = _Accumulator(self.max_gap)
+            records = self.core.iter_records(after=start - timedelta(microseconds=1),
+                                             before=first + timedelta(seconds=self.max_gap))
+            for record in records:
+                partial.add(SimpleNamespace(**record))
+            for (g, bucket, app, _, context), (seconds, _) in partial.drain().items():
+                if g == "hour" and app == app_name and bucket < first.isoformat():
+                    contexts[context] += seconds
+        return dict(contexts)
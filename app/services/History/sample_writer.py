@@ -0,0 +1,134 @@
+"""
+server/app/services/History/sample_writer.py
+Write-behind persistence of Core's raw window records.
+
+CoreRawTable (core_raw.py) takes Core's pending raw record out of its
+session flush and queues the record's column values here; a writer
+thread inserts them into Core's own table in bulk `executemany` batches
+on a size or time threshold. The tracker thread no longer commits a row
+every tick, and every sample is still stored once, in Core's table.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from app.core.database import get_engine
+
+
+class SampleWriter:
+    """
+    Bounded write-behind queue in front of Core's raw record table.
+    Nothing is ever dropped: once the queue is half full, or the last flush
+    failed, healthy() turns false and Core goes back to writing its own rows.
+    """
+
+    def __init__(self, database_url, batch_size=500, flush_interval=5.0, max_queue=100_000):
+        self.engine = get_engine(database_url)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+
+        self._queue = deque()  # (table, {column: value})
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._failing = False  # the last flush raised
+        self._stats = {
+            "written": 0,
+            "batches": 0,
+            "errors": 0,
+            "last_flush_ms": None,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+            "last_flush_at": None,
+        }
+
+        self._thread = threading.Thread(target=self._run, name="sample-writer", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Producer side (tracker thread)
+    # ------------------------------------------------------------------
+    def enqueue(self, table, row):
+        with self._cond:
+            self._queue.append((table, row))
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+
+    def healthy(self):
+        """
+        True while a queued row is certain to be written: the last flush
+        succeeded and the queue is well below its bound.
+        """
+        with self._cond:
+            depth = len(self._queue)
+        return not self._failing and depth < self.max_queue // 2
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._queue) >= self.batch_size, timeout=self.flush_interval)
+            try:
+                self._flush_batch()
+            except Exception as e:
+                logging.error(f"Sample writer flush failed: {e}")
+
+    def _flush_batch(self):
+        with self._write_lock:
+            with self._cond:
+                count = min(len(self._queue), self.batch_size)
+                batch = [self._queue.popleft() for _ in range(count)]
+            if not batch:
+                return 0
+
+            # one executemany per table and column set, in queue order
+            groups = {}
+            for table, row in batch:
+                groups.setdefault((table, tuple(sorted(row))), []).append(row)
+
+            started = time.perf_counter()
+            try:
+                with self.engine.begin() as conn:
+                    for (table, _), rows in groups.items():
+                        conn.execute(table.insert(), rows)
+            except Exception:
+                # Put the batch back in front so nothing is lost on a transient error
+                with self._cond:
+                    self._queue.extendleft(reversed(batch))
+                self._stats["errors"] += 1
+                self._failing = True
+                raise
+            self._failing = False
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._stats["written"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["last_flush_ms"] = round(elapsed_ms, 3)
+            self._stats["max_flush_ms"] = round(max(self._stats["max_flush_ms"], elapsed_ms), 3)
+            self._stats["total_flush_ms"] += elapsed_ms
+            self._stats["last_flush_at"] = time.time()
+            return len(batch)
+
+    def flush(self):
+        """Synchronously drain the whole queue (stop / shutdown, rollup rebuilds)."""
+        while self._flush_batch():
+            pass
+
+    def stats(self):
+        with self._cond:
+            depth = len(self._queue)
+        stats = dict(self._stats)
+        batches = stats.pop("batches")
+        total_ms = stats.pop("total_flush_ms")
+        stats.update({
+            "queue_depth": depth,
+            "healthy": not self._failing and depth < self.max_queue // 2,
+            "batches": batches,
+            "avg_flush_ms": round(total_ms / batches, 3) if batches else None,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+        })
+        return stats
@@ -0,0 +1,350 @@
+"""
+server/app/services/History/session_store.py
+Indexed storage for closed tracker sessions.
+
+The session table holds only the summary columns the list endpoints
+return, with composite indexes on (start_time) and (app_name, start_time),
+so period / app reads are index range scans. titles_seen live in a side
+table and only the tail that is asked for is loaded; status_changes live
+in another, loaded only when the response includes them. The rest of the
+/sessions dict is stored per session as a JSON document built exactly
+like the Core-backed endpoint builds it; datetimes and dates are tagged
+so they decode back to the same objects, and jsonify() of a stored
+session gives the same bytes as before.
+"""
+import dataclasses
+import json
+import logging
+import threading
+from datetime import date, datetime
+
+from sqlalchemy import bindparam, text
+
+from app.core.database import get_engine
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS session_index (
+        session_id       TEXT PRIMARY KEY,
+        app_name         TEXT NOT NULL,
+        start_time       REAL NOT NULL,
+        end_time         REAL,
+        total_duration   REAL NOT NULL DEFAULT 0,
+        context_changes  INTEGER NOT NULL DEFAULT 0,
+        window_count     INTEGER NOT NULL DEFAULT 0,
+        title_count      INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_session_index_start ON session_index (start_time)",
+    "CREATE INDEX IF NOT EXISTS ix_session_index_app_start ON session_index (app_name, start_time)",
+    # Core's sessions carry no productivity status to index (the column stays NULL in older files)
+    "DROP INDEX IF EXISTS ix_session_index_status_start",
+    """
+    CREATE TABLE IF NOT EXISTS session_titles (
+        session_id  TEXT NOT NULL,
+        seq         INTEGER NOT NULL,
+        title       TEXT,
+        PRIMARY KEY (session_id, seq)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS session_documents (
+        session_id  TEXT PRIMARY KEY,
+        payload     TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS session_status_log (
+        session_id  TEXT PRIMARY KEY,
+        payload     TEXT NOT NULL
+    )
+    """,
+    # per-change rows of the first version of this store (lossy encoding)
+    "DROP TABLE IF EXISTS session_status_changes",
+)
+
+SUMMARY_COLUMNS = ("session_id", "app_name", "start_time", "end_time",
+                   "total_duration", "context_changes", "window_count", "title_count")
+
+_UPSERT = text(f"""
+    INSERT OR REPLACE INTO session_index ({', '.join(SUMMARY_COLUMNS)})
+    VALUES ({', '.join(':' + c for c in SUMMARY_COLUMNS)})
+""")
+
+_ID_CHUNK = 500
+
+
+def _epoch(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts).isoformat() if ts is not None else None
+
+
+def _pack(value):
+    """Dicts with non-string keys become tagged item lists (JSON would stringify the keys)."""
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value):
+            return {k: _pack(v) for k, v in value.items()}
+        return {"$items": [[k, _pack(v)] for k, v in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return [_pack(v) for v in value]
+    return value
+
+
+def _tag(value):
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return _pack(dataclasses.asdict(value))
+    return str(value)
+
+
+def _untag(obj):
+    if len(obj) == 1:
+        if "$datetime" in obj:
+            return datetime.fromisoformat(obj["$datetime"])
+        if "$date" in obj:
+            return date.fromisoformat(obj["$date"])
+        if "$items" in obj:
+            return {_hashable(k): v for k, v in obj["$items"]}
+    return obj
+
+
+def _hashable(key):
+    return tuple(_hashable(k) for k in key) if isinstance(key, list) else key
+
+
+def encode_document(document):
+    return json.dumps(_pack(document), default=_tag)
+
+
+def decode_document(payload):
+    return json.loads(payload, object_hook=_untag)
+
+
+def session_document(session):
+    """The /sessions dict of a session (as the Core-backed endpoint builds it), without titles_seen."""
+    return {
+        "session_id": session.session_id,
+        "app_name": session.app_name,
+        "start_time": session.start_time.isoformat(),
+        "end_time": session.end_time.isoformat() if session.end_time else None,
+        "total_duration": session.total_duration,
+        "duration_minutes": session.duration_minutes,
+        "context_changes": session.context_changes,
+        "status_changes": session.status_changes,
+        "window_count": session.window_count,
+        "is_active": session.is_active,
+    }
+
+
+def session_summary(session):
+    """Index row (plus titles and document) for an in-memory session object."""
+    titles = list(getattr(session, "titles_seen", None) or [])
+    return {
+        "session_id": str(session.session_id),
+        "app_name": session.app_name,
+        "start_time": _epoch(session.start_time),
+        "end_time": _epoch(session.end_time),
+        "total_duration": session.total_duration or 0,
+        "context_changes": session.context_changes or 0,
+        "window_count": session.window_count or 0,
+        "title_count": len(titles),
+        "_titles": titles,
+        "_document": session_document(session),
+    }
+
+
+def to_response(document, titles=None, status_changes=True):
+    """/sessions entry: the stored document with the requested titles_seen tail."""
+    response = {**document, "titles_seen": titles if titles is not None else []}
+    if not status_changes:
+        response["status_changes"] = []
+    return response
+
+
+class SessionStore:
+    def __init__(self, database_url):
+        self.engine = get_engine(database_url)
+        self._lock = threading.Lock()
+        with self.engine.begin() as conn:
+            for statement in _SCHEMA:
+                conn.execute(text(statement))
+            # decided before any live session is added, so a first start still backfills
+            # (also when only index rows without documents exist)
+            self._ready = conn.execute(text("SELECT 1 FROM session_documents LIMIT 1")).first() is not None
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+    def add(self, session):
+        """Store a closed session (feed on_session_closed callback)."""
+        if session is None:
+            return
+        self.add_many([session])
+
+    def add_many(self, sessions):
+        rows = [session_summary(s) for s in sessions]
+        if not rows:
+            return 0
+        ids = [{"session_id": r["session_id"]} for r in rows]
+        titles = [{"session_id": r["session_id"], "seq": i, "title": t}
+                  for r in rows for i, t in enumerate(r["_titles"])]
+        # status_changes go to their own table; the document keeps the key (None) for the field order
+        documents = [{"session_id": r["session_id"],
+                      "payload": encode_document({**r["_document"], "status_changes": None})} for r in rows]
+        changes = [{"session_id": r["session_id"], "payload": encode_document(r["_document"]["status_changes"])}
+                   for r in rows]
+        with self._lock, self.engine.begin() as conn:
+            conn.execute(_UPSERT, [{c: r[c] for c in SUMMARY_COLUMNS} for r in rows])
+            conn.execute(text("DELETE FROM session_titles WHERE session_id = :session_id"), ids)
+            if titles:
+                conn.execute(text("INSERT INTO session_titles (session_id, seq, title) "
+                                  "VALUES (:session_id, :seq, :title)"), titles)
+            conn.execute(text("INSERT OR REPLACE INTO session_documents (session_id, payload) "
+                              "VALUES (:session_id, :payload)"), documents)
+            conn.execute(text("INSERT OR REPLACE INTO session_status_log (session_id, payload) "
+                              "VALUES (:session_id, :payload)"), changes)
+        return len(rows)
+
+    def backfill(self, history, hours):
+        """One-time import of the sessions Core already holds (table empty)."""
+        if self.is_ready():
+            return 0
+        sessions = [s for s in history.get_recent_sessions(hours) if getattr(s, "end_time", None)]
+        count = self.add_many(sessions)
+        self._ready = True
+        logging.info(f"Session index backfilled with {count} sessions")
+        return count
+
+    def is_ready(self):
+        return self._ready
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _where(start=None, end=None, app=None):
+        where, params = [], {}
+        if app:
+            where.append("app_name = :app")
+            params["app"] = app
+        if start is not None:
+            where.append("start_time >= :start")
+            params["start"] = _epoch(start)
+        if end is not None:
+            where.append("start_time < :end")
+            params["end"] = _epoch(end)
+        return (f"WHERE {' AND '.join(where)}" if where else ""), params
+
+    def summaries(self, start=None, end=None, app=None, limit=None):
+        """Summary rows only (no side tables), oldest first."""
+        clause, params = self._where(start, end, app)
+        sql = f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM session_index {clause}"
+        if limit:
+            # newest `limit` sessions, still returned oldest first
+            sql = f"SELECT * FROM ({sql} ORDER BY start_time DESC LIMIT :limit) ORDER BY start_time"
+            params["limit"] = limit
+        else:
+            sql += " ORDER BY start_time"
+        with self.engine.connect() as conn:
+            return [dict(r) for r in conn.execute(text(sql), params).mappings()]
+
+    def sessions(self, start=None, end=None, app=None, limit=None, titles=10, status_changes=True):
+        """
+        Response dicts for the returned sessions only.
+        `titles` = how many of the last titles to include (None = all, 0 = none);
+        status_changes are only read when they are included.
+        """
+        rows = self.summaries(start, end, app, limit)
+        ids = [r["session_id"] for r in rows]
+        title_map = self.load_titles(ids, titles) if titles != 0 else {}
+        documents = self.load_documents(ids, status_changes)
+        return [to_response(documents[r["session_id"]], title_map.get(r["session_id"], []), status_changes)
+                for r in rows if r["session_id"] in documents]
+
+    def _chunks(self, ids):
+        for i in range(0, len(ids), _ID_CHUNK):
+            yield ids[i:i + _ID_CHUNK]
+
+    def load_titles(self, session_ids, last=None):
+        """{session_id: [title, ...]}; with `last` only the final N per session."""
+        result = {}
+        if last:
+            sql = text("SELECT t.session_id, t.title FROM session_titles t "
+                       "JOIN session_index s ON s.session_id = t.session_id "
+                       "WHERE t.session_id IN :ids AND t.seq >= s.title_count - :last "
+                       "ORDER BY t.session_id, t.seq").bindparams(bindparam("ids", expanding=True))
+        else:
+            sql = text("SELECT session_id, title FROM session_titles WHERE session_id IN :ids "
+                       "ORDER BY session_id, seq").bindparams(bindparam("ids", expanding=True))
+        with self.engine.connect() as conn:
+            for chunk in self._chunks(list(session_ids)):
+                for session_id, title in conn.execute(sql, {"ids": chunk, "last": last}):
+                    result.setdefault(session_id, []).append(title)
+        return result
+
+    def load_documents(self, session_ids, status_changes=True):
+        """
+        {session_id: /sessions dict without titles_seen}; status_changes are
+        read from their table only when asked for (documents stored before
+        it existed still carry their own).
+        """
+        result = {}
+        sql = text("SELECT session_id, payload FROM session_documents WHERE session_id IN :ids"
+                   ).bindparams(bindparam("ids", expanding=True))
+        changes_sql = text("SELECT session_id, payload FROM session_status_log WHERE session_id IN :ids"
+                           ).bindparams(bindparam("ids", expanding=True))
+        with self.engine.connect() as conn:
+            for chunk in self._chunks(list(session_ids)):
+                for session_id, payload in conn.execute(sql, {"ids": chunk}):
+                    result[session_id] = decode_document(payload)
+                if not status_changes:
+                    continue
+                for session_id, payload in conn.execute(changes_sql, {"ids": chunk}):
+                    if session_id in result:
+                        result[session_id]["status_changes"] = decode_document(payload)
+        return result
+
+    def iter_export_rows(self, start=None, end=None, app=None, batch_size=500):
+        """Full rows (all titles and status changes) for export, loaded a batch at a time."""
+        rows = self.summaries(start, end, app)
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            ids = [r["session_id"] for r in batch]
+            titles, documents = self.load_titles(ids), self.load_documents(ids)
+            for r in batch:
+                document = documents.get(r["session_id"])
+                if document is None:
+                    continue
+                # same fields as export.session_row(session)
+                yield {
+                    "session_id": document["session_id"],
+                    "app_name": document["app_name"],
+                    "start_time": document["start_time"],
+                    "end_time": document["end_time"],
+                    "total_duration": document["total_duration"],
+                    "context_changes": document["context_changes"],
+                    "titles_seen": titles.get(r["session_id"], []),
+                    "status_changes": document["status_changes"],
+                    "window_count": document["window_count"],
+                }
+
+    def stats(self):
+        with self.engine.connect() as conn:
+            count, first, last = conn.execute(text(
+                "SELECT COUNT(*), MIN(start_time), MAX(start_time) FROM session_index")).one()
+            titles = conn.execute(text("SELECT COUNT(*) FROM session_titles")).scalar()
+            logs = conn.execute(text("SELECT COUNT(*) FROM session_status_log")).scalar()
+        return {"sessions": count, "titles": titles, "status_logs": logs, "first": _iso(first), "last": _iso(last),
+                "ready": self.is_ready()}
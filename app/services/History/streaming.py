@@ -0,0 +1,122 @@
+"""
+server/app/services/History/streaming.py
+Keyset cursors and chunked JSON / NDJSON responses for large record lists.
+"""
+import base64
+import json
+import logging
+from datetime import datetime
+from itertools import chain
+
+from flask import Response, current_app, stream_with_context
+
+from app.services.History.rollups import record_time
+
+_END = object()
+
+STREAM_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def encode_cursor(timestamp, seq):
+    """Opaque keyset token for the position (timestamp, seq)."""
+    raw = json.dumps([timestamp, seq], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor. Raises ValueError on a malformed token."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        timestamp, seq = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return timestamp, int(seq)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def parse_keyset(args):
+    """
+    (after_timestamp, after_seq) from ?cursor=<token> or ?after=<iso timestamp>.
+    Raises ValueError when either is malformed.
+    """
+    cursor = args.get("cursor")
+    if cursor:
+        return decode_cursor(cursor)
+    after = args.get("after")
+    if after:
+        return datetime.fromisoformat(after).isoformat(), None
+    return None, None
+
+
+def buffer_page(buffer, limit=None, app=None, after=None, after_seq=None):
+    """
+    Keyset page from a RawHistoryBuffer.
+    Returns (records, next_cursor); the cursor points at the last record returned.
+    """
+    if after_seq is None and after is not None:
+        after_seq = buffer.seq_before_time(datetime.fromisoformat(after), record_time)
+    items = buffer.items(limit, app, after_seq)
+    cursor = None
+    if items:
+        seq, record = items[-1]
+        ts = record_time(record)
+        cursor = encode_cursor(ts.isoformat() if ts else "", seq)
+    return [record for _, record in items], cursor
+
+
+def stream_records(records, fmt="json", serialize=dict, chunk_size=200, headers=None, envelope=None):
+    """
+    Stream an iterable of records as a JSON array or as NDJSON.
+    Records are encoded with the app JSON provider (same output as jsonify)
+    and sent in chunks of `chunk_size`, so memory stays bounded by the chunk.
+    With `envelope` the JSON body is {"<envelope>": [...], "count": n}.
+
+    The first record is read before the response starts, so an error there
+    raises to the caller (and becomes a normal error response). A later
+    error is logged and ends the body with an error record instead of
+    silently truncating it: {"error": ...} as the last array item / NDJSON
+    line, or an "error" key next to "count" with an envelope.
+    """
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    provider = current_app.json
+
+    def dumps(obj):
+        return provider.dumps(obj, separators=(",", ":"))
+
+    def generate():
+        iterator = iter(records)
+        pending = next(iterator, _END)
+        if fmt == "json":
+            yield f'{{"{envelope}":[' if envelope else "["
+        chunk, count, error = [], 0, None
+        try:
+            while pending is not _END:
+                encoded = dumps(serialize(pending))
+                if fmt == "json":
+                    chunk.append(encoded if not count else "," + encoded)
+                else:
+                    chunk.append(encoded + "\n")
+                count += 1
+                if len(chunk) >= chunk_size:
+                    yield "".join(chunk)
+                    chunk = []
+                pending = next(iterator, _END)
+        except Exception as e:
+            logging.error(f"Streaming records failed after {count} records: {e}")
+            error = str(e)
+        if error is not None and not envelope:
+            marker = dumps({"error": error})
+            chunk.append((marker if not count else "," + marker) if fmt == "json" else marker + "\n")
+        if chunk:
+            yield "".join(chunk)
+        if fmt == "json" and envelope:
+            yield f'],"count":{count}' + (f',"error":{dumps(error)}' if error is not None else "") + "}\n"
+        elif fmt == "json":
+            yield "]\n"
+
+    body = generate()
+    head = next(body)  # reads the first record: early errors raise here
+    return Response(stream_with_context(chain([head], body)), mimetype=STREAM_FORMATS[fmt], headers=headers)
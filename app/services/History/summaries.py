@@ -0,0 +1,104 @@
+"""
+server/app/services/History/summaries.py
+Memoised WindowHistory period summaries behind /summary, /daily, /weekly,
+/monthly and /usage?period=.
+
+WindowHistory stays the source of truth: every payload is Core's own
+(get_status_summary_by_period, the *_summary_range methods and
+get_app_usage_by_period), so responses are byte-identical to Core's
+answers. A finished period (offset >= 1) does not change any more, so its
+answer is computed once per day. An answer that covers the current period
+(offset 0, and every range) is kept for at most `live_ttl` seconds and
+dropped as soon as a session closes, so a dashboard polling it costs one
+Core scan per window instead of one per request. A session closing that
+started before today also drops the finished periods.
+"""
+import threading
+import time
+from datetime import date, datetime
+
+RANGE_METHODS = {
+    "day": "get_daily_summary_range",
+    "week": "get_weekly_summary_range",
+    "month": "get_monthly_summary_range",
+}
+
+
+class SummaryCache:
+    def __init__(self, history, live_ttl=30.0):
+        self.history = history
+        self.live_ttl = live_ttl
+        self._finished = {}    # (kind, period, offset) -> Core payload, until midnight
+        self._live = {}        # key -> (Core payload, expires at monotonic time)
+        self._day = date.today()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def period(self, period, offset=0):
+        """Same value as history.get_status_summary_by_period(period, offset)."""
+        return self._get(("summary", period, offset), offset >= 1 and period in RANGE_METHODS,
+                         self.history.get_status_summary_by_period, period, offset)
+
+    def usage(self, period, offset=0):
+        """Same value as history.get_app_usage_by_period(period, offset)."""
+        return self._get(("usage", period, offset), offset >= 1 and period in RANGE_METHODS,
+                         self.history.get_app_usage_by_period, period, offset)
+
+    def range(self, period, count):
+        """Same value as history.get_<period>ly_summary_range(count): one Core call per live window."""
+        return self._get(("range", period, count), False, getattr(self.history, RANGE_METHODS[period]), count)
+
+    def _get(self, key, finished, compute, *args):
+        with self._lock:
+            self._rollover()
+            if finished and key in self._finished:
+                self._stats["hits"] += 1
+                return self._finished[key]
+            entry = self._live.get(key)
+            if not finished and entry is not None and entry[1] > time.monotonic():
+                self._stats["hits"] += 1
+                return entry[0]
+            self._stats["misses"] += 1
+            day, generation = self._day, self._stats["invalidations"]
+        payload = compute(*args)
+        with self._lock:
+            # not across midnight (offsets shift) nor across an invalidation (the answer may be stale)
+            if self._day == day and self._stats["invalidations"] == generation:
+                if finished:
+                    self._finished[key] = payload
+                elif self.live_ttl > 0:
+                    self._live[key] = (payload, time.monotonic() + self.live_ttl)
+        return payload
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+    def _rollover(self):
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self._finished.clear()
+            self._live.clear()
+
+    def invalidate(self, finished=True):
+        """Forget the memoised answers (cleanup, sync, rebuild...); finished=False keeps the finished periods."""
+        with self._lock:
+            self._live.clear()
+            if finished:
+                self._finished.clear()
+            self._stats["invalidations"] += 1
+
+    def on_session_closed(self, session=None):
+        """A closed session changes the current period, and a finished one when it started before today."""
+        start = getattr(session, "start_time", None)
+        if isinstance(start, (int, float)):
+            start = datetime.fromtimestamp(start)
+        self.invalidate(finished=isinstance(start, datetime) and start.date() < date.today())
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "finished": len(self._finished), "live": len(self._live),
+                    "live_ttl": self.live_ttl}
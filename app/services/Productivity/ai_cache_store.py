@@ -0,0 +1,281 @@
+"""
+server/app/services/Productivity/ai_cache_store.py
+AI classification cache kept in its own table instead of the config JSON.
+
+Every mutation is a single-row statement; an in-memory LRU mirror answers
+lookups. Entries carry the provider/model that produced them so they can
+be invalidated when the provider changes, expire after `ttl_days` and the
+least recently used ones are evicted beyond `max_entries`.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+from app.core.database import get_engine
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS ai_cache (
+        resource    TEXT PRIMARY KEY,
+        category    TEXT NOT NULL,
+        provider    TEXT,
+        model       TEXT,
+        created_at  REAL NOT NULL,
+        last_used   REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_ai_cache_last_used ON ai_cache (last_used)",
+)
+
+_UPSERT = text("""
+    INSERT INTO ai_cache (resource, category, provider, model, created_at, last_used)
+    VALUES (:resource, :category, :provider, :model, :created_at, :last_used)
+    ON CONFLICT (resource) DO UPDATE SET
+        category = excluded.category, provider = excluded.provider, model = excluded.model,
+        created_at = excluded.created_at, last_used = excluded.last_used
+""")
+
+ENTRY_FIELDS = ("resource", "category", "provider", "model", "created_at", "last_used")
+
+
+def provider_identity(provider):
+    """(provider, model) label stored with each entry."""
+    if provider is None:
+        return None, None
+    config = getattr(provider, "config", None)
+    model = getattr(provider, "model_name", None) or getattr(config, "model_name", None)
+    kind = getattr(config, "provider_type", None)
+    name = getattr(kind, "name", None) or (str(kind) if kind else type(provider).__name__)
+    return name.lower(), model
+
+
+class AICacheStore:
+    def __init__(self, database_url, max_entries=50_000, ttl_days=90, touch_batch=200, categories=None):
+        self.engine = get_engine(database_url)
+        # accepted categories (ProductivityCategory); None accepts any non-empty string
+        self.categories = frozenset(categories) if categories is not None else None
+        self.max_entries = max_entries
+        self.ttl = ttl_days * 86400 if ttl_days else None
+        self.touch_batch = touch_batch
+        self._entries = OrderedDict()   # resource -> entry dict, least recently used first
+        self._touched = {}              # resource -> last_used not yet written
+        self._lock = threading.RLock()
+        self._counters = {"hits": 0, "misses": 0, "evicted": 0, "expired": 0}
+        with self.engine.begin() as conn:
+            for statement in _SCHEMA:
+                conn.execute(text(statement))
+            rows = conn.execute(text(
+                f"SELECT {', '.join(ENTRY_FIELDS)} FROM ai_cache ORDER BY last_used"
+            )).mappings().all()
+        for row in rows:
+            self._entries[row["resource"]] = dict(row)
+        self._evict(sweep=True)
+
+    @staticmethod
+    def _key(resource):
+        return resource.strip().lower()
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and entry["created_at"] + self.ttl < now
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def get(self, resource):
+        key = self._key(resource)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            if self._expired(entry, now):
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                self.delete(key)
+                return None
+            self._counters["hits"] += 1
+            self._entries.move_to_end(key)
+            entry["last_used"] = now
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch:
+                self.flush_usage()
+            return entry["category"]
+
+    def __contains__(self, resource):
+        return self._key(resource) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def as_dict(self):
+        """{resource: category}, the shape of the old config["ai_cache"]."""
+        with self._lock:
+            return {key: entry["category"] for key, entry in self._entries.items()}
+
+    # ------------------------------------------------------------------
+    # Mutations (one statement each)
+    # ------------------------------------------------------------------
+    def put(self, resource, category, provider=None, model=None, created_at=None):
+        key = self._key(resource)
+        now = time.time()
+        entry = {
+            "resource": key, "category": category, "provider": provider, "model": model,
+            "created_at": created_at or now, "last_used": now,
+        }
+        with self._lock:
+            with self.engine.begin() as conn:
+                conn.execute(_UPSERT, entry)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._touched.pop(key, None)
+            self._evict()
+
+    def delete(self, resource):
+        key = self._key(resource)
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return False
+            self._touched.pop(key, None)
+            with self.engine.begin() as conn:
+                conn.execute(text("DELETE FROM ai_cache WHERE resource = :resource"), {"resource": key})
+            return True
+
+    def invalidate(self, provider=None, model=None, keep=None):
+        """
+        Drop entries produced by `provider` (and `model`), or with keep=(provider, model)
+        every entry that was NOT produced by that provider/model. No arguments clears all.
+        """
+        with self._lock:
+            if keep is not None:
+                victims = [k for k, e in self._entries.items()
+                           if (e["provider"], e["model"]) != tuple(keep)]
+            else:
+                victims = [k for k, e in self._entries.items()
+                           if (provider is None or e["provider"] == provider)
+                           and (model is None or e["model"] == model)]
+            self._delete_many(victims)
+            return len(victims)
+
+    def _delete_many(self, keys):
+        if not keys:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(text("DELETE FROM ai_cache WHERE resource = :resource"),
+                         [{"resource": k} for k in keys])
+        for key in keys:
+            self._entries.pop(key, None)
+            self._touched.pop(key, None)
+
+    def _evict(self, sweep=False):
+        """Drop LRU entries beyond max_entries; with sweep also every expired entry."""
+        victims = []
+        if sweep:
+            now = time.time()
+            victims = [k for k, e in self._entries.items() if self._expired(e, now)]
+            self._counters["expired"] += len(victims)
+            for key in victims:
+                self._entries.pop(key)
+        overflow = len(self._entries) - self.max_entries
+        for _ in range(max(0, overflow)):
+            victims.append(self._entries.popitem(last=False)[0])
+            self._counters["evicted"] += 1
+        self._delete_many(victims)
+
+    def flush_usage(self):
+        """Persist batched last_used updates (kept in memory between flushes)."""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if not touched:
+            return
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text("UPDATE ai_cache SET last_used = :last_used WHERE resource = :resource"),
+                             [{"resource": k, "last_used": v} for k, v in touched.items()])
+        except Exception as e:
+            logging.error(f"AI cache usage flush failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Bulk import / export
+    # ------------------------------------------------------------------
+    def export(self):
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
+
+    def import_entries(self, entries, provider=None, model=None, strict=True):
+        """
+        Accepts a list of entry dicts (as produced by export) or a
+        {resource: category} mapping (the legacy config layout).
+        An invalid entry raises ValueError before anything is written,
+        or is skipped with strict=False.
+        """
+        if isinstance(entries, dict):
+            entries = [{"resource": r, "category": c} for r, c in entries.items()]
+        elif not isinstance(entries, (list, tuple)):
+            raise ValueError("expected a list of entries or a {resource: category} object")
+        now = time.time()
+        rows = []
+        for position, item in enumerate(entries):
+            problem = self._invalid(item)
+            if problem:
+                if strict:
+                    raise ValueError(f"entry {position}: {problem}")
+                continue
+            rows.append({
+                "resource": self._key(item["resource"]),
+                "category": item["category"],
+                "provider": item.get("provider", provider),
+                "model": item.get("model", model),
+                "created_at": item.get("created_at") or now,
+                "last_used": item.get("last_used") or now,
+            })
+        if not rows:
+            return 0
+        with self._lock:
+            with self.engine.begin() as conn:
+                conn.execute(_UPSERT, rows)
+            for row in sorted(rows, key=lambda r: r["last_used"]):
+                self._entries[row["resource"]] = row
+                self._entries.move_to_end(row["resource"])
+            self._evict(sweep=True)
+        return len(rows)
+
+    def _invalid(self, item):
+        """Why an imported entry cannot be stored, or None."""
+        if not isinstance(item, dict):
+            return f"expected an object, got {type(item).__name__}"
+        resource, category = item.get("resource"), item.get("category")
+        if not isinstance(resource, str) or not resource.strip():
+            return "resource must be a non-empty string"
+        if not isinstance(category, str) or not category:
+            return "category must be a non-empty string"
+        if self.categories is not None and category not in self.categories:
+            return f"unknown category {category!r}"
+        for field in ("created_at", "last_used"):
+            value = item.get(field)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                return f"{field} must be a number"
+        for field in ("provider", "model"):
+            if item.get(field) is not None and not isinstance(item[field], str):
+                return f"{field} must be a string"
+        return None
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            providers = {}
+            for entry in self._entries.values():
+                label = f"{entry['provider'] or 'unknown'}/{entry['model'] or '-'}"
+                providers[label] = providers.get(label, 0) + 1
+            return {
+                **self._counters,
+                "hit_ratio": self._counters["hits"] / lookups if lookups else None,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_days": self.ttl / 86400 if self.ttl else None,
+                "pending_usage_writes": len(self._touched),
+                "by_provider": providers,
+            }
@@ -0,0 +1,221 @@
+"""
+server/app/services/Productivity/ai_queue.py
+Background AI classification for resources the rules do not cover.
+
+- concurrent submits of the same resource share one in-flight Future
+- pending resources are drained in batches; providers exposing
+  classify_batch(texts) get one prompt per batch, others one call per item
+- per-provider concurrency (semaphore) and rate limit (token bucket)
+- at most `max_pending` resources wait; past that submit() raises QueueFull
+  and the caller answers without the provider (load is shed, never queued)
+- result listeners (ai_cache write-back, SSE publish) run on the worker
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+PROVISIONAL_CATEGORY = "neutral"
+
+
+class QueueFull(RuntimeError):
+    """max_pending resources are already waiting for the provider."""
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1, int(rate_per_minute // 6) or 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(min(wait, 1.0))
+
+
+class ClassificationQueue:
+    """
+    `get_provider` is called per batch so provider changes in
+    AIProviderManager take effect without restarting the queue.
+    """
+
+    def __init__(self, get_provider, workers=2, batch_size=10, batch_wait=0.2,
+                 max_concurrency=2, rate_per_minute=60, max_pending=1000):
+        self.get_provider = get_provider
+        self.max_pending = max_pending
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_concurrency = max_concurrency
+        self.rate_per_minute = rate_per_minute
+        self._pending = OrderedDict()   # resource -> Future, not yet picked up
+        self._inflight = {}             # resource -> Future, pending or running
+        self._limits = {}               # provider key -> (semaphore, bucket)
+        self._listeners = []
+        self._cond = threading.Condition()
+        self._threads = []
+        self._counters = {"submitted": 0, "coalesced": 0, "batches": 0,
+                          "classified": 0, "errors": 0, "provider_calls": 0, "rejected": 0}
+        self._counters_lock = threading.Lock()  # workers update counters outside _cond
+
+    # ------------------------------------------------------------------
+    # Registration
+    # ------------------------------------------------------------------
+    def on_result(self, callback):
+        """callback(resource, category, provider) after a successful classification."""
+        self._listeners.append(callback)
+
+    def start(self):
+        with self._cond:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f"ai-classify-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    # ------------------------------------------------------------------
+    # Submitting
+    # ------------------------------------------------------------------
+    def submit(self, resource):
+        """
+        Future resolving to the category; duplicates share one Future.
+        Raises QueueFull when max_pending other resources are waiting.
+        """
+        key = resource.strip().lower()
+        with self._cond:
+            self._count("submitted")
+            future = self._inflight.get(key)
+            if future is not None:
+                self._count("coalesced")
+                return future
+            if len(self._pending) >= self.max_pending:
+                self._count("rejected")
+                raise QueueFull(f"{len(self._pending)} resources are already waiting for the AI provider")
+            future = Future()
+            self._inflight[key] = future
+            self._pending[key] = future
+            self._cond.notify()
+        self.start()
+        return future
+
+    def _count(self, name):
+        with self._counters_lock:
+            self._counters[name] += 1
+
+    def available(self):
+        try:
+            return self.get_provider() is not None
+        except Exception:
+            return False
+
+    def is_pending(self, resource):
+        return resource.strip().lower() in self._inflight
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    def _next_batch(self):
+        with self._cond:
+            batch = []
+            while not batch:
+                self._cond.wait_for(lambda: self._pending)
+                # give concurrent submits a moment to join the batch
+                deadline = time.monotonic() + self.batch_wait
+                while len(self._pending) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        break
+                # another worker may have drained the queue meanwhile
+                while self._pending and len(batch) < self.batch_size:
+                    batch.append(self._pending.popitem(last=False))
+            return batch
+
+    def _provider_limits(self, provider):
+        key = type(provider).__name__
+        with self._cond:
+            if key not in self._limits:
+                self._limits[key] = (threading.BoundedSemaphore(self.max_concurrency),
+                                     TokenBucket(self.rate_per_minute))
+            return self._limits[key]
+
+    def _classify(self, provider, resources):
+        semaphore, bucket = self._provider_limits(provider)
+        batch_call = getattr(provider, "classify_batch", None)
+        with semaphore:
+            if callable(batch_call):
+                bucket.acquire()
+                self._count("provider_calls")
+                results = batch_call(resources)
+                if isinstance(results, dict):
+                    return [results.get(r) for r in resources]
+                results = list(results)
+                if len(results) != len(resources):
+                    raise ValueError(f"provider returned {len(results)} categories for {len(resources)} resources")
+                return results
+            categories = []
+            for resource in resources:
+                bucket.acquire()
+                self._count("provider_calls")
+                categories.append(provider.classify(resource))
+            return categories
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            resources = [resource for resource, _ in batch]
+            self._count("batches")
+            try:
+                provider = self.get_provider()
+                if provider is None:
+                    raise RuntimeError("no AI provider initialized")
+                categories = self._classify(provider, resources)
+            except Exception as e:
+                logging.error(f"AI classification failed for {len(resources)} resource(s): {e}")
+                self._count("errors")
+                self._finish(batch, error=e)
+                continue
+            self._finish(list(zip(resources, (f for _, f in batch), categories)), provider=provider)
+
+    def _finish(self, results, error=None, provider=None):
+        with self._cond:
+            for item in results:
+                self._inflight.pop(item[0], None)
+        for item in results:
+            if error is not None:
+                item[1].set_exception(error)
+                continue
+            resource, future, category = item
+            self._count("classified")
+            for callback in self._listeners:
+                try:
+                    callback(resource, category, provider)
+                except Exception as e:
+                    logging.error(f"Classification listener failed: {e}")
+            future.set_result(category)
+
+    def stats(self):
+        with self._counters_lock:
+            counters = dict(self._counters)
+        with self._cond:
+            return {
+                **counters,
+                "pending": len(self._pending),
+                "max_pending": self.max_pending,
+                "in_flight": len(self._inflight),
+                "workers": len([t for t in self._threads if t.is_alive()]),
+                "batch_size": self.batch_size,
+                "max_concurrency": self.max_concurrency,
+                "rate_per_minute": self.rate_per_minute,
+            }
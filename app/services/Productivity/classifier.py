@@ -0,0 +1,309 @@
+"""
+server/app/services/Productivity/classifier.py
+Compiled form of the ProductivityTracker rules and user_overrides.
+
+Config layouts read (anything else disables the index and every lookup
+goes to ProductivityTracker.detect_status):
+  user_overrides  {"resource": "category"}
+  rules           {"category": ["pattern", ...]}
+
+Precedence: user_overrides beat rules whatever kind of match each has.
+Within one source:
+  1. exact match of the whole resource
+  2. path prefix, longest wins       ('github.com/myorg' covers 'github.com/myorg/repo')
+  3. exact match of the resource's host
+  4. domain suffix, longest wins     ('google.com' covers 'mail.google.com')
+  5. pattern found in the resource, longest wins, then config order;
+     a pattern edge that is a word character must sit on a word boundary,
+     so 'go' matches 'go.dev/doc' but not 'google.com', while '.edu'
+     matches 'mit.edu'; '*' and '?' are wildcards
+AI results (AICacheStore) are only consulted when neither source matches;
+a miss returns None so the engine can fall back to the AI cache, the AI
+queue or ProductivityTracker.detect_status.
+"""
+import logging
+import re
+import threading
+
+from app.services.Productivity.ai_queue import PROVISIONAL_CATEGORY, QueueFull
+
+_SOURCE_PRIORITY = {"user_overrides": 0, "rules": 1}
+_DOMAIN_RE = re.compile(r"^[a-z0-9-]+(\.[a-z0-9-]+)+$")
+# match kinds, strongest first
+_EXACT, _PATH, _HOST, _DOMAIN, _PATTERN = range(5)
+_PATH_SEPARATORS = "/?#"
+
+
+def normalise_resource(resource):
+    """Lowercase, without URL scheme and leading 'www.' (paths are kept)."""
+    value = resource.strip().lower()
+    if "://" in value:
+        value = value.split("://", 1)[1]
+    if value.startswith("www."):
+        value = value[4:]
+    return value
+
+
+def resource_host(value):
+    """Host part of a normalised resource ('youtube.com/watch?v=1' -> 'youtube.com')."""
+    host = re.split(r"[/?#]", value, 1)[0]
+    return host.rsplit("@", 1)[-1].split(":", 1)[0]
+
+
+def _word_char(char):
+    return char.isalnum() or char == "_"
+
+
+def iter_entries(source, section):
+    """
+    Yield (pattern, category) from a config section in the layout of
+    `source`; raises ValueError when the section has another layout.
+    """
+    if not section:
+        return
+    if not isinstance(section, dict):
+        raise ValueError(f"{source}: expected an object")
+    for key, value in section.items():
+        if source == "rules" and isinstance(value, (list, tuple)):
+            for pattern in value:
+                if not isinstance(pattern, str):
+                    raise ValueError(f"rules.{key}: expected a list of strings")
+                yield pattern, key
+        elif source == "user_overrides" and isinstance(value, str):
+            yield key, value
+        else:
+            raise ValueError(f"{source}.{key}: unexpected {type(value).__name__}")
+
+
+class DomainTrie:
+    """Reversed-label trie: 'mail.google.com' matches a rule for 'google.com'."""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, domain, category, priority):
+        node = self.root
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        current = node.get(None)
+        if current is None or priority < current[1]:
+            node[None] = (category, priority)
+
+    def lookup(self, domain):
+        """(category, priority, labels) of the best suffix: strongest source, then longest."""
+        node, best = self.root, None
+        for depth, label in enumerate(reversed(domain.split(".")), 1):
+            node = node.get(label)
+            if node is None:
+                break
+            if None in node and (best is None or node[None][1] <= best[1]):
+                best = (*node[None], depth)
+        return best
+
+
+class AhoCorasick:
+    """
+    Literal substring automaton. Each pattern has an index (lower = higher
+    precedence); search() returns the best index found with its word-character
+    edges on word boundaries.
+    """
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.out = [[]]
+        for index, pattern in patterns:
+            node = 0
+            for char in pattern:
+                nxt = self.goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][char] = nxt
+                    self.goto.append({})
+                    self.out.append([])
+                node = nxt
+            self.out[node].append((index, len(pattern), _word_char(pattern[0]), _word_char(pattern[-1])))
+
+        # breadth-first failure links; out[] also collects the failure chain's patterns
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for node in queue:
+            self.out[node].sort()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                fallback = self.goto[state].get(char, 0)
+                self.fail[child] = fallback if fallback != child else 0
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def search(self, text):
+        goto, fail, out = self.goto, self.fail, self.out
+        node, found, size = 0, None, len(text)
+        for end, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if not out[node]:
+                continue
+            word_after = end + 1 < size and _word_char(text[end + 1])
+            for index, length, left, right in out[node]:
+                if found is not None and index >= found:
+                    break
+                if right and word_after:
+                    continue
+                start = end - length + 1
+                if not left or start == 0 or not _word_char(text[start - 1]):
+                    found = index
+                    break
+        return found
+
+
+def _wildcard_regex(pattern):
+    body = re.escape(pattern).replace(r"\*", ".*").replace(r"\?", ".")
+    before = r"(?<!\w)" if _word_char(pattern[0]) else ""
+    after = r"(?!\w)" if _word_char(pattern[-1]) else ""
+    return f"{before}{body}{after}"
+
+
+class CompiledClassifier:
+    def __init__(self, config):
+        self.exact = {}
+        self.paths = {}  # literal 'host/path' rules, matched as prefixes
+        self.trie = DomainTrie()
+        self.supported = True
+        patterns = []
+
+        try:
+            entries = [(priority, order, pattern, category)
+                       for source, priority in _SOURCE_PRIORITY.items()
+                       for order, (pattern, category) in enumerate(iter_entries(source, config.get(source)))]
+        except ValueError as e:
+            logging.warning(f"Classifier index disabled, config layout not recognised: {e}")
+            self.supported = False
+            entries = []
+
+        for priority, order, pattern, category in entries:
+            key = normalise_resource(pattern)
+            if not key:
+                continue
+            if key not in self.exact or priority < self.exact[key][1]:
+                self.exact[key] = (category, priority)
+            if _DOMAIN_RE.match(key):
+                self.trie.insert(key, category, priority)
+            path = key.rstrip("/")
+            if "/" in path and "*" not in path and "?" not in path \
+                    and (path not in self.paths or priority < self.paths[path][1]):
+                self.paths[path] = (category, priority)
+            patterns.append((priority, -len(key), order, key, category))
+
+        patterns.sort(key=lambda item: item[:3])
+        self._categories = [item[4] for item in patterns]
+        self._priorities = [item[0] for item in patterns]
+        literals = [(i, item[3]) for i, item in enumerate(patterns) if "*" not in item[3] and "?" not in item[3]]
+        wildcards = [(i, item[3]) for i, item in enumerate(patterns) if "*" in item[3] or "?" in item[3]]
+        self._automaton = AhoCorasick(literals) if literals else None
+        if wildcards:
+            alternation = "|".join(f"(?P<p{i}>{_wildcard_regex(key)})" for i, key in wildcards)
+            # lookahead so every start position is tried (overlapping matches)
+            self._regex = re.compile(f"(?=(?:{alternation}))")
+        else:
+            self._regex = None
+
+    def classify(self, resource):
+        """Category from user_overrides / rules, or None."""
+        key = normalise_resource(resource)
+        host = resource_host(key)
+        # candidates ranked (source priority, match kind, tie-break)
+        candidates = []
+        for kind, value in ((_EXACT, key), (_HOST, host)):
+            if value in self.exact:
+                category, priority = self.exact[value]
+                candidates.append(((priority, kind, 0), category))
+        if self.paths:
+            for end in range(len(host) + 1, len(key)):
+                if key[end] in _PATH_SEPARATORS and key[:end] in self.paths:
+                    category, priority = self.paths[key[:end]]
+                    candidates.append(((priority, _PATH, -end), category))
+        domain = self.trie.lookup(host) if _DOMAIN_RE.match(host) else None
+        if domain is not None:
+            category, priority, labels = domain
+            candidates.append(((priority, _DOMAIN, -labels), category))
+
+        best = self._automaton.search(key) if self._automaton else None
+        if self._regex is not None and best != 0:
+            for match in self._regex.finditer(key):
+                index = int(match.lastgroup[1:])
+                if best is None or index < best:
+                    best = index
+        if best is not None:
+            candidates.append(((self._priorities[best], _PATTERN, best), self._categories[best]))
+        return min(candidates, key=lambda item: item[0])[1] if candidates else None
+
+
+class ClassifierEngine:
+    """
+    Holds the current CompiledClassifier for a ProductivityTracker.
+    rebuild() compiles a new one from the tracker config and swaps the
+    reference, so readers never see a half-built index. The index answers
+    the API endpoints only: Core's own detect_status (the window tracker)
+    keeps Core's matcher, whose precedence is not guaranteed to match the
+    one documented above.
+    """
+
+    def __init__(self, tracker, ai_queue=None, ai_cache=None):
+        self.tracker = tracker
+        self._detect_status = tracker.detect_status
+        # optional AICacheStore consulted when no override / rule matches
+        self.ai_cache = ai_cache
+        # optional ClassificationQueue: misses are queued for the AI provider
+        # and answered with a provisional category instead of blocking
+        self.ai_queue = ai_queue
+        self.version = 0
+        self._compiled = None
+        self._lock = threading.Lock()
+        self.rebuild()
+
+    def rebuild(self):
+        compiled = CompiledClassifier(self.tracker.config)
+        with self._lock:
+            self._compiled = compiled
+            self.version += 1
+        return self.version
+
+    def _fallback(self, resource):
+        if self.ai_cache is not None:
+            category = self.ai_cache.get(resource)
+            if category is not None:
+                return category, False
+        if self.ai_queue is not None and self.ai_queue.available():
+            try:
+                self.ai_queue.submit(resource)
+                return PROVISIONAL_CATEGORY, True
+            except QueueFull:
+                pass  # the provider is saturated: the tracker's own matcher answers
+        return self._detect_status(resource), False
+
+    def _lookup(self, compiled, resource):
+        if not compiled.supported:
+            return self._detect_status(resource), False
+        category = compiled.classify(resource)
+        if category is None:
+            return self._fallback(resource)
+        return category, False
+
+    def resolve(self, resource):
+        """(category, provisional) for one resource."""
+        return self._lookup(self._compiled, resource)
+
+    def classify(self, resource):
+        return self.resolve(resource)[0]
+
+    def classify_many(self, resources):
+        """Bulk classification; duplicates are resolved once."""
+        compiled = self._compiled
+        results = {}
+        for resource in resources:
+            if resource not in results:
+                results[resource] = self._lookup(compiled, resource)[0]
+        return results
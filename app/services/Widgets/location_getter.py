@@ -1,6 +1,6 @@
 import requests
 
-def get_lat_lon(city_name):
+def get_lat_lon(city_name, session=None, timeout=10):
     url = "https://nominatim.openstreetmap.org/search"
     params = {
         "q": city_name,
@@ -9,7 +9,7 @@ def get_lat_lon(city_name):
     }
     
     try:
-        response = requests.get(url, params=params, headers={"User-Agent": "MyApp"})
+        response = (session or requests).get(url, params=params, headers={"User-Agent": "MyApp"}, timeout=timeout)
         response.raise_for_status()
         results = response.json()
         if results:
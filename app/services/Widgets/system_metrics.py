@@ -1,7 +1,12 @@
+import logging
+import threading
+import time
+from collections import deque
+
 import psutil as ps
-import GPUtil
 
 try:
+    import GPUtil
     gpu_available = True
 except ImportError:
     gpu_available = False
@@ -28,3 +33,92 @@ def get_ram_usge():
     ram = ps.virtual_memory()
     return  ram.percent , ram.used // (1024**2) , ram.total // (1024**2)  # % , Mb , Mb
 
+
+class MetricsSampler:
+    """
+    Background sampler: collects CPU (total + per core), RAM, disk I/O,
+    network and (less often, nvidia-smi is slow) GPU into a ring buffer.
+    Readers get the latest snapshot without blocking.
+    """
+
+    def __init__(self, interval=2.0, history_seconds=600, gpu_interval=10.0, on_sample=None):
+        self.interval = interval
+        self.gpu_interval = gpu_interval
+        self.on_sample = on_sample
+        self.samples = deque(maxlen=max(1, int(history_seconds / interval)))
+        self._gpu = None
+        self._gpu_at = 0.0
+        self._io = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._sample_lock = threading.Lock()  # sample() runs on the sampler thread and, once, on a request
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            ps.cpu_percent(interval=None)            # prime the counters, first call returns 0.0
+            ps.cpu_percent(interval=None, percpu=True)
+            self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                snapshot = self.sample()
+                self.samples.append(snapshot)
+                if self.on_sample:
+                    self.on_sample(snapshot)
+            except Exception as e:
+                logging.error(f"Metrics sampler error: {e}")
+
+    def _io_rates(self, now):
+        disk = ps.disk_io_counters()
+        net = ps.net_io_counters()
+        current = (
+            now,
+            disk.read_bytes if disk else 0, disk.write_bytes if disk else 0,
+            net.bytes_sent if net else 0, net.bytes_recv if net else 0,
+        )
+        previous, self._io = self._io, current
+        if previous is None or current[0] <= previous[0]:
+            return 0.0, 0.0, 0.0, 0.0
+        elapsed = current[0] - previous[0]
+        return tuple(max(0, c - p) / elapsed for c, p in zip(current[1:], previous[1:]))
+
+    def sample(self):
+        with self._sample_lock:
+            return self._sample()
+
+    def _sample(self):
+        now = time.time()
+        ram = ps.virtual_memory()
+        disk_read, disk_write, net_sent, net_recv = self._io_rates(now)
+        if now - self._gpu_at >= self.gpu_interval:
+            try:
+                self._gpu = get_gpu_usage()
+            except Exception as e:  # a failing probe must not cost the CPU / RAM / I/O sample
+                logging.warning(f"GPU probe failed: {e}")
+                self._gpu = f"GPU probe failed: {e}"
+            self._gpu_at = now  # retried after gpu_interval, not on every sample
+        return {
+            "timestamp": now,
+            "cpu": ps.cpu_percent(interval=None),
+            "cpu_per_core": ps.cpu_percent(interval=None, percpu=True),
+            "ram_percent": ram.percent,
+            "ram_used_mb": ram.used // (1024**2),
+            "ram_total_mb": ram.total // (1024**2),
+            "disk_read_bps": disk_read,
+            "disk_write_bps": disk_write,
+            "net_sent_bps": net_sent,
+            "net_recv_bps": net_recv,
+            "gpu": self._gpu,
+        }
+
+    def latest(self):
+        return self.samples[-1] if self.samples else None
+
+    def history(self, seconds):
+        since = time.time() - seconds
+        return [s for s in list(self.samples) if s["timestamp"] >= since]
@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .location_getter import get_lat_lon
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+DEFAULT_WEATHER_TTL = 900  # open-meteo "current" values refresh every 15 min
+
+
+class OpenMeteoProvider:
+    """Nominatim geocoding + open-meteo forecast over one pooled HTTP session."""
+
+    def __init__(self, timeout=5):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+
+    def geocode(self, city):
+        return get_lat_lon(city, session=self.session, timeout=self.timeout)
+
+    def current_weather(self, lat, lon):
+        response = self.session.get(FORECAST_URL, params={
+            "latitude": lat,
+            "longitude": lon,
+            "current": "temperature_2m,weather_code,wind_speed_10m,relative_humidity_2m",
+            "timezone": "auto",
+        }, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+def _normalise_city(city):
+    return " ".join(city.lower().split())
+
+
+def _write_json_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+class WeatherService:
+    """
+    Caching layer in front of a weather provider.
+    - geocode results are persisted forever, keyed by normalised city name
+    - forecasts are cached until the provider's next update (current.time + interval)
+      and served stale while a background refresh runs
+    Any object with geocode(city) and current_weather(lat, lon) can be used as provider.
+    """
+
+    def __init__(self, provider, storage_dir):
+        self.provider = provider
+        self.geocode_file = storage_dir / "geocode_cache.json"
+        self.weather_file = storage_dir / "weather_cache.json"
+        self._geocodes = _read_json(self.geocode_file, {})
+        self._weather = _read_json(self.weather_file, {})
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def set_provider(self, provider):
+        """Swap the provider (e.g. a local stub in tests) and drop cached forecasts."""
+        with self._lock:
+            self.provider = provider
+            self._weather = {}
+
+    # ------------------------------------------------------------------
+    # Geocoding
+    # ------------------------------------------------------------------
+    def geocode(self, city):
+        key = _normalise_city(city)
+        with self._lock:
+            cached = self._geocodes.get(key)
+        if cached:
+            return tuple(cached)
+
+        lat, lon = self.provider.geocode(city)
+        if lat is not None and lon is not None:
+            with self._lock:
+                self._geocodes[key] = [lat, lon]
+                _write_json_atomic(self.geocode_file, self._geocodes)
+        return lat, lon
+
+    # ------------------------------------------------------------------
+    # Weather
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _key(lat, lon):
+        return f"{float(lat):.4f},{float(lon):.4f}"
+
+    @staticmethod
+    def _expires_at(data):
+        current = data.get("current", {})
+        interval = current.get("interval") or DEFAULT_WEATHER_TTL
+        try:
+            # "time" is local to the location; utc_offset_seconds converts it back
+            observed = datetime.fromisoformat(current["time"]).replace(tzinfo=timezone.utc).timestamp()
+            observed -= data.get("utc_offset_seconds", 0)
+            expires = observed + interval
+        except (KeyError, TypeError, ValueError):
+            expires = time.time() + interval
+        # never re-poll more often than once a minute if the provider is late
+        return max(expires, time.time() + 60)
+
+    def _fetch(self, lat, lon):
+        data = self.provider.current_weather(lat, lon)
+        with self._lock:
+            self._weather[self._key(lat, lon)] = {"data": data, "expires_at": self._expires_at(data)}
+            _write_json_atomic(self.weather_file, self._weather)
+        return data
+
+    def _refresh_in_background(self, lat, lon):
+        key = self._key(lat, lon)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def _run():
+            try:
+                self._fetch(lat, lon)
+            except Exception as e:
+                logging.error(f"Weather refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=_run, name="weather-refresh", daemon=True).start()
+
+    def current_weather(self, lat, lon):
+        """Forecast payload; only the very first call for a location waits on HTTP."""
+        with self._lock:
+            entry = self._weather.get(self._key(lat, lon))
+        if entry is None:
+            return self._fetch(lat, lon)
+        if entry["expires_at"] <= time.time():
+            self._refresh_in_background(lat, lon)
+        return entry["data"]
+
+    def prefetch(self, lat, lon):
+        self._refresh_in_background(lat, lon)
@@ -0,0 +1,16 @@
+"""
+Backfill the history rollup tables (hour/day/week/month buckets)
+from the raw window records already stored in the tracker database.
+
+Usage: python scripts/rebuild_rollups.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.api.Activitiy.history_api import _rollups, _history
+
+if __name__ == "__main__":
+    count = _rollups.rebuild(_history)
+    print(f"Rollups rebuilt from {count} raw records")
@@ -0,0 +1,17 @@
+"""
+The tests exercise the server's service modules, not the Flask app.
+app/__init__.py imports Core (database.config, ...) and builds every
+blueprint, so `app` is registered here as a bare package: `app.services.*`
+and `app.core.*` import without Core being installed.
+"""
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+if "app" not in sys.modules:
+    _app = types.ModuleType("app")
+    _app.__path__ = [str(ROOT / "app")]
+    sys.modules["app"] = _app
@@ -0,0 +1,34 @@
+"""AICacheStore.import_entries validation: a bad entry is rejected before anything is written."""
+import pytest
+
+from app.services.Productivity.ai_cache_store import AICacheStore
+
+CATEGORIES = ("productive", "unproductive", "neutral")
+
+
+def _store(tmp_path):
+    return AICacheStore(f"sqlite:///{tmp_path / 'cache.db'}", categories=CATEGORIES)
+
+
+@pytest.mark.parametrize("entries", [
+    [{"resource": "a.com", "category": "productive"}, "b.com"],
+    [{"resource": "a.com", "category": "productive"}, {"resource": "b.com", "category": "bogus"}],
+    {"a.com": "productive", "b.com": ["neutral"]},
+    [{"resource": "", "category": "neutral"}],
+    [{"resource": "a.com", "category": "neutral", "created_at": "yesterday"}],
+    "a.com",
+])
+def test_invalid_import_is_rejected_whole(tmp_path, entries):
+    store = _store(tmp_path)
+    with pytest.raises(ValueError):
+        store.import_entries(entries)
+    assert len(store) == 0
+    assert len(_store(tmp_path)) == 0
+
+
+def test_lenient_import_skips_invalid_entries(tmp_path):
+    store = _store(tmp_path)
+    count = store.import_entries({"A.com ": "productive", "b.com": "bogus", "c.com": None}, strict=False)
+    assert count == 1
+    assert store.as_dict() == {"a.com": "productive"}
+    assert _store(tmp_path).get("a.com") == "productive"
@@ -0,0 +1,84 @@
+"""
+ClassificationQueue against a fake provider: duplicates share one call,
+misses go out in batches, the rate limit holds and the backlog is bounded.
+"""
+import threading
+import time
+
+import pytest
+
+from app.services.Productivity.ai_queue import ClassificationQueue, QueueFull, TokenBucket
+
+
+class FakeProvider:
+    """classify_batch(texts) with a gate, recording every call."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def classify_batch(self, texts):
+        self.gate.wait(5)
+        self.calls.append(list(texts))
+        return ["productive" if "code" in t else "distracting" for t in texts]
+
+
+class SingleProvider:
+    def __init__(self):
+        self.calls = []
+
+    def classify(self, text):
+        self.calls.append(text)
+        return "neutral"
+
+
+def test_duplicates_coalesce_and_misses_are_batched():
+    provider = FakeProvider()
+    provider.gate.clear()
+    queue = ClassificationQueue(lambda: provider, workers=1, batch_size=3, batch_wait=0.05)
+    first = queue.submit("code.visualstudio.com")
+    time.sleep(0.2)  # the worker holds the first batch at the gate
+    futures = [queue.submit(text) for text in ("youtube.com", "YouTube.com ", "github.com/code", "reddit.com")]
+    assert futures[0] is futures[1] and queue.is_pending("youtube.com")
+    provider.gate.set()
+    assert first.result(5) == "productive"
+    assert [f.result(5) for f in futures] == ["distracting", "distracting", "productive", "distracting"]
+    assert provider.calls == [["code.visualstudio.com"], ["youtube.com", "github.com/code", "reddit.com"]]
+    stats = queue.stats()
+    assert stats["coalesced"] == 1 and stats["provider_calls"] == 2 and stats["classified"] == 4
+
+
+def test_results_reach_the_listeners():
+    provider, seen = FakeProvider(), []
+    queue = ClassificationQueue(lambda: provider, workers=1, batch_wait=0)
+    queue.on_result(lambda resource, category, prov: seen.append((resource, category, prov)))
+    assert queue.submit("code").result(5) == "productive"
+    assert seen == [("code", "productive", provider)]
+
+
+def test_rate_limit_spaces_provider_calls():
+    provider = SingleProvider()
+    queue = ClassificationQueue(lambda: provider, workers=1, batch_size=10, batch_wait=0.05)
+    # 10 calls per second after a burst of one
+    queue._limits["SingleProvider"] = (threading.BoundedSemaphore(1), TokenBucket(600, burst=1))
+    started = time.monotonic()
+    futures = [queue.submit(f"site{i}.com") for i in range(4)]
+    assert [f.result(5) for f in futures] == ["neutral"] * 4
+    assert time.monotonic() - started >= 0.3
+    assert len(provider.calls) == 4
+
+
+def test_backlog_is_bounded():
+    provider = FakeProvider()
+    provider.gate.clear()
+    queue = ClassificationQueue(lambda: provider, workers=1, batch_size=1, batch_wait=0, max_pending=2)
+    queue.submit("a.com")
+    time.sleep(0.2)  # picked up, stuck at the gate
+    queue.submit("b.com")
+    queue.submit("c.com")
+    assert queue.submit("b.com") is not None  # a duplicate still coalesces
+    with pytest.raises(QueueFull):
+        queue.submit("d.com")
+    assert queue.stats()["rejected"] == 1
+    provider.gate.set()
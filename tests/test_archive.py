@@ -0,0 +1,175 @@
+"""
+The cold archive: spans do not depend on how retention batches the rows,
+unparsable timestamps are dropped, and /raw?source=database and the samples
+export read the archive of WindowHistory's table, then the table.
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, text
+
+from app.core.database import get_engine
+from app.services.History.archive import RawSampleArchive, compact_samples
+from app.services.History.core_raw import CoreRawTable
+from app.services.History.raw_reader import RawRecordReader
+from app.services.History.retention import RetentionManager, RetentionPolicy
+
+T0 = datetime(2026, 3, 1, 9, 0, 0)
+COLUMNS = ("id", "timestamp", "app", "title", "status", "window_type")
+
+
+def _rows(count, start_id=1):
+    # runs of 5 samples per title, a 60 s gap after every 12th sample
+    return [{"id": start_id + i, "timestamp": (T0 + timedelta(seconds=i + 60 * (i // 12))).isoformat(),
+             "app": "code", "title": f"t{i // 5}", "status": "productive", "window_type": "editor"}
+            for i in range(count)]
+
+
+def test_unparsable_timestamps_are_skipped():
+    rows = [{"id": 1, "timestamp": "", "app": "code"}, *_rows(3, 2), {"id": 9, "timestamp": "garbage"}]
+    spans, run = compact_samples(rows)
+    assert spans == [] and run["samples"] == 3 and run["start"] == T0.isoformat()
+
+
+@pytest.mark.parametrize("batch", [1, 2, 7, 100])
+def test_spans_do_not_depend_on_batches(tmp_path, batch):
+    rows = _rows(40)
+    whole = RawSampleArchive(tmp_path / "whole")
+    whole.archive_rows(rows)
+    batched = RawSampleArchive(tmp_path / "batched")
+    for i in range(0, len(rows), batch):
+        batched.archive_rows(rows[i:i + batch])
+        if i == 14:
+            batched = RawSampleArchive(tmp_path / "batched")  # the open run survives a restart
+    expected = list(whole.iter_spans())
+    assert list(batched.iter_spans()) == expected
+    assert [s["samples"] for s in expected] == [5, 5, 2, 3, 5, 4, 1, 5, 5, 1, 4]
+    assert batched.stats()["samples"] == 40 and batched.stats()["spans"] == len(expected)
+
+
+def test_retention_drops_rows_without_timestamp(tmp_path):
+    archive = RawSampleArchive(tmp_path / "archive")
+    manager = RetentionManager(f"sqlite:///{tmp_path / 'raw.db'}", [
+        RetentionPolicy("samples", "samples", "timestamp", 7, cutoff=lambda dt: dt.isoformat(),
+                        archive=archive.archive_rows, columns=COLUMNS),
+    ], batch_size=4, pause=0)
+    with manager.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE samples (id INTEGER PRIMARY KEY, timestamp TEXT, app TEXT, "
+                          "title TEXT, status TEXT, window_type TEXT)"))
+        conn.execute(text("INSERT INTO samples (timestamp, app) VALUES ('', 'code')"))
+        conn.execute(
+            text("INSERT INTO samples (timestamp, app, title, status, window_type) "
+                 "VALUES (:timestamp, :app, :title, :status, :window_type)"), _rows(10))
+    job_id = manager.start()["job_id"]
+    while not manager.get(job_id)["finished_at"]:
+        time.sleep(0.01)
+    job = manager.get(job_id)
+    assert job["status"] == "done" and job["deleted"] == 11
+    assert [s["samples"] for s in archive.iter_spans()] == [5, 5]
+
+
+@pytest.fixture
+def reader(tmp_path):
+    # seconds 0-19 of Core's table are archived, the table keeps 20-39
+    at = lambda i: T0 + timedelta(seconds=i)
+    archive = RawSampleArchive(tmp_path / "archive")
+    archive.archive_rows([{"id": i, "timestamp": at(i).isoformat(), "app": "code", "title": f"t{i // 10}",
+                           "status": None, "window_type": None} for i in range(20)])
+    engine = get_engine(f"sqlite:///{tmp_path / 'raw.db'}")
+    core = Table("window_records", MetaData(), Column("id", Integer, primary_key=True),
+                 Column("timestamp", DateTime), Column("app_name", String), Column("window_title", String))
+    core.metadata.create_all(engine.engine)
+    with engine.begin() as conn:
+        conn.execute(core.insert(), [{"timestamp": at(i), "app_name": "code", "window_title": f"t{i // 10}"}
+                                     for i in range(20, 40)])
+    return RawRecordReader(CoreRawTable(engine), archive)
+
+
+def _summary(records):
+    return [(r["title"], r.get("samples", 1)) for r in records]
+
+
+def test_database_source_reads_archive_then_table(reader):
+    records, _ = reader.page()
+    expected = [("t0", 10), ("t1", 10)] + [("t2", 1)] * 10 + [("t3", 1)] * 10
+    assert _summary(records) == expected
+
+    seen, after, after_id = [], (T0 - timedelta(seconds=1)).isoformat(), None
+    while True:
+        records, key = reader.page(limit=3, after=after, after_id=after_id)
+        records = list(records)
+        if not records:
+            break
+        seen += records
+        after, after_id = key
+    assert _summary(seen) == expected
+
+
+def test_samples_export_has_one_column_set(reader):
+    rows = list(reader.samples_between(T0 + timedelta(seconds=5), T0 + timedelta(seconds=25)))
+    assert _summary(rows) == [("t1", 10)] + [("t2", 1)] * 5
+    assert all(set(COLUMNS + ("duration", "samples")) <= set(r) for r in rows)
+    assert rows[-1]["duration"] == 1 and rows[0]["duration"] == 10
+
+
+def test_core_table_is_archived_and_read_back(tmp_path):
+    # Core's rows older than 30 days move to their own archive; the reader chains it before the table
+    now = datetime.now().replace(microsecond=0)
+    at = lambda i: now - timedelta(days=40 if i < 20 else 1) + timedelta(seconds=i)
+    manager = RetentionManager(f"sqlite:///{tmp_path / 'core.db'}", [], batch_size=6, pause=0)
+    core = Table("window_records", MetaData(), Column("id", Integer, primary_key=True),
+                 Column("timestamp", DateTime), Column("app_name", String), Column("window_title", String))
+    core.metadata.create_all(manager.engine.engine)
+    with manager.engine.begin() as conn:
+        conn.execute(core.insert(), [{"timestamp": at(i), "app_name": "code", "window_title": f"t{i // 10}"}
+                                     for i in range(30)])
+    core_archive = RawSampleArchive(tmp_path / "core_archive")
+    core_raw = CoreRawTable(manager.engine)
+    policy = core_raw.retention_policy(30, archive=core_archive.archive_rows)
+    manager.policies[policy.name] = policy
+    manager.start()
+    while manager.jobs()[0]["finished_at"] is None:
+        time.sleep(0.01)
+    assert manager.jobs()[0]["deleted"] == 20
+
+    reader = RawRecordReader(core_raw, core_archive)
+    records, _ = reader.page()
+    expected = [("t0", 10), ("t1", 10)] + [("t2", 1)] * 10
+    assert _summary(records) == expected
+    seen, after, after_id = [], (at(0) - timedelta(seconds=1)).isoformat(), None
+    while True:
+        records, key = reader.page(limit=4, after=after, after_id=after_id)
+        records = list(records)
+        if not records:
+            break
+        seen += records
+        after, after_id = key
+    assert _summary(seen) == expected
+
+
+def test_crash_between_append_and_manifest_is_undone(tmp_path, monkeypatch):
+    rows = _rows(40)
+    whole = RawSampleArchive(tmp_path / "whole")
+    whole.archive_rows(rows)
+
+    archive = RawSampleArchive(tmp_path / "crashed")
+    archive.archive_rows(rows[:17])
+    saves = []
+
+    def crash_after_append():
+        saves.append(1)
+        if len(saves) == 2:  # the spans are on disk, the new last_key is not
+            raise SystemExit("killed")
+        save()
+
+    save = archive._save_manifest
+    monkeypatch.setattr(archive, "_save_manifest", crash_after_append)
+    with pytest.raises(SystemExit):
+        archive.archive_rows(rows[17:])
+
+    # restart: retention hands the same (undeleted) batch over again
+    restarted = RawSampleArchive(tmp_path / "crashed")
+    restarted.archive_rows(rows[17:])
+    assert list(restarted.iter_spans()) == list(whole.iter_spans())
+    assert restarted.stats()["samples"] == whole.stats()["samples"] == 40
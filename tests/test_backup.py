@@ -0,0 +1,119 @@
+"""
+Online backups: the job reports page progress while writers keep committing,
+the compressed file is a consistent copy, one backup runs at a time, and
+pruning keeps the newest file whatever its age.
+"""
+import gzip
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app.services.History.backup import BACKUP_PREFIX, BackupManager, zstd_available
+
+
+def _wait(manager, job_id, seen=None):
+    for _ in range(1000):
+        job = manager.get(job_id)
+        if seen is not None:
+            seen.append(job)
+        if job["finished_at"]:
+            return job
+        time.sleep(0.005)
+    raise AssertionError("backup did not finish")
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "tracker.db"
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE samples (id INTEGER PRIMARY KEY, payload TEXT)")
+    conn.executemany("INSERT INTO samples (payload) VALUES (?)", [("x" * 500,)] * 2000)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_progress_while_writers_commit(database, tmp_path):
+    manager = BackupManager(f"sqlite:///{database}", tmp_path / "backups", pages_per_step=10, step_sleep=0.005)
+    stop = threading.Event()
+    written = []
+
+    def tracker():
+        conn = sqlite3.connect(database, timeout=5)
+        while not stop.is_set():
+            conn.execute("INSERT INTO samples (payload) VALUES ('tick')")
+            conn.commit()
+            written.append(1)
+            time.sleep(0.002)
+        conn.close()
+
+    writer = threading.Thread(target=tracker)
+    writer.start()
+    try:
+        job = manager.start()
+        assert manager.start()["job_id"] == job["job_id"]  # one backup at a time
+        seen = []
+        job = _wait(manager, job["job_id"], seen)
+    finally:
+        stop.set()
+        writer.join()
+
+    assert job["status"] == "done", job["error"]
+    assert job["progress"] == 1.0 and job["pages_done"] == job["pages_total"] > 20
+    partial = [j["progress"] for j in seen if j["status"] == "running" and 0 < j["progress"] < 1]
+    assert partial and partial == sorted(partial)  # reported step by step
+    assert written  # the writer was never blocked for the whole copy
+
+    restored = tmp_path / "restored.db"
+    with gzip.open(job["path"], "rb") as src:
+        restored.write_bytes(src.read())
+    assert 2000 <= _rows(restored) <= 2000 + len(written)  # one consistent snapshot
+    assert job["bytes"] == os.path.getsize(job["path"])
+    assert not list((tmp_path / "backups").glob("*.partial"))
+
+
+def test_uncompressed_backup_and_argument_checks(database, tmp_path):
+    manager = BackupManager(f"sqlite:///{database}", tmp_path / "backups", step_sleep=0)
+    job = _wait(manager, manager.start("none")["job_id"])
+    assert job["status"] == "done" and job["path"].endswith(".db") and _rows(job["path"]) == 2000
+    with pytest.raises(ValueError):
+        manager.start("lz4")
+    if not zstd_available():
+        with pytest.raises(ValueError):
+            manager.start("zstd")
+    with pytest.raises(ValueError):
+        BackupManager("sqlite://", tmp_path / "backups").start()  # in-memory database
+
+
+def test_prune_keeps_the_newest_and_recent_backups(tmp_path):
+    backups = tmp_path / "backups"
+    backups.mkdir()
+    now = time.time()
+    ages = {"20260101_000000": 40, "20260110_000000": 20, "20260125_000000": 3}
+    for stamp, days in ages.items():
+        path = backups / f"{BACKUP_PREFIX}{stamp}.db.gz"
+        path.write_bytes(b"backup")
+        os.utime(path, (now - days * 86400,) * 2)
+    (backups / f".{BACKUP_PREFIX}20260126_000000.db.partial").write_bytes(b"in progress")
+
+    assert BackupManager("sqlite:///x.db", backups, retention_days=0).prune() == 0  # keep all
+    manager = BackupManager("sqlite:///x.db", backups, retention_days=14)
+    assert manager.prune() == 2
+    assert [os.path.basename(b["path"]) for b in manager.list_backups()] == [f"{BACKUP_PREFIX}20260125_000000.db.gz"]
+    assert (backups / f".{BACKUP_PREFIX}20260126_000000.db.partial").exists()
+
+    # every backup expired: the newest one still stays
+    os.utime(backups / f"{BACKUP_PREFIX}20260125_000000.db.gz", (now - 100 * 86400,) * 2)
+    assert manager.prune() == 0 and len(manager.list_backups()) == 1
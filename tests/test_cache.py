@@ -0,0 +1,65 @@
+"""
+Cached responses are dropped on invalidation and go stale a few seconds
+after the data behind them changed, not a whole TTL later.
+"""
+import pytest
+from flask import Flask, jsonify
+
+from app.core import cache as cache_module
+from app.core.cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    cache = ResponseCache(ttl=60, max_stale=5)
+    calls = []
+
+    @app.route("/value")
+    @cache.cached(tags=("analytics",))
+    def value():
+        calls.append(1)
+        return jsonify(len(calls))
+
+    app.cache = cache
+    return app.test_client()
+
+
+def _get(client):
+    return client.get("/value").get_json()
+
+
+def test_served_from_cache_until_ttl(client, clock):
+    assert _get(client) == 1
+    clock[0] += 59
+    assert _get(client) == 1
+    clock[0] += 2
+    assert _get(client) == 2
+
+
+def test_changed_data_is_stale_after_max_stale(client, clock):
+    cache = client.application.cache
+    assert _get(client) == 1
+    clock[0] += 1
+    cache.touch("analytics")
+    assert _get(client) == 1  # changed, but only a second old
+    clock[0] += 4
+    assert _get(client) == 2  # five seconds old and changed: recomputed
+    clock[0] += 30
+    assert _get(client) == 2  # nothing changed since
+    cache.touch("other")
+    assert _get(client) == 2
+    assert cache.stats()["stale"] == 1
+
+
+def test_invalidate_drops_entries(client, clock):
+    assert _get(client) == 1
+    client.application.cache.invalidate("analytics")
+    assert _get(client) == 2
@@ -0,0 +1,60 @@
+"""
+ScreenshotCatalog never resolves a path outside the screenshot folder, and
+indexes files saved outside the pipeline.
+"""
+import os
+
+import pytest
+
+from app.services.Capture import catalog as catalog_module
+from app.services.Capture.catalog import ScreenshotCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return ScreenshotCatalog(f"sqlite:///{tmp_path / 'catalog.db'}", tmp_path / "shots")
+
+
+@pytest.mark.parametrize("name", ["../secret.png", "/etc/passwd", "2026-01-01/../../secret.png"])
+def test_escaping_paths_are_rejected(catalog, name):
+    with pytest.raises(ValueError):
+        catalog.absolute(name)
+    with pytest.raises(ValueError):
+        catalog.thumbnail(name, "thumb")
+
+
+def test_paths_inside_the_folder(catalog, tmp_path):
+    assert catalog.absolute("2026-01-01/101500_ab.webp") == (tmp_path / "shots" / "2026-01-01" / "101500_ab.webp").resolve()
+    assert catalog.thumbnail("2026-01-01/missing.webp") is None
+
+
+def test_reconcile_indexes_only_unknown_files(catalog, tmp_path):
+    day = tmp_path / "shots" / "2026-01-01"
+    day.mkdir(parents=True)
+    (day / "101500_ab.webp").write_bytes(b"pipeline")
+    catalog.add({"timestamp": "2026-01-01T10:15:00", "filepath": str(day / "101500_ab.webp"),
+                 "bytes": 8, "app": "code"})
+    (day / "101600_core.png").write_bytes(b"core loop")  # saved by Core's capturer after the catalog existed
+    assert catalog.reconcile() == 1 and catalog.reconcile() == 0
+    rows = {row["path"]: row for row in catalog.query()}
+    assert rows["2026-01-01/101500_ab.webp"]["app"] == "code"  # the pipeline's row is kept
+    assert rows["2026-01-01/101600_core.png"]["bytes"] == 9
+    assert catalog.delete_range()["deleted"] == 2 and not list(day.glob("*.png"))
+
+
+def test_reconcile_only_lists_changed_folders(catalog, tmp_path, monkeypatch):
+    old, new = tmp_path / "shots" / "2026-01-01", tmp_path / "shots" / "2026-01-02"
+    old.mkdir(parents=True)
+    (old / "090000_core.png").write_bytes(b"a")
+    assert catalog.reconcile(full_scan=False) == 0  # no startup scan yet: nothing is walked
+    assert catalog.reconcile() == 1
+    listed = []
+    scandir = catalog_module.os.scandir
+    monkeypatch.setattr(catalog_module.os, "scandir", lambda path: listed.append(path) or scandir(path))
+    os.utime(old, (0, 0))  # not modified since the last scan
+    new.mkdir()
+    (new / "090000_core.png").write_bytes(b"b")
+    assert catalog.reconcile(full_scan=False) == 1
+    assert str(old) not in listed and str(new) in listed
+    assert sorted(row["path"] for row in catalog.query()) == ["2026-01-01/090000_core.png",
+                                                              "2026-01-02/090000_core.png"]
@@ -0,0 +1,139 @@
+"""
+The compiled classifier must agree with a plain linear scan of the same
+rules (the precedence documented in classifier.py).
+"""
+import random
+import re
+
+from app.services.Productivity.classifier import ClassifierEngine, normalise_resource, resource_host
+
+
+class FakeTracker:
+    def __init__(self, config):
+        self.config = config
+        self.detected = []
+
+    def detect_status(self, resource):
+        self.detected.append(resource)
+        return "neutral"
+
+
+def _on_boundaries(pattern, text):
+    regex = re.escape(pattern).replace(r"\*", ".*").replace(r"\?", ".")
+    before = r"(?<!\w)" if pattern[0].isalnum() or pattern[0] == "_" else ""
+    after = r"(?!\w)" if pattern[-1].isalnum() or pattern[-1] == "_" else ""
+    return re.search(before + regex + after, text) is not None
+
+
+def linear_classify(config, resource):
+    """Reference: try every entry of every source, keep the best ranked match."""
+    key = normalise_resource(resource)
+    host = resource_host(key)
+    best = None
+    for priority, source in enumerate(("user_overrides", "rules")):
+        section = config.get(source) or {}
+        if source == "rules":
+            entries = [(p, c) for c, patterns in section.items() for p in patterns]
+        else:
+            entries = list(section.items())
+        for order, (pattern, category) in enumerate(entries):
+            pattern = normalise_resource(pattern)
+            if not pattern:
+                continue
+            ranks = []
+            path = pattern.rstrip("/")
+            if pattern == key:
+                ranks.append((priority, 0, 0))
+            if "/" in path and "*" not in path and "?" not in path and key.startswith(path) \
+                    and len(key) > len(path) and key[len(path)] in "/?#":
+                ranks.append((priority, 1, -len(path)))
+            if pattern == host:
+                ranks.append((priority, 2, 0))
+            if host.endswith("." + pattern) and "*" not in pattern and "." in pattern:
+                ranks.append((priority, 3, -(pattern.count(".") + 1)))
+            if _on_boundaries(pattern, key):
+                ranks.append((priority, 4, -len(pattern), order))
+            for rank in ranks:
+                if best is None or rank < best[0]:
+                    best = (rank, category)
+    return best[1] if best else None
+
+
+def test_boundaries_and_precedence():
+    config = {
+        "user_overrides": {"youtube.com/watch": "neutral"},
+        "rules": {"productive": ["go", "github.com", "docs.*.io"], "distracting": ["youtube.com", "google.com"]},
+    }
+    engine = ClassifierEngine(FakeTracker(config))
+    compiled = engine._compiled
+    assert compiled.classify("google.com") == "distracting"
+    assert compiled.classify("https://go.dev/doc") == "productive"
+    assert compiled.classify("golang.org") is None
+    assert compiled.classify("gist.github.com") == "productive"
+    assert compiled.classify("www.youtube.com/watch") == "neutral"
+    assert compiled.classify("youtube.com/feed") == "distracting"
+    assert compiled.classify("docs.python.io/x") == "productive"
+
+
+def test_non_word_edges_and_path_prefixes():
+    config = {"rules": {"productive": [".edu", "github.com/myorg", "*.gov"],
+                        "distracting": ["github.com", "tube"]}}
+    compiled = ClassifierEngine(FakeTracker(config))._compiled
+    assert compiled.classify("mit.edu") == "productive"       # '.' edge needs no boundary
+    assert compiled.classify("education.com") is None
+    assert compiled.classify("usa.gov/x") == "productive"
+    assert compiled.classify("github.com/myorg/repo") == "productive"
+    assert compiled.classify("github.com/myorg?tab=1") == "productive"
+    assert compiled.classify("github.com/myorgs") == "distracting"
+    assert compiled.classify("github.com/other") == "distracting"
+
+
+def test_rules_beat_ai_cache():
+    class Cache:
+        def get(self, resource):
+            return "distracting"
+
+    config = {"rules": {"productive": ["github.com"]}}
+    engine = ClassifierEngine(FakeTracker(config), ai_cache=Cache())
+    assert engine.classify("github.com") == "productive"
+    assert engine.classify("reddit.com") == "distracting"
+
+
+def test_unknown_layout_uses_tracker():
+    tracker = FakeTracker({"rules": {"github.com": "productive"}})
+    engine = ClassifierEngine(tracker)
+    assert engine.classify("github.com") == "neutral"
+    assert tracker.detected == ["github.com"]
+
+
+def test_matches_linear_scan():
+    rnd = random.Random(3)
+    words = ["go", "git", "github", "google", "mail", "docs", "news", "tube", "you", "x"]
+    tlds = ["com", "io", "dev", "org"]
+
+    def domain():
+        return ".".join(rnd.sample(words, rnd.randint(1, 2))) + "." + rnd.choice(tlds)
+
+    def pattern():
+        choice = rnd.random()
+        if choice < 0.3:
+            return domain()
+        if choice < 0.4:
+            return domain() + "/" + rnd.choice(words) + rnd.choice(["", "/"])
+        if choice < 0.7:
+            return rnd.choice(words)
+        if choice < 0.8:
+            return "." + rnd.choice(tlds)
+        return rnd.choice(words) + rnd.choice(["*", "?", ".*."]) + rnd.choice(words + tlds)
+
+    categories = ["productive", "neutral", "distracting"]
+    for _ in range(40):
+        config = {
+            "user_overrides": {pattern(): rnd.choice(categories) for _ in range(rnd.randint(0, 4))},
+            "rules": {c: [pattern() for _ in range(rnd.randint(0, 6))] for c in categories},
+        }
+        compiled = ClassifierEngine(FakeTracker(config))._compiled
+        for _ in range(50):
+            resource = rnd.choice(["", "https://", "www."]) + domain() + \
+                rnd.choice(["", "/" + rnd.choice(words), "/" + rnd.choice(words) + "/" + rnd.choice(words) + "?q"])
+            assert compiled.classify(resource) == linear_classify(config, resource), (config, resource)
@@ -0,0 +1,79 @@
+"""
+A client's first poll gets the commands pushed since server start, not only later ones;
+acks never lose a command, and waiting readers wake on push.
+"""
+import threading
+import time
+from itertools import islice
+
+from app.services.Extension.commands import CommandQueue
+
+
+def test_new_client_gets_commands_pushed_before_first_poll():
+    queue = CommandQueue()
+    first = queue.push({"action": "close_tabs", "domain": "a.com"})
+    assert queue.pending() == [first]  # legacy 'default' client
+    assert queue.pending("tab-1") == [first]
+    queue.ack("tab-1")
+    assert queue.pending("tab-1") == []
+
+
+def test_journaled_backlog_is_not_replayed_to_new_clients(tmp_path):
+    journal = tmp_path / "commands.jsonl"
+    CommandQueue(journal_path=journal).push({"action": "close_tabs", "domain": "old.com"})
+    queue = CommandQueue(journal_path=journal)
+    fresh = queue.push({"action": "close_tabs", "domain": "new.com"})
+    assert queue.pending("tab-1") == [fresh]
+
+
+def test_ack_before_first_read_does_not_replay_the_backlog(tmp_path):
+    journal = tmp_path / "commands.jsonl"
+    CommandQueue(journal_path=journal).push({"action": "close_tabs", "domain": "old.com"})
+    queue = CommandQueue(journal_path=journal)
+    queue.ack("tab-1")
+    assert queue.pending("tab-1") == []
+
+
+def test_command_pushed_between_read_and_ack_stays_pending():
+    queue = CommandQueue()
+    first = queue.push({"action": "a"})
+    assert queue.pending("tab-1") == [first]
+    second = queue.push({"action": "b"})  # arrives while the client executes `first`
+    assert queue.ack("tab-1") == first["id"]
+    assert queue.pending("tab-1") == [second]
+
+
+def test_long_poll_wakes_on_push():
+    queue = CommandQueue()
+    result = []
+    reader = threading.Thread(target=lambda: result.append(queue.pending("tab-1", timeout=5)))
+    started = time.monotonic()
+    reader.start()
+    time.sleep(0.1)
+    command = queue.push({"action": "a"})
+    reader.join(5)
+    assert result == [[command]] and time.monotonic() - started < 2
+
+
+def test_stream_wakes_on_push_and_resumes_after_ack():
+    queue = CommandQueue()
+    stream = queue.iter_commands("tab-1", heartbeat=0.05)
+    assert next(stream) is None  # idle heartbeat
+    command = queue.push({"action": "a"})
+    assert next(stream) == command
+    queue.ack("tab-1", command["id"])
+    later = queue.push({"action": "b"})
+    assert list(islice(queue.iter_commands("tab-1", heartbeat=0.05), 1)) == [later]
+
+
+def test_unacknowledged_commands_are_kept_past_the_window():
+    queue = CommandQueue(max_commands=2, max_unacked=4)
+    queue.pending("tab-1")
+    pushed = [queue.push({"n": i}) for i in range(4)]
+    assert queue.pending("tab-1") == pushed  # nothing acked: nothing evicted
+    queue.ack("tab-1")
+    queue.push({"n": 4})
+    assert queue.stats()["queued"] == 2 and queue.stats()["dropped"] == 0
+    for i in range(5):
+        queue.push({"n": 5 + i})
+    assert queue.stats()["queued"] == 4 and queue.stats()["dropped"] == 2  # n4 and n5, logged
@@ -0,0 +1,29 @@
+"""
+A pattern op on list-shaped categories changes nothing in the snapshot: it is
+written straight through to config_manager, with no version bump or notification.
+"""
+from app.core.config_store import ConfigSection, ConfigStore
+from app.services.Config import sections
+
+
+def test_list_shaped_pattern_ops_write_through(tmp_path):
+    persisted, notified = [], []
+
+    def persist(op, args):
+        persisted.append((op, *args))
+        return args[0] != "rejected"
+
+    store = ConfigStore(tmp_path / "journal.jsonl", debounce=60)
+    store.register(ConfigSection("categories", lambda: sections.load_categories(["work"]),
+                                 sections.CATEGORY_OPS, persist))
+    store.subscribe(lambda *args: notified.append(args))
+
+    assert store.apply("categories", "create", "rejected")  # journaled, flushed before the write-through
+    notified.clear()
+    assert store.apply("categories", "add_pattern", "work", "github.com") is True
+    assert store.apply("categories", "add_pattern", "rejected", "x") is False
+    assert store.apply("categories", "remove_pattern", "missing", "x") is False
+    assert persisted == [("create", "rejected"), ("add_pattern", "work", "github.com"),
+                         ("add_pattern", "rejected", "x")]
+    assert notified == [] and store.version == 1 and store.section_version("categories") == 1
+    assert store.get("categories") == ["work", "rejected"]
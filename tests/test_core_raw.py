@@ -0,0 +1,83 @@
+"""
+Core's per-sample INSERT is taken out of its own sessions and batched into the same table.
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import Column, DateTime, Integer, String, text
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+
+from app.core.database import get_engine
+from app.services.History.core_raw import CoreRawTable, column_values, core_session_factory
+from app.services.History.sample_writer import SampleWriter
+
+Base = declarative_base()
+T0 = datetime(2026, 3, 1, 9, 0, 0)
+
+
+class WindowRecordDB(Base):  # stand-in for Core's model
+    __tablename__ = "window_records"
+    id = Column(Integer, primary_key=True)
+    timestamp = Column(DateTime, nullable=False)
+    app_name = Column(String)
+    window_title = Column(String)
+    status = Column(String, default="neutral")
+
+
+def _titles(engine):
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text("SELECT window_title FROM window_records ORDER BY timestamp, id"))]
+
+
+def test_core_records_are_batched_into_core_table(tmp_path):
+    url = f"sqlite:///{tmp_path / 'core.db'}"
+    engine = get_engine(url)
+    Base.metadata.create_all(engine.engine)
+    with engine.begin() as conn:  # the server's former copy must not be mistaken for Core's
+        conn.execute(text("CREATE TABLE raw_samples (id INTEGER PRIMARY KEY, timestamp TEXT, app TEXT, title TEXT)"))
+    core_sessions = sessionmaker(bind=engine.engine)
+    history = SimpleNamespace(db_manager=SimpleNamespace(SessionLocal=core_sessions))
+    assert core_session_factory(history) is core_sessions
+    assert core_session_factory(SimpleNamespace()) is None
+
+    writer = SampleWriter(url, flush_interval=3600)
+    core = CoreRawTable(engine)
+    assert core.name == "window_records"
+    assert not core.divert_inserts(None, writer)
+    assert core.divert_inserts(core_sessions, writer)
+    assert not core.divert_inserts(core_sessions, writer)
+
+    with core_sessions() as session:
+        session.add(WindowRecordDB(timestamp=T0, app_name="code", window_title="a"))
+        session.add(WindowRecordDB(timestamp=T0 + timedelta(seconds=1), app_name="code", window_title="b"))
+        session.commit()
+    assert _titles(engine) == []  # the tracker's commit wrote nothing
+    writer.flush()
+    assert _titles(engine) == ["a", "b"]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT DISTINCT status FROM window_records")).scalar() == "neutral"
+
+    writer._failing = True  # the writer is behind: Core keeps its INSERT
+    with core_sessions() as session:
+        session.add(WindowRecordDB(timestamp=T0 + timedelta(seconds=2), app_name="code", window_title="c"))
+        session.commit()
+    writer._failing = False
+    with Session(engine.engine) as session:  # other sessions are never touched
+        session.add(WindowRecordDB(timestamp=T0 + timedelta(seconds=3), app_name="code", window_title="d"))
+        session.commit()
+    assert _titles(engine) == ["a", "b", "c", "d"]
+    assert core.stats() == {"table": "window_records", "write_behind": True, "diverted": 2, "kept": 1}
+    assert writer.stats()["written"] == 2
+
+
+def test_column_values_skip_unset_columns():
+    record = WindowRecordDB(timestamp=T0, app_name="code")
+    assert column_values(record) == {"timestamp": T0, "app_name": "code"}
+
+
+def test_no_table_disables_everything(tmp_path):
+    url = f"sqlite:///{tmp_path / 'empty.db'}"
+    engine = get_engine(url)
+    core = CoreRawTable(engine)
+    assert core.name is None
+    assert not core.divert_inserts(sessionmaker(bind=engine.engine), SampleWriter(url, flush_interval=3600))
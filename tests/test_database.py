@@ -0,0 +1,95 @@
+"""
+SharedEngine: the pragmas reach every connection, writers are serialised by
+the writer lock and counted, and Core's own engine is reported as outside it.
+"""
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import Config
+from app.core.database import SharedEngine
+from app.services.History.core_raw import core_engine_stats
+
+
+def _engine(tmp_path):
+    engine = SharedEngine(f"sqlite:///{tmp_path / 'shared.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+    return engine
+
+
+def test_pragmas_apply_to_every_connection(tmp_path):
+    engine = _engine(tmp_path)
+    pragmas = engine.stats()["pragmas"]
+    assert pragmas["journal_mode"] == "wal"
+    assert pragmas["synchronous"] == 1  # NORMAL
+    assert pragmas["busy_timeout"] == Config.SQLITE_BUSY_TIMEOUT_MS
+    assert pragmas["cache_size"] == -Config.SQLITE_CACHE_MB * 1024
+    with engine.connect() as first, engine.connect() as second:
+        for conn in (first, second):
+            assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2  # a new file
+            assert conn.exec_driver_sql("PRAGMA temp_store").scalar() == 2  # MEMORY
+
+
+def test_writers_are_serialised_and_counted(tmp_path):
+    engine = _engine(tmp_path)
+    before = engine.stats()
+    inside, overlaps = [], []
+    entered = threading.Event()
+
+    def write(value, hold):
+        with engine.begin() as conn:
+            if inside:
+                overlaps.append(value)
+            inside.append(value)
+            entered.set()
+            conn.execute(text("INSERT INTO t VALUES (:x)"), {"x": value})
+            time.sleep(hold)
+            inside.remove(value)
+
+    first = threading.Thread(target=write, args=(1, 0.2))
+    first.start()
+    entered.wait(1)
+    others = [threading.Thread(target=write, args=(i, 0.01)) for i in range(2, 5)]
+    for thread in others:
+        thread.start()
+    for thread in (first, *others):
+        thread.join(5)
+
+    assert overlaps == []
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM t")).scalar() == 4
+    stats = engine.stats()
+    assert stats["writes"] - before["writes"] == 4
+    assert stats["contended_writes"] - before["contended_writes"] == 3
+    assert stats["write_wait_ms_max"] >= 100  # the others waited for the first writer
+    assert stats["reads"] - before["reads"] == 1
+
+
+def test_autocommit_holds_the_writer_slot(tmp_path):
+    engine = _engine(tmp_path)
+    order = []
+
+    def write():
+        with engine.begin():
+            order.append("write")
+
+    with engine.autocommit() as conn:
+        writer = threading.Thread(target=write)
+        writer.start()
+        time.sleep(0.1)
+        order.append("vacuum")
+        conn.exec_driver_sql("VACUUM")  # not allowed inside a transaction
+    writer.join(5)
+    assert order == ["vacuum", "write"]
+
+
+def test_core_engine_is_reported_outside_the_writer_lock(tmp_path):
+    shared = _engine(tmp_path)
+    core = create_engine(f"sqlite:///{tmp_path / 'shared.db'}")
+    stats = core_engine_stats(sessionmaker(bind=core), shared)
+    assert stats["found"] and not stats["shared"] and stats["writer_lock"] is False
+    assert stats["pragmas"]["journal_mode"] == "wal"  # a database property, set by the shared engine
+    assert core_engine_stats(None, shared)["found"] is False
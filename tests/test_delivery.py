@@ -0,0 +1,104 @@
+"""
+Screenshot downloads: strong ETags, 304 on If-None-Match, 206 ranges and an
+immutable cache lifetime; many files stream as one stored zip without
+leaving the screenshot folder.
+"""
+import io
+import os
+import zipfile
+
+import pytest
+from flask import Flask
+
+from app.services.Capture import delivery
+from app.services.Capture.delivery import IMMUTABLE_MAX_AGE, image_etag, send_image
+from app.services.Capture.zip_stream import folder_members, iter_zip
+
+WEBP = b"RIFF\x10\x00\x00\x00WEBPVP8 " + bytes(range(40))
+
+
+@pytest.fixture
+def shots(tmp_path):
+    day = tmp_path / "shots" / "2026-03-01"
+    day.mkdir(parents=True)
+    (day / "a.webp").write_bytes(WEBP * 50)
+    (day / "b.webp").write_bytes(b"second" * 10)
+    (tmp_path / "secret.txt").write_text("outside")
+    return tmp_path / "shots"
+
+
+@pytest.fixture
+def client(shots):
+    app = Flask(__name__)
+
+    @app.route("/file/<path:name>")
+    def file(name):
+        return send_image(shots / name, as_attachment=True)
+
+    @app.route("/thumb/<path:name>")
+    def thumb(name):
+        return send_image(shots / name, data=b"\xff\xd8\xff thumbnail")
+
+    return app.test_client()
+
+
+def test_strong_etag_and_304(client, shots):
+    path = shots / "2026-03-01" / "a.webp"
+    first = client.get("/file/2026-03-01/a.webp")
+    assert first.status_code == 200 and first.data == path.read_bytes()
+    assert first.headers["ETag"] == f'"{image_etag(path)}"'  # strong: no W/ prefix
+    assert first.cache_control.max_age == IMMUTABLE_MAX_AGE
+    assert first.cache_control.public and first.cache_control.immutable
+    assert "attachment" in first.headers["Content-Disposition"]
+
+    again = client.get("/file/2026-03-01/a.webp", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and again.data == b""
+    other = client.get("/file/2026-03-01/a.webp", headers={"If-None-Match": '"something-else"'})
+    assert other.status_code == 200
+
+
+def test_range_requests(client, shots):
+    body = (shots / "2026-03-01" / "a.webp").read_bytes()
+    partial = client.get("/file/2026-03-01/a.webp", headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206 and partial.data == body[10:20]
+    assert partial.headers["Content-Range"] == f"bytes 10-19/{len(body)}"
+    tail = client.get("/file/2026-03-01/a.webp", headers={"Range": "bytes=-5"})
+    assert tail.status_code == 206 and tail.data == body[-5:]
+    assert client.get("/file/2026-03-01/a.webp", headers={"Range": f"bytes={len(body) + 10}-"}).status_code == 416
+
+
+def test_thumbnail_etag_follows_its_bytes(client, shots):
+    response = client.get("/thumb/2026-03-01/a.webp")
+    assert response.mimetype == "image/jpeg" and response.data == b"\xff\xd8\xff thumbnail"
+    assert response.headers["ETag"] == f'"{image_etag(None, response.data)}"'
+    assert response.headers["ETag"] != f'"{image_etag(shots / "2026-03-01" / "a.webp")}"'
+
+
+def test_file_is_hashed_once_until_it_changes(shots):
+    path = shots / "2026-03-01" / "b.webp"
+    delivery.file_digest.cache_clear()
+    etag = image_etag(path)
+    assert image_etag(path) == etag and delivery.file_digest.cache_info().misses == 1
+    path.write_bytes(b"changed")
+    os.utime(path, ns=(1, 1))
+    assert image_etag(path) != etag
+
+
+def test_zip_streams_only_files_inside_the_folder(shots):
+    members = folder_members(shots, ["2026-03-01/a.webp", "2026-03-01/b.webp", "../secret.txt",
+                                     "2026-03-01/missing.webp", "2026-03-01", None])
+    assert [name for name, _ in members] == ["2026-03-01/a.webp", "2026-03-01/b.webp"]
+
+    chunks = list(iter_zip(members, chunk_size=64))
+    assert len(chunks) > 3  # yielded while writing, not as one blob
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.testzip() is None
+    assert [i.compress_type for i in archive.infolist()] == [zipfile.ZIP_STORED] * 2
+    assert archive.read("2026-03-01/a.webp") == (shots / "2026-03-01" / "a.webp").read_bytes()
+
+
+def test_zip_skips_unreadable_members(shots, tmp_path):
+    good = shots / "2026-03-01" / "b.webp"
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(iter_zip([("gone.webp", tmp_path / "gone.webp"),
+                                                           ("b.webp", good)]))))
+    assert archive.namelist() == ["b.webp"] and archive.read("b.webp") == good.read_bytes()
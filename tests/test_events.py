@@ -0,0 +1,87 @@
+"""
+The event bus keeps one pending event per topic per subscriber, replays the
+current state on subscribe, polls sources only while someone listens, and
+/api/stream turns it into SSE frames.
+"""
+import time
+
+from flask import Flask
+
+from app.core.events import Event, EventBus, Subscription, event_bus
+
+
+def test_slow_subscriber_gets_only_the_latest_state_per_topic():
+    bus = EventBus()
+    sub = bus.subscribe()
+    for i in range(5):
+        bus.publish("window", {"title": i})
+    bus.publish("tracker", {"running": True})
+    assert sub.get(0).data == {"title": 4}
+    assert sub.get(0).data == {"running": True}
+    assert sub.get(0.01) is None  # heartbeat time
+    assert sub.coalesced == 4 and bus.stats()["coalesced"] == 4
+    bus.unsubscribe(sub)
+
+
+def test_subscribe_replays_current_state_in_order_and_filters_topics():
+    bus = EventBus()
+    bus.publish("modes", "focus")
+    bus.publish("window", "a")
+    bus.publish("modes", "break")
+    sub = bus.subscribe(["window", "modes"])
+    assert [(e.topic, e.data) for e in (sub.get(0), sub.get(0))] == [("window", "a"), ("modes", "break")]
+    only_window = bus.subscribe(["window"])
+    bus.publish("modes", "focus")
+    assert only_window.get(0).data == "a" and only_window.get(0.01) is None
+
+
+def test_older_events_never_replace_newer_ones():
+    sub = Subscription()
+    assert sub.push(Event(2, "window", "new"))
+    assert not sub.push(Event(1, "window", "old"))
+    assert sub.get(0).data == "new"
+
+
+def test_publish_if_changed_uses_the_key():
+    bus = EventBus()
+    assert bus.publish_if_changed("tracker", {"running": True, "uptime": 1}, key=lambda d: d["running"])
+    assert not bus.publish_if_changed("tracker", {"running": True, "uptime": 2}, key=lambda d: d["running"])
+    assert bus.publish_if_changed("tracker", {"running": False, "uptime": 3}, key=lambda d: d["running"])
+    assert bus.stats()["last_event_id"] == 2
+
+
+def test_sources_are_polled_only_while_subscribed():
+    bus = EventBus(poll_interval=0.01)
+    calls = []
+    bus.register_source("device", lambda: calls.append(1) or len(calls) // 3)
+    time.sleep(0.05)
+    assert calls == []  # nobody listening
+    sub = bus.subscribe(["device"])
+    first = sub.get(1)
+    second = sub.get(1)
+    assert (first.data, second.data) == (0, 1)  # published only when the value changed
+    bus.unsubscribe(sub)
+    time.sleep(0.05)
+    polled = len(calls)
+    time.sleep(0.05)
+    assert len(calls) == polled and bus._poller is None
+
+
+def test_stream_endpoint_sends_sse_frames():
+    from app.api.Stream import stream_bp
+
+    app = Flask(__name__)
+    app.register_blueprint(stream_bp)
+    event_bus.publish("test-stream", {"n": 1})
+    before = event_bus.stats()["subscribers"]
+    response = app.test_client().get("/api/stream?topics=test-stream", buffered=False)
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    frames = iter(response.response)
+    assert next(frames) == b"retry: 3000\n\n"
+    assert next(frames).decode().endswith('event: test-stream\ndata: {"n": 1}\n\n')
+    event = event_bus.publish("test-stream", {"n": 2})
+    assert next(frames).decode() == f'id: {event.id}\nevent: test-stream\ndata: {{"n": 2}}\n\n'
+    assert event_bus.stats()["subscribers"] == before + 1
+    response.close()  # client gone: the subscription is dropped
+    assert event_bus.stats()["subscribers"] == before
@@ -0,0 +1,77 @@
+"""
+Exports name the rows after their dataset and end with an error record
+instead of a silently truncated file when reading fails midway.
+"""
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from app.services.History import export
+from app.services.History.export import SAMPLE_COLUMNS, arrow_schema, export_chunks, json_document_chunks
+
+ROWS = [{"id": i, "timestamp": f"2026-03-01T09:00:0{i}", "app": "code"} for i in range(3)]
+
+
+def _failing(after):
+    yield from ROWS[:after]
+    raise RuntimeError("disk gone")
+
+
+def _body(chunks):
+    chunks = list(chunks)
+    return b"".join(chunks) if isinstance(chunks[0], bytes) else "".join(chunks)
+
+
+def test_json_document_uses_the_dataset_name():
+    body = _body(json_document_chunks(iter(ROWS), "samples", {"period": "day"}, lambda: {"code": {}}))
+    assert json.loads(body) == {"export_info": {"period": "day"}, "samples": ROWS, "statistics": {"code": {}}}
+
+
+def test_json_document_reports_a_late_error():
+    body = _body(json_document_chunks(_failing(2), "sessions", {}, lambda: {}))
+    assert json.loads(body) == {"export_info": {}, "sessions": ROWS[:2], "error": "disk gone"}
+
+    def statistics():
+        raise RuntimeError("no statistics")
+
+    body = _body(json_document_chunks(iter(ROWS), "sessions", {}, statistics))
+    assert json.loads(body)["error"] == "no statistics"
+
+
+def test_early_error_raises_before_the_response():
+    with pytest.raises(RuntimeError):
+        export_chunks("csv", _failing(0), SAMPLE_COLUMNS)
+    with pytest.raises(RuntimeError):
+        json_document_chunks(_failing(0), "sessions", {}, dict)
+
+
+def test_late_error_ends_each_format_with_an_error_record():
+    rows = list(csv.reader(io.StringIO(_body(export_chunks("csv", _failing(2), SAMPLE_COLUMNS)))))
+    assert rows[0] == list(SAMPLE_COLUMNS) and len(rows) == 4 and rows[-1] == ["error", "disk gone"]
+
+    lines = _body(export_chunks("ndjson", _failing(2), SAMPLE_COLUMNS)).splitlines()
+    assert len(lines) == 3 and json.loads(lines[-1]) == {"error": "disk gone"}
+
+    lines = gzip.decompress(_body(export_chunks("columnar", _failing(2), SAMPLE_COLUMNS))).splitlines()
+    assert json.loads(lines[0])["rows"] == 2 and json.loads(lines[-1]) == {"error": "disk gone"}
+
+
+def test_complete_exports_have_no_error_record():
+    lines = _body(export_chunks("ndjson", iter(ROWS), SAMPLE_COLUMNS)).splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [0, 1, 2]
+
+
+def test_arrow_batches_share_the_declared_schema(monkeypatch):
+    pa = pytest.importorskip("pyarrow")
+    monkeypatch.setattr(export, "ROW_GROUP_SIZE", 2)
+    archived = [{"id": None, "timestamp": f"2026-02-01T09:00:0{i}", "app": "code", "title": None,
+                 "status": None, "window_type": None, "duration": 12.5, "samples": 12} for i in range(2)]
+    raw = [{**row, "title": "t", "duration": 1, "samples": 1} for row in ROWS]
+    body = _body(export_chunks("arrow", iter(archived + raw), SAMPLE_COLUMNS))
+    table = pa.ipc.open_stream(body).read_all()
+    assert table.schema == arrow_schema(SAMPLE_COLUMNS)
+    assert table.column("id").to_pylist() == [None, None, 0, 1, 2]
+    assert table.column("duration").to_pylist() == [12.5, 12.5, 1.0, 1.0, 1.0]
@@ -0,0 +1,96 @@
+"""
+/track-urls helpers: bounded body reads and gzip decoding, per-item statuses
+and per-tab de-duplication across batches.
+"""
+import gzip
+import io
+import json
+
+import pytest
+
+from app.services.Extension.ingest import BodyTooLarge, TabDeduper, decode_batch, read_body, triage_batch
+
+
+def _domain(url):
+    if url == "bad":
+        raise ValueError("no host")
+    return url.split("/")[2]
+
+
+def test_read_body_is_bounded():
+    assert read_body(io.BytesIO(b"[1]"), 3, max_size=10) == b"[1]"
+    with pytest.raises(BodyTooLarge):
+        read_body(io.BytesIO(b""), 11, max_size=10)  # refused from the header, nothing read
+    stream = io.BytesIO(b"x" * 100)
+    with pytest.raises(BodyTooLarge):
+        read_body(stream, None, max_size=10)  # chunked: read up to the limit only
+    assert stream.tell() == 11
+
+
+def test_decode_batch_layouts_and_gzip():
+    events = [{"url": "https://a.com/", "tabId": 1}]
+    plain = json.dumps(events).encode()
+    assert decode_batch(plain) == events
+    assert decode_batch(json.dumps({"events": events}).encode()) == events
+    assert decode_batch(gzip.compress(plain), "gzip") == events
+    assert decode_batch(gzip.compress(plain)) == events  # sniffed without the header
+    # concatenated gzip members are one body
+    assert decode_batch(gzip.compress(plain[:10]) + gzip.compress(plain[10:]), "gzip") == events
+
+
+@pytest.mark.parametrize("body, encoding", [
+    (b"not json", None),
+    (b'{"urls": []}', None),
+    (b'[{"url": "x", "tabId": {"a": 1}}]', None),
+    (gzip.compress(b"[]")[:-4], "gzip"),
+    (b"\x1f\x8bgarbage", None),
+])
+def test_decode_batch_rejects_malformed_bodies(body, encoding):
+    with pytest.raises(ValueError):
+        decode_batch(body, encoding)
+
+
+def test_decompression_is_capped():
+    bomb = gzip.compress(b"[" + b" " * 10_000 + b"]")
+    with pytest.raises(BodyTooLarge):
+        decode_batch(bomb, "gzip", max_size=1000)
+    assert decode_batch(bomb, "gzip", max_size=20_000) == []
+
+
+def test_tab_deduper_is_a_bounded_lru():
+    deduper = TabDeduper(max_tabs=2)
+    deduper.remember(None, "ignored")
+    deduper.remember(1, "a")
+    deduper.remember(2, "b")
+    deduper.remember(1, "a2")  # refreshes tab 1
+    deduper.remember(3, "c")   # evicts tab 2
+    assert (deduper.last(1), deduper.last(2), deduper.last(3), deduper.last(None)) == ("a2", None, "c", None)
+
+
+def test_triage_reports_each_item_in_order():
+    deduper = TabDeduper()
+    deduper.remember(7, "https://seen.com/")  # from an earlier batch
+    events = [
+        {"url": "https://seen.com/", "tabId": 7},     # same as the tab's last stored event
+        {"url": "https://a.com/x", "tabId": 1},
+        {"url": "https://a.com/x", "tabId": 1},       # repeat within the batch
+        {"url": "https://a.com/x", "tabId": 2},       # other tab
+        "https://b.com/",
+        {"tabId": 1},
+        {"url": "bad", "tabId": 3},
+        {"url": "https://a.com/y", "tabId": 1},
+        {"url": "https://a.com/x", "tabId": 1},       # not consecutive any more
+        {"url": "https://c.com/"},
+        {"url": "https://c.com/"},                    # no tab: never de-duplicated
+    ]
+    accepted, results, last_url = triage_batch(events, deduper, _domain, "2026-03-01T09:00:00")
+    assert [r["status"] for r in results] == [
+        "duplicate", "stored", "duplicate", "stored", "invalid", "invalid", "invalid",
+        "stored", "stored", "stored", "stored"]
+    assert [r["index"] for r in results] == list(range(len(events)))
+    assert results[6]["error"] == "no host"
+    assert [(e["url"], e["domain"]) for e in accepted][:2] == [("https://a.com/x", "a.com")] * 2
+    assert all(e["server_timestamp"] == "2026-03-01T09:00:00" for e in accepted)
+    assert last_url == {1: "https://a.com/x", 2: "https://a.com/x", None: "https://c.com/"}
+    # nothing is remembered until the caller has stored the batch
+    assert deduper.last(1) is None
@@ -0,0 +1,65 @@
+"""
+Core's URLTracker file keeps receiving every stored event (off the request
+path), and /stats (version 1) is URLTracker.get_stats() recomputed only
+when the file changed.
+"""
+import json
+import threading
+
+from app.services.Extension.legacy_file import LegacyURLFile
+
+
+class FakeURLTracker:
+    """Stands in for Core's URLTracker: a JSON array file rewritten per event."""
+
+    def __init__(self, path):
+        self.data_file = str(path)
+        self.stats_calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        path.write_text("[]", encoding="utf-8")
+
+    def save_url(self, url_data):
+        self.gate.wait(5)
+        with open(self.data_file, encoding="utf-8") as f:
+            data = json.load(f)
+        if url_data["url"] == "fail":
+            raise OSError("disk full")
+        data.append(url_data)
+        with open(self.data_file, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        return True
+
+    def get_stats(self):
+        self.stats_calls += 1
+        with open(self.data_file, encoding="utf-8") as f:
+            data = json.load(f)
+        return {"total_urls": len(data), "domains": sorted({e["domain"] for e in data})}
+
+
+def test_events_reach_core_file_and_stats_follow_it(tmp_path):
+    tracker = FakeURLTracker(tmp_path / "urls.json")
+    legacy = LegacyURLFile(tracker)
+    assert legacy.get_stats() == {"total_urls": 0, "domains": []}
+    assert legacy.get_stats() == {"total_urls": 0, "domains": []}
+    assert tracker.stats_calls == 1  # unchanged file: memoised
+
+    legacy.add_many([{"url": "https://a.com/", "domain": "a.com"}, {"url": "fail", "domain": None},
+                     {"url": "https://b.com/", "domain": "b.com"}])
+    assert legacy.flush(5)
+    assert legacy.get_stats() == {"total_urls": 2, "domains": ["a.com", "b.com"]}
+    assert tracker.stats_calls == 2
+    assert legacy.stats() == {"written": 2, "errors": 1, "dropped": 0, "pending": 0}
+
+
+def test_a_slow_core_file_does_not_block_and_is_bounded(tmp_path):
+    tracker = FakeURLTracker(tmp_path / "urls.json")
+    tracker.gate.clear()  # Core's rewrite is stuck
+    legacy = LegacyURLFile(tracker, max_pending=3)
+    legacy.add_many([{"url": f"https://a.com/{i}", "domain": "a.com"} for i in range(6)])  # returns at once
+    assert not legacy.flush(0.1)
+    tracker.gate.set()
+    assert legacy.flush(5)
+    stats = legacy.stats()
+    # the writer may already hold the first event when the rest are queued
+    assert stats["dropped"] in (2, 3) and stats["written"] + stats["dropped"] == 6
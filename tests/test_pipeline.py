@@ -0,0 +1,77 @@
+"""
+ScreenshotPipeline: unchanged frames are dropped before encoding, kept ones are
+encoded with the preset and saved under their day folder.
+"""
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from app.services.Capture.pipeline import ENCODE_PRESETS, ScreenshotPipeline, encode_image
+
+
+def _frame(shade, size=(640, 360)):
+    return Image.new("RGB", size, (shade, shade, shade))
+
+
+class Screen:
+    def __init__(self, *frames):
+        self.frames = list(frames)
+
+    def __call__(self):
+        return self.frames.pop(0) if self.frames else None
+
+
+def test_capture_once_skips_unchanged_frames(tmp_path):
+    screen = Screen(_frame(10), _frame(11), _frame(200))
+    pipeline = ScreenshotPipeline(screen, tmp_path, threshold=2, context=lambda: {"app": "code"})
+    assert pipeline.capture_once()
+    assert not pipeline.capture_once()  # 1 level brighter: within the tolerance
+    assert pipeline.capture_once()
+    assert not pipeline.capture_once()  # nothing captured
+    stats = pipeline.stats()
+    assert stats["captured"] == 3 and stats["skipped_duplicates"] == 1 and stats["queue_depth"] == 2
+
+
+def test_saved_frames_reach_the_listener(tmp_path):
+    saved = []
+    pipeline = ScreenshotPipeline(Screen(_frame(10)), tmp_path, preset="lossless",
+                                  on_saved=lambda record, img: saved.append(record),
+                                  context=lambda: {"app": "code", "session_id": "s1"})
+    pipeline.capture_once()
+    record = pipeline._save(*pipeline._queue.get_nowait())
+    assert saved == [record] and record["app"] == "code" and record["session_id"] == "s1"
+    path = Path(record["filepath"])
+    assert path.parent == tmp_path / record["timestamp"][:10] and path.exists() and path.stat().st_size == record["bytes"] and record["mimetype"] == "image/png"
+    assert pipeline.stats()["saved"] == 1 and pipeline.stats()["bytes_written"] == record["bytes"]
+
+
+def test_full_queue_keeps_the_newest_frame(tmp_path):
+    pipeline = ScreenshotPipeline(Screen(*(_frame(40 * i) for i in range(4))), tmp_path, queue_size=2)
+    for _ in range(4):
+        pipeline.capture_once()
+    assert pipeline.stats()["dropped"] == 2 and pipeline._queue.qsize() == 2
+
+
+@pytest.mark.parametrize("preset", sorted(ENCODE_PRESETS))
+def test_encode_image_presets(preset):
+    data, mimetype, ext, size = encode_image(_frame(90, (2000, 1000)), preset)
+    _, _, max_side = ENCODE_PRESETS[preset]
+    assert data and mimetype.startswith("image/") and ext in ("png", "webp", "jpg")
+    assert max(size) == (max_side or 2000)
+
+
+def test_encode_image_format_override():
+    data, mimetype, ext, _ = encode_image(Image.new("RGBA", (20, 10)), "high", fmt="jpg")
+    assert (mimetype, ext) == ("image/jpeg", "jpg") and data[:2] == b"\xff\xd8"
+    with pytest.raises(ValueError):
+        encode_image(_frame(0), fmt="tiff")
+
+
+@pytest.mark.parametrize("value", ["5", None, 0, -1, float("inf"), float("nan"), True])
+def test_invalid_intervals_are_rejected(tmp_path, value):
+    pipeline = ScreenshotPipeline(Screen(), tmp_path, interval=300)
+    with pytest.raises(ValueError):
+        pipeline.set_interval(value)
+    pipeline.set_interval(2.5)
+    assert pipeline.interval == 2.5
@@ -0,0 +1,90 @@
+"""
+RawHistoryBuffer must behave like the list it replaces (bounded to `capacity`).
+"""
+import random
+from dataclasses import dataclass
+
+import pytest
+
+from app.services.History.raw_buffer import RawHistoryBuffer, record_to_dict
+
+
+@dataclass
+class Window:
+    app: str
+    title: str
+    n: int
+
+
+def _check(buffer, reference):
+    assert list(buffer) == reference
+    assert len(buffer) == len(reference)
+    for limit in (None, 0, 1, 5, -3, 60, -60):
+        expected = reference[-limit:] if limit else reference
+        assert buffer.tail(limit) == expected
+        for app in "abc":
+            assert buffer.tail(limit, app) == [r for r in expected if r.app == app]
+
+
+def test_matches_list_operations():
+    rnd = random.Random(7)
+    buffer, reference = RawHistoryBuffer(50), []
+    for i in range(1500):
+        op, record = rnd.random(), Window(rnd.choice("abc"), "title", i)
+        if op < 0.7:
+            buffer.append(record)
+            reference = (reference + [record])[-50:]
+        elif op < 0.75 and reference:
+            index = rnd.randrange(len(reference))
+            assert buffer.pop(index) == reference.pop(index)
+        elif op < 0.8 and reference:
+            assert buffer.pop() == reference.pop()
+        elif op < 0.85 and reference:
+            del buffer[0]
+            del reference[0]
+        elif op < 0.88:
+            del buffer[1:4]
+            del reference[1:4]
+        elif op < 0.9:
+            buffer.insert(2, record)
+            reference.insert(2, record)
+            reference = reference[-50:]
+        elif op < 0.92 and reference:
+            index = rnd.randrange(len(reference))
+            buffer[index] = reference[index] = record
+        elif op < 0.94:
+            buffer.sort(key=lambda r: r.n, reverse=True)
+            reference.sort(key=lambda r: r.n, reverse=True)
+        elif op < 0.96 and reference:
+            buffer.remove(reference[0])
+            reference.remove(reference[0])
+        _check(buffer, reference)
+    assert buffer.copy() == reference and buffer == reference
+
+
+def test_records_are_core_objects():
+    record = Window("code", "main.py", 1)
+    buffer = RawHistoryBuffer(3, [record])
+    assert buffer[0] is record
+    buffer[-1].extra = "set by Core"
+    assert record_to_dict(buffer[0]) == {"app": "code", "title": "main.py", "n": 1, "extra": "set by Core"}
+
+
+def test_empty_pops_and_bad_index():
+    buffer = RawHistoryBuffer(2)
+    with pytest.raises(IndexError):
+        buffer.pop()
+    with pytest.raises(IndexError):
+        buffer[0]
+
+
+def test_keyset_pages_by_app():
+    buffer = RawHistoryBuffer(40)
+    for i in range(100):
+        buffer.append(Window("ab"[i % 3 == 0], "title", i))
+    seqs = [seq for seq, _ in buffer.items()]
+    for after_seq in (-1, 0, seqs[0], seqs[10], seqs[-1]):
+        for limit in (None, 0, 1, 7, 100):
+            for app in "abc":
+                expected = [(seq, r) for seq, r in buffer.items() if seq > after_seq and r.app == app]
+                assert buffer.items(limit, app, after_seq) == (expected[:limit] if limit else expected)
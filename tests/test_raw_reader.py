@@ -0,0 +1,124 @@
+"""
+/raw?source=database reads WindowHistory's table by time range; without a
+known table WindowHistory answers, and every tier's timestamps encode alike.
+"""
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table
+
+from app.core.database import get_engine
+from app.services.History.core_raw import CoreRawTable
+from app.services.History.raw_reader import HistoryRangeUnavailable, RawRecordReader, raw_record_to_dict
+from app.services.History.streaming import stream_records
+
+T0 = datetime(2026, 3, 1, 9, 0, 0)
+
+
+def _engine(path, core=()):
+    """A stand-in for Core's table holding `core` (timestamp, app, title)."""
+    engine = get_engine(f"sqlite:///{path}")
+    table = Table("window_records", MetaData(), Column("id", Integer, primary_key=True),
+                  Column("timestamp", DateTime), Column("app_name", String), Column("window_title", String))
+    table.metadata.create_all(engine.engine)
+    if core:
+        with engine.begin() as conn:
+            conn.execute(table.insert(), [{"timestamp": ts, "app_name": app, "window_title": title}
+                                          for ts, app, title in core])
+    return engine
+
+
+@pytest.fixture
+def reader(tmp_path):
+    core = [(T0 + timedelta(seconds=i), "ab"[i % 2], f"t{i}") for i in range(30)]
+    return RawRecordReader(CoreRawTable(_engine(tmp_path / "raw.db", core)))
+
+
+def _titles(records):
+    return [r["title"] for r in records]
+
+
+def test_newest_records(reader):
+    records, key = reader.page(limit=15)
+    assert _titles(records) == [f"t{i}" for i in range(15, 30)]
+    assert key[0] == (T0 + timedelta(seconds=29)).isoformat()
+    records, _ = reader.page(limit=5)
+    assert _titles(records) == [f"t{i}" for i in range(25, 30)]
+    records, _ = reader.page()
+    assert _titles(records) == [f"t{i}" for i in range(30)]
+
+
+def test_keyset_pages(reader):
+    seen, after, after_id = [], (T0 - timedelta(seconds=1)).isoformat(), None
+    while True:
+        records, key = reader.page(limit=7, after=after, after_id=after_id)
+        records = list(records)
+        if not records:
+            break
+        seen += _titles(records)
+        after, after_id = key
+    assert seen == [f"t{i}" for i in range(30)]
+
+
+def test_app_filter(reader):
+    records, _ = reader.page(limit=12, app="a")
+    assert _titles(records) == [f"t{i}" for i in range(6, 30, 2)]
+
+
+class HistoryStandIn:
+    """WindowHistory.get_raw_history_from_db: the newest `limit` records, newest first."""
+
+    def __init__(self, records):
+        self.records = [SimpleNamespace(timestamp=ts, app=app, title=title) for ts, app, title in records]
+        self.calls = []
+
+    def get_raw_history_from_db(self, limit=None, app_name=None):
+        self.calls.append(limit)
+        records = [r for r in reversed(self.records) if not app_name or r.app == app_name]
+        return records[:limit] if limit else records
+
+
+def test_unknown_core_table_falls_back_to_history(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'raw.db'}")
+    history = HistoryStandIn([(T0 + timedelta(seconds=i), "ab"[i % 2], f"t{i}") for i in range(10)])
+    reader = RawRecordReader(CoreRawTable(engine), history=history)
+    records, key = reader.page(limit=3)
+    assert _titles(records) == ["t7", "t8", "t9"] and history.calls == [3]
+    assert key == ((T0 + timedelta(seconds=9)).isoformat(), 0)
+    records, _ = reader.page(limit=3, after=(T0 + timedelta(seconds=2)).isoformat(), app="a")
+    assert _titles(records) == ["t4", "t6", "t8"]
+    with pytest.raises(HistoryRangeUnavailable):
+        RawRecordReader(CoreRawTable(engine)).page(limit=6)
+
+
+def test_timestamps_encode_alike_across_tiers():
+    app = Flask(__name__)
+    with app.test_request_context():
+        expected = json.loads(app.json.dumps({"timestamp": T0}))["timestamp"]
+        for record in ({"timestamp": T0}, {"timestamp": T0.isoformat()}, SimpleNamespace(timestamp=T0)):
+            body = stream_records([record], serialize=raw_record_to_dict).get_data()
+            assert json.loads(body)[0]["timestamp"] == expected
+
+
+def test_stream_error_is_reported_in_the_body():
+    app = Flask(__name__)
+
+    def failing():
+        yield {"n": 1}
+        raise RuntimeError("disk gone")
+
+    with app.test_request_context():
+        body = stream_records(failing()).get_data()
+        assert json.loads(body) == [{"n": 1}, {"error": "disk gone"}]
+        body = stream_records(failing(), envelope="urls").get_data()
+        assert json.loads(body) == {"urls": [{"n": 1}], "count": 1, "error": "disk gone"}
+
+        def failing_early():
+            raise RuntimeError("no database")
+            yield
+
+        with pytest.raises(RuntimeError):
+            stream_records(failing_early())
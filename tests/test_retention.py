@@ -0,0 +1,120 @@
+"""
+A cleanup job runs the batched policies (Core's raw table included), then the
+caller's steps (Core's cleanup), then the vacuum (converting an older file once).
+"""
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.services.History.core_raw import CoreRawTable
+from app.services.History.retention import RetentionManager, RetentionPolicy
+
+
+def _wait(manager, job_id):
+    for _ in range(200):
+        job = manager.get(job_id)
+        if job["finished_at"]:
+            return job
+        time.sleep(0.01)
+    raise AssertionError("cleanup job did not finish")
+
+
+def test_batched_policies_then_steps(tmp_path):
+    manager = RetentionManager(f"sqlite:///{tmp_path / 'retention.db'}", [
+        RetentionPolicy("sessions", "session_index", "start_time", 30, key="session_id",
+                        children=(("session_titles", "session_id"),)),
+    ], batch_size=3, pause=0)
+    now = datetime.now()
+    with manager.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE session_index (session_id TEXT PRIMARY KEY, start_time REAL)"))
+        conn.execute(text("CREATE TABLE session_titles (session_id TEXT, title TEXT)"))
+        for i in range(10):
+            ts = (now - timedelta(days=40 if i < 7 else 1)).timestamp() + i
+            conn.execute(text("INSERT INTO session_index VALUES (:id, :ts)"), {"id": f"s{i}", "ts": ts})
+            conn.execute(text("INSERT INTO session_titles VALUES (:id, 't')"), {"id": f"s{i}"})
+
+    def count():
+        with manager.engine.connect() as conn:
+            return conn.execute(text("SELECT COUNT(*) FROM session_index")).scalar()
+
+    calls = []
+    job = _wait(manager, manager.start(steps=[("core", lambda: calls.append(count()))])["job_id"])
+    assert calls == [3]  # the policies ran first
+    assert job["status"] == "done" and job["steps"] == {"core": {"status": "done"}}
+    assert job["deleted"] == 7 and job["policies"]["sessions"]["batches"] == 3
+    with manager.engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM session_index")).scalar() == 3
+        assert conn.execute(text("SELECT COUNT(*) FROM session_titles")).scalar() == 3
+
+    def failing():
+        raise RuntimeError("core cleanup failed")
+
+    job = _wait(manager, manager.start(steps=[("core", failing)])["job_id"])
+    assert job["status"] == "failed" and job["steps"]["core"]["status"] == "failed"
+    assert job["error"] == "core cleanup failed"
+
+
+def test_days_only_applies_to_named_policies(tmp_path):
+    manager = RetentionManager(f"sqlite:///{tmp_path / 'retention.db'}", [
+        RetentionPolicy("events", "events", "ts", 90),
+        RetentionPolicy("samples", "samples", "ts", 7),
+    ], pause=0)
+    now = datetime.now()
+    with manager.engine.begin() as conn:
+        for table in ("events", "samples"):
+            conn.execute(text(f"CREATE TABLE {table} (ts REAL)"))
+            conn.execute(text(f"INSERT INTO {table} VALUES (:ts)"), {"ts": (now - timedelta(days=10)).timestamp()})
+
+    job = _wait(manager, manager.start(1, [])["job_id"])
+    assert job["policies"] == {} and job["deleted"] == 0  # [] selects no policy
+    job = _wait(manager, manager.start(1, ["samples"])["job_id"])
+    assert list(job["policies"]) == ["samples"] and job["deleted"] == 1
+    with manager.engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM events")).scalar() == 1
+
+
+def test_core_raw_table_is_trimmed_in_batches(tmp_path):
+    manager = RetentionManager(f"sqlite:///{tmp_path / 'core.db'}", [], batch_size=4, pause=0)
+    now = datetime.now()
+    with manager.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE window_records (id INTEGER PRIMARY KEY, timestamp DATETIME, "
+                          "app_name TEXT, window_title TEXT)"))
+        for i in range(10):
+            ts = now - timedelta(days=40 if i < 9 else 1, seconds=-i)
+            conn.execute(text("INSERT INTO window_records (timestamp, app_name, window_title) "
+                              "VALUES (:ts, 'code', 't')"), {"ts": ts.isoformat(sep=" ")})
+    policy = CoreRawTable(manager.engine).retention_policy(30)
+    manager.policies[policy.name] = policy
+    job = _wait(manager, manager.start()["job_id"])
+    assert job["policies"]["core_raw"] == {"days": 30, "deleted": 9, "batches": 3, "status": "done"}
+    with manager.engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM window_records")).scalar() == 1
+
+
+def test_older_file_is_converted_to_incremental_vacuum(tmp_path):
+    path = tmp_path / "old.db"
+    raw = sqlite3.connect(path)  # created before the engine's pragmas: auto_vacuum=NONE
+    raw.execute("CREATE TABLE events (ts REAL, payload TEXT)")
+    old = (datetime.now() - timedelta(days=100)).timestamp()
+    raw.executemany("INSERT INTO events VALUES (?, ?)", [(old, "x" * 1000)] * 500)
+    raw.commit()
+    raw.close()
+
+    manager = RetentionManager(f"sqlite:///{path}", [RetentionPolicy("events", "events", "ts", 90)],
+                               batch_size=100, pause=0)
+    assert manager.auto_vacuum() == "none"
+    job = _wait(manager, manager.start()["job_id"])
+    assert job["status"] == "done" and job["deleted"] == 500
+    assert job["vacuum_migrated"] is True
+    assert manager.auto_vacuum() == "incremental" and manager.freelist_pages() == 0
+    assert manager.status()["auto_vacuum"] == "incremental"
+
+    # converted once: later jobs only run the incremental vacuum
+    with manager.engine.begin() as conn:
+        conn.execute(text("INSERT INTO events VALUES (:ts, :p)"), [{"ts": old, "p": "y" * 1000}] * 200)
+    job = _wait(manager, manager.start()["job_id"])
+    assert job["vacuum_migrated"] is False and job["vacuumed_pages"] > 0
+    assert manager.freelist_pages() == 0
+
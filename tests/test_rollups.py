@@ -0,0 +1,138 @@
+"""
+Rollup totals are WindowHistory's session arithmetic, and /context covers
+exactly the requested window.
+"""
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+
+from app.services.History.archive import RawSampleArchive
+from app.services.History.core_raw import CoreRawTable
+from app.services.History.rollups import RebuildRunning, RollupStore, period_bounds
+
+NOW = datetime(2026, 3, 2, 15, 40, 0)
+GAP = 30
+
+
+def _samples():
+    # code/editor and code/terminal, a switch to the browser, an idle gap, back to code
+    start = NOW - timedelta(hours=3, minutes=10)
+    plan = [("code", "editor", 600), ("code", "terminal", 300), ("browser", "web", 900),
+            (None, None, 120), ("code", "editor", 1200), ("browser", "web", 600), ("code", "terminal", 900)]
+    samples, ts = [], start
+    for app, context, seconds in plan:
+        for _ in range(0, seconds, 10):
+            if app:
+                samples.append(SimpleNamespace(timestamp=ts.isoformat(), app=app, status="productive",
+                                               window_type=context))
+            ts += timedelta(seconds=10)
+    return samples
+
+
+class CoreStandIn:
+    """WindowHistory's sessions: first to last sample, split on app change or a gap over GAP."""
+
+    def __init__(self, samples):
+        self.sessions = []
+        for sample in samples:
+            ts = datetime.fromisoformat(sample.timestamp)
+            last = self.sessions[-1] if self.sessions else None
+            if last and last["app"] == sample.app and (ts - last["end"]).total_seconds() <= GAP:
+                last["contexts"][last["context"]] += (ts - last["end"]).total_seconds()
+                last.update(end=ts, context=sample.window_type)
+            else:
+                self.sessions.append({"app": sample.app, "start": ts, "end": ts, "context": sample.window_type,
+                                      "contexts": defaultdict(float)})
+
+    def get_app_usage_by_period(self, period, offset=0):
+        start, end = period_bounds(period, offset, NOW)
+        usage = defaultdict(float)
+        for s in self.sessions:
+            if start <= s["start"] < end:
+                usage[s["app"]] += (s["end"] - s["start"]).total_seconds()
+        return dict(usage)
+
+
+def _insert_core(store, samples):
+    """Samples as rows of a stand-in for Core's raw table."""
+    with store.engine.begin() as conn:
+        conn.execute(store.core.table.insert(), [
+            {"timestamp": datetime.fromisoformat(s.timestamp), "app_name": s.app, "window_title": "",
+             "status": s.status, "window_type": s.window_type} for s in samples])
+
+
+def _store(tmp_path, samples):
+    store = RollupStore(f"sqlite:///{tmp_path / 'rollups.db'}", max_gap_seconds=GAP)
+    with store.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE window_records (id INTEGER PRIMARY KEY, timestamp DATETIME, "
+                          "app_name TEXT, window_title TEXT, status TEXT, window_type TEXT)"))
+    store.core = CoreRawTable(store.engine)
+    _insert_core(store, samples)
+    for sample in samples:
+        store.add_sample(sample)
+    store.flush()
+    return store
+
+
+def test_usage_matches_core_sessions(tmp_path):
+    samples = _samples()
+    store = _store(tmp_path, samples)
+    core = CoreStandIn(samples).get_app_usage_by_period("day")
+    assert store.usage_by_period("day", now=NOW) == core == {"code": 2970.0, "browser": 1480.0}
+
+
+@pytest.mark.parametrize("hours, expected", [
+    (2, {"terminal": 410.0}),                                  # 13:40: Core's table only
+    (3, {"terminal": 290.0 + 890.0, "editor": 1190.0}),        # 12:40: Core's table, then hour buckets
+])
+def test_context_window_is_exact(tmp_path, hours, expected):
+    store = _store(tmp_path, _samples())
+    assert store.context_breakdown("code", hours=hours, now=NOW) == expected
+
+
+def test_backfill_streams_core_archive_and_table(tmp_path):
+    samples = _samples()
+    store = _store(tmp_path, samples[50:])  # Core's table starts at sample 50, the archive has 0-49
+    store.core_archive = RawSampleArchive(tmp_path / "core_archive", max_gap=GAP, interval=10)
+    store.core_archive.archive_rows([{**vars(s), "id": i, "title": ""} for i, s in enumerate(samples[:50])])
+    assert store.rebuild() == len(samples)  # archived spans come back as their samples
+    assert store.usage_by_period("day", now=NOW) == CoreStandIn(samples).get_app_usage_by_period("day")
+
+
+def test_no_core_table_is_never_ready(tmp_path):
+    store = RollupStore(f"sqlite:///{tmp_path / 'rollups.db'}", max_gap_seconds=GAP)
+    store.ensure_backfilled()
+    assert not store.is_ready() and store.rebuild() == 0
+
+
+def test_rebuild_flushes_the_queue_and_runs_once(tmp_path):
+    samples = _samples()
+    store = _store(tmp_path, samples[:200])
+    queued = samples[200:]  # still in the write-behind queue when the rebuild starts
+    started, release = threading.Event(), threading.Event()
+
+    def flush_samples():
+        started.set()
+        release.wait(5)
+        _insert_core(store, queued)
+
+    store.flush_samples = flush_samples
+    job = store.start_rebuild()
+    assert started.wait(5)
+    with pytest.raises(RebuildRunning):
+        store.start_rebuild()
+    store.ensure_backfilled()  # the startup backfill leaves the running rebuild alone
+    release.set()
+    for _ in range(100):
+        if store.rebuild_job()["status"] != "running":
+            break
+        time.sleep(0.05)
+    assert store.rebuild_job() == {**job, "status": "done", "records": len(samples),
+                                   "finished_at": store.rebuild_job()["finished_at"]}
+    assert store.is_ready()
+    assert store.usage_by_period("day", now=NOW) == CoreStandIn(samples).get_app_usage_by_period("day")
@@ -0,0 +1,119 @@
+"""
+/sessions served from the session index must be byte-identical to the
+Core-backed response (jsonify of the session dataclass fields).
+"""
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from flask import Flask, jsonify
+from sqlalchemy import text
+
+from app.services.History.export import session_row
+from app.services.History.session_store import SessionStore, encode_document, session_summary, to_response
+
+T0 = datetime(2026, 3, 1, 9, 15, 30, 123456)
+
+
+@dataclass
+class Change:
+    at: datetime
+    status: str
+
+
+@dataclass
+class Session:
+    session_id: str
+    app_name: str
+    start_time: datetime
+    end_time: datetime
+    total_duration: float
+    context_changes: int
+    titles_seen: list
+    status_changes: object
+    window_count: int
+    is_active: bool = False
+
+    @property
+    def duration_minutes(self):
+        return self.total_duration / 60
+
+
+def core_response(s):
+    """The /sessions entry as the Core-backed branch builds it."""
+    return {
+        "session_id": s.session_id,
+        "app_name": s.app_name,
+        "start_time": s.start_time.isoformat(),
+        "end_time": s.end_time.isoformat() if s.end_time else None,
+        "total_duration": s.total_duration,
+        "duration_minutes": s.duration_minutes,
+        "context_changes": s.context_changes,
+        "titles_seen": s.titles_seen[-10:],
+        "status_changes": s.status_changes,
+        "window_count": s.window_count,
+        "is_active": s.is_active,
+    }
+
+
+def _sessions():
+    return [
+        Session("a1", "code", T0, T0 + timedelta(minutes=7), 420.5, 3, [f"t{i}" for i in range(15)],
+                [(T0, "productive"), {"at": T0 + timedelta(minutes=2), "to": "neutral"}, {2: True, 10: False},
+                 Change(T0 + timedelta(minutes=5), "distracting")], 4),
+        Session("b2", "browser", T0 + timedelta(hours=1), T0 + timedelta(hours=1, seconds=1), 1.0, 0, [],
+                {"productive": 0.25, "neutral": T0.date()}, 1),
+    ]
+
+
+def test_sessions_match_core_response(tmp_path):
+    app = Flask(__name__)
+    store = SessionStore(f"sqlite:///{tmp_path / 'sessions.db'}")
+    sessions = _sessions()
+    store.add_many(sessions)
+    with app.app_context():
+        expected = jsonify([core_response(s) for s in sessions]).get_data()
+        assert jsonify(store.sessions(titles=10)).get_data() == expected
+        # the still-open session goes through the same document
+        live = session_summary(sessions[0])
+        assert jsonify(to_response(live["_document"], live["_titles"][-10:])).get_data() == \
+            jsonify(core_response(sessions[0])).get_data()
+
+
+def test_export_rows_match_session_row(tmp_path):
+    store = SessionStore(f"sqlite:///{tmp_path / 'sessions.db'}")
+    sessions = _sessions()
+    sessions[0].status_changes = sessions[0].status_changes[:-1]  # str() of a dataclass is not JSON
+    store.add_many(sessions)
+    dump = lambda rows: json.dumps(list(rows), default=str, sort_keys=True)
+    assert dump(store.iter_export_rows()) == dump(session_row(s) for s in sessions)
+
+
+def test_status_changes_live_in_side_table(tmp_path):
+    store = SessionStore(f"sqlite:///{tmp_path / 'sessions.db'}")
+    sessions = _sessions()
+    store.add_many(sessions)
+    with store.engine.connect() as conn:
+        payloads = [p for (p,) in conn.execute(text("SELECT payload FROM session_documents"))]
+    assert all(json.loads(p)["status_changes"] is None for p in payloads)
+
+    with store.engine.begin() as conn:
+        conn.execute(text("UPDATE session_status_log SET payload = 'not json'"))
+    # skipped: the side table is never read
+    assert [s["status_changes"] for s in store.sessions(status_changes=False)] == [[], []]
+
+
+def test_documents_with_inline_status_changes_still_load(tmp_path):
+    app = Flask(__name__)
+    store = SessionStore(f"sqlite:///{tmp_path / 'sessions.db'}")
+    sessions = _sessions()
+    store.add_many(sessions)
+    # a file written before the side table: status_changes inside the document
+    with store.engine.begin() as conn:
+        for s in sessions:
+            conn.execute(text("UPDATE session_documents SET payload = :p WHERE session_id = :id"),
+                         {"p": encode_document(session_summary(s)["_document"]), "id": s.session_id})
+        conn.execute(text("DELETE FROM session_status_log"))
+    with app.app_context():
+        assert jsonify(store.sessions(titles=10)).get_data() == \
+            jsonify([core_response(s) for s in sessions]).get_data()
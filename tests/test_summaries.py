@@ -0,0 +1,146 @@
+"""
+The memoised summaries must be exactly what WindowHistory returns.
+"""
+from datetime import datetime, timedelta
+
+from flask import Flask, jsonify
+
+from app.services.History import summaries
+from app.services.History.summaries import SummaryCache
+
+
+class FakeHistory:
+    """WindowHistory summary API with call counting."""
+
+    def __init__(self, oldest_first=False, range_as_dict=False):
+        self.oldest_first = oldest_first
+        self.range_as_dict = range_as_dict
+        self.calls = 0
+        self.current_seconds = 10.0
+
+    def get_status_summary_by_period(self, period, offset=0):
+        self.calls += 1
+        start = datetime(2026, 1, 31) - timedelta(days=offset)
+        return {
+            "period": period,
+            "offset": offset,
+            "start_time": start,
+            "statuses": {"productive": self.current_seconds if offset == 0 else 3600.0 / (offset + 1),
+                         "neutral": 12.5},
+            "top_apps": [("code", 100.0 * offset), ("browser", 7.0)],
+        }
+
+    def _range(self, period, count):
+        items = [self.get_status_summary_by_period(period, i) for i in range(count)]
+        if self.range_as_dict:
+            return {item["start_time"].date().isoformat(): item for item in items}
+        return items[::-1] if self.oldest_first else items
+
+    def get_daily_summary_range(self, days=7):
+        return self._range("day", days)
+
+    def get_weekly_summary_range(self, weeks=4):
+        return self._range("week", weeks)
+
+    def get_monthly_summary_range(self, months=6):
+        return self._range("month", months)
+
+
+def _body(app, payload):
+    with app.app_context():
+        return jsonify(payload).get_data()
+
+
+def test_period_summary_matches_core():
+    app = Flask(__name__)
+    core, reference = FakeHistory(), FakeHistory()
+    cache = SummaryCache(core)
+    for offset in range(4):
+        for _ in range(2):
+            assert _body(app, cache.period("day", offset)) == \
+                _body(app, reference.get_status_summary_by_period("day", offset))
+
+
+def test_finished_periods_are_computed_once():
+    core = FakeHistory()
+    cache = SummaryCache(core, live_ttl=0)
+    cache.period("week", 2)
+    calls = core.calls
+    cache.period("week", 2)
+    assert core.calls == calls
+    cache.period("week", 0)  # without a live window the current period always comes from Core
+    cache.period("week", 0)
+    assert core.calls == calls + 2
+
+
+def test_ranges_match_core():
+    app = Flask(__name__)
+    for oldest_first, range_as_dict in ((False, False), (True, False), (False, True)):
+        core, reference = FakeHistory(oldest_first, range_as_dict), FakeHistory(oldest_first, range_as_dict)
+        cache = SummaryCache(core)
+        for count in (0, 1, 2, 7):
+            assert _body(app, cache.range("day", count)) == _body(app, reference.get_daily_summary_range(count))
+            assert _body(app, cache.range("month", count)) == _body(app, reference.get_monthly_summary_range(count))
+
+
+def test_live_answers_cost_one_core_call_per_window(monkeypatch):
+    app = Flask(__name__)
+    clock = [1000.0]
+    monkeypatch.setattr(summaries.time, "monotonic", lambda: clock[0])
+    core, reference = FakeHistory(), FakeHistory()
+    cache = SummaryCache(core, live_ttl=30)
+    cache.range("day", 5)
+    calls = core.calls
+    assert core.calls == 5  # Core's range call, nothing else
+    core.current_seconds = reference.current_seconds = 99.0
+    cache.range("day", 5)
+    cache.period("day", 0)
+    cache.period("day", 0)
+    assert core.calls == calls + 1  # the range is reused, the current period is read once
+    clock[0] += 31
+    assert _body(app, cache.range("day", 5)) == _body(app, reference.get_daily_summary_range(5))
+
+
+def test_closed_session_refreshes_the_current_period():
+    app = Flask(__name__)
+    core, reference = FakeHistory(), FakeHistory()
+    cache = SummaryCache(core)
+    cache.period("day", 0)
+    cache.period("day", 1)
+    core.current_seconds = reference.current_seconds = 42.0
+
+    class Session:
+        start_time = datetime.now()
+
+    cache.on_session_closed(Session())
+    calls = core.calls
+    assert _body(app, cache.period("day", 0)) == _body(app, reference.get_status_summary_by_period("day", 0))
+    cache.period("day", 1)  # a session of today leaves the finished periods alone
+    assert core.calls == calls + 1
+
+
+def test_old_session_invalidates_snapshots():
+    core = FakeHistory()
+    cache = SummaryCache(core)
+    cache.period("day", 1)
+
+    class Session:
+        start_time = datetime.now() - timedelta(days=1)
+
+    cache.on_session_closed(Session())
+    calls = core.calls
+    cache.period("day", 1)
+    assert core.calls == calls + 1
+
+
+def test_usage_is_cores():
+    class Usage(FakeHistory):
+        def get_app_usage_by_period(self, period, offset=0):
+            self.calls += 1
+            return {"code": 60.0 * (offset + 1)}
+
+    core = Usage()
+    cache = SummaryCache(core)
+    assert cache.usage("month", 2) == {"code": 180.0} and cache.usage("month", 2) == {"code": 180.0}
+    assert cache.usage("month", 0) == {"code": 60.0}
+    assert core.calls == 2
@@ -0,0 +1,140 @@
+"""
+MetricsSampler: I/O counters become per-second rates, the slow GPU probe runs
+every gpu_interval only, the ring buffer answers ?window= reads, and
+/api/widgets/system_stats validates the window.
+"""
+import time
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+from app.services.Widgets import system_metrics
+from app.services.Widgets.system_metrics import MetricsSampler
+
+
+class FakePsutil:
+    def __init__(self):
+        self.disk = SimpleNamespace(read_bytes=0, write_bytes=0)
+        self.net = SimpleNamespace(bytes_sent=0, bytes_recv=0)
+
+    def cpu_percent(self, interval=None, percpu=False):
+        return [10.0, 30.0] if percpu else 20.0
+
+    def virtual_memory(self):
+        return SimpleNamespace(percent=50.0, used=2048 * 1024 ** 2, total=4096 * 1024 ** 2)
+
+    def disk_io_counters(self):
+        return self.disk
+
+    def net_io_counters(self):
+        return self.net
+
+
+@pytest.fixture
+def fake_ps(monkeypatch):
+    fake = FakePsutil()
+    monkeypatch.setattr(system_metrics, "ps", fake)
+    return fake
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(system_metrics.time, "time", lambda: now[0])
+    return now
+
+
+def test_io_counters_become_rates(fake_ps, clock, monkeypatch):
+    monkeypatch.setattr(system_metrics, "get_gpu_usage", lambda: "GPU 0: 5.0% used")
+    sampler = MetricsSampler(interval=1, gpu_interval=10)
+    first = sampler.sample()
+    assert (first["disk_read_bps"], first["net_recv_bps"]) == (0.0, 0.0)  # no previous counters
+    assert (first["cpu"], first["cpu_per_core"], first["ram_used_mb"]) == (20.0, [10.0, 30.0], 2048)
+
+    clock[0] += 2
+    fake_ps.disk.read_bytes, fake_ps.disk.write_bytes = 4000, 1000
+    fake_ps.net.bytes_sent, fake_ps.net.bytes_recv = 600, 200
+    second = sampler.sample()
+    assert (second["disk_read_bps"], second["disk_write_bps"]) == (2000.0, 500.0)
+    assert (second["net_sent_bps"], second["net_recv_bps"]) == (300.0, 100.0)
+
+    clock[0] += 1
+    fake_ps.net.bytes_sent = 0  # counter reset (interface restarted)
+    assert sampler.sample()["net_sent_bps"] == 0.0
+
+
+def test_gpu_is_probed_every_gpu_interval_and_may_fail(fake_ps, clock, monkeypatch):
+    probes = []
+
+    def probe():
+        probes.append(clock[0])
+        if len(probes) == 2:
+            raise RuntimeError("nvidia-smi hung")
+        return f"probe {len(probes)}"
+
+    monkeypatch.setattr(system_metrics, "get_gpu_usage", probe)
+    sampler = MetricsSampler(interval=1, gpu_interval=10)
+    gpus = []
+    for _ in range(25):
+        gpus.append(sampler.sample()["gpu"])
+        clock[0] += 1
+    assert probes == [1000.0, 1010.0, 1020.0]
+    assert gpus[0] == "probe 1" and gpus[10].startswith("GPU probe failed") and gpus[24] == "probe 3"
+
+
+def test_history_window_and_ring_bound(fake_ps, clock, monkeypatch):
+    monkeypatch.setattr(system_metrics, "get_gpu_usage", lambda: None)
+    sampler = MetricsSampler(interval=2, history_seconds=10)
+    assert sampler.samples.maxlen == 5 and sampler.latest() is None
+    for _ in range(8):
+        sampler.samples.append(sampler.sample())
+        clock[0] += 2
+    assert len(sampler.samples) == 5
+    assert [s["timestamp"] for s in sampler.history(5)] == [1012.0, 1014.0]
+    assert sampler.latest()["timestamp"] == 1014.0
+
+
+def test_background_thread_samples_and_notifies(fake_ps, monkeypatch):
+    monkeypatch.setattr(system_metrics, "get_gpu_usage", lambda: None)
+    seen = []
+    sampler = MetricsSampler(interval=0.01, on_sample=seen.append)
+    sampler.start()
+    sampler.start()  # idempotent
+    deadline = time.time() + 2
+    while len(seen) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(seen) >= 3 and sampler.latest() is not None
+
+
+@pytest.fixture
+def client(fake_ps, monkeypatch):
+    from app.api.Widgets import system_stats_api, widgets_bp
+
+    monkeypatch.setattr(system_metrics, "get_gpu_usage", lambda: None)
+    sampler = MetricsSampler(interval=1, history_seconds=600)
+    now = time.time()
+    for age in (400, 90, 30, 5):
+        sampler.samples.append({**sampler.sample(), "timestamp": now - age})
+    monkeypatch.setattr(system_stats_api, "sampler", sampler)
+    app = Flask(__name__)
+    app.register_blueprint(widgets_bp)
+    return app.test_client()
+
+
+@pytest.mark.parametrize("window, count", [("60s", 2), ("2m", 3), ("1h", 4), ("45", 2), (" 10S ", 1)])
+def test_window_returns_history(client, window, count):
+    response = client.get("/api/widgets/system_stats", query_string={"window": window})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body["history"]) == count and body["CPU_Usage_Per"] == 20.0
+
+
+@pytest.mark.parametrize("window", ["0", "-5m", "nan", "inf", "abc", "5d", "m"])
+def test_bad_window_is_400(client, window):
+    response = client.get("/api/widgets/system_stats", query_string={"window": window})
+    assert response.status_code == 400
+
+
+def test_no_window_no_history(client):
+    assert "history" not in client.get("/api/widgets/system_stats").get_json()
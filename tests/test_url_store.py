@@ -0,0 +1,40 @@
+"""
+URLEventStore keeps url_domain_daily in step with url_events across restarts,
+and /stats reports the same keys, live, after every insert.
+"""
+from app.services.Extension.url_store import URLEventStore
+
+
+def _daily(store):
+    return {d["domain"]: (d["visits"], d["dwell_seconds"]) for d in store.domains()}
+
+
+def test_restart_after_event_without_domain(tmp_path):
+    url = f"sqlite:///{tmp_path / 'urls.db'}"
+    store = URLEventStore(url)
+    store.add({"url": "file:///notes.txt", "timestamp": "2026-03-01T09:00:00"})
+
+    # the newest event has no domain: the restarted store must still ingest
+    store = URLEventStore(url)
+    store.add({"url": "https://example.com/a", "domain": "example.com", "timestamp": "2026-03-01T09:00:30"})
+    store.add_many([{"url": "https://example.com/b", "domain": "example.com", "timestamp": "2026-03-01T09:01:00"}])
+
+    assert _daily(store) == {"": (1, 30.0), "example.com": (2, 30.0)}
+    assert store.count() == 3
+
+    store.rebuild_daily()
+    assert _daily(store) == {"": (1, 30.0), "example.com": (2, 30.0)}
+
+
+def test_stats_are_live(tmp_path):
+    store = URLEventStore(f"sqlite:///{tmp_path / 'urls.db'}")
+    assert store.stats() == {"total_urls": 0, "unique_domains": 0, "first_visit": None, "last_visit": None,
+                             "top_domains": []}
+    store.add({"url": "https://example.com/a", "domain": "example.com", "timestamp": "2026-03-01T09:00:00"})
+    store.add_many([{"url": "https://docs.dev/b", "domain": "docs.dev", "timestamp": "2026-03-01T09:01:00"},
+                    {"url": "https://example.com/c", "domain": "example.com", "timestamp": "2026-03-01T09:02:00"}])
+    assert store.stats() == {
+        "total_urls": 3, "unique_domains": 2,
+        "first_visit": "2026-03-01T09:00:00", "last_visit": "2026-03-01T09:02:00",
+        "top_domains": [{"domain": "example.com", "visits": 2}, {"domain": "docs.dev", "visits": 1}],
+    }
@@ -0,0 +1,77 @@
+"""
+WeatherService caches geocodes forever and forecasts until the provider's
+next update, refreshing stale ones in the background (stub provider, no HTTP).
+"""
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.services.Widgets.weather_service import WeatherService
+
+
+class StubProvider:
+    def __init__(self, observed=None, fail=False):
+        self.observed = observed or datetime.now(timezone.utc)
+        self.fail = fail
+        self.geocodes = 0
+        self.forecasts = 0
+
+    def geocode(self, city):
+        self.geocodes += 1
+        return (48.8566, 2.3522) if city.strip().lower() == "paris" else (None, None)
+
+    def current_weather(self, lat, lon):
+        self.forecasts += 1
+        if self.fail:
+            raise RuntimeError("provider down")
+        return {"utc_offset_seconds": 0,
+                "current": {"time": self.observed.strftime("%Y-%m-%dT%H:%M"), "interval": 900,
+                            "temperature_2m": 20 + self.forecasts}}
+
+
+def _wait(predicate):
+    for _ in range(200):
+        if predicate():
+            return
+        time.sleep(0.01)
+    raise AssertionError("background refresh did not finish")
+
+
+def test_geocodes_are_cached_and_persisted(tmp_path):
+    provider = StubProvider()
+    service = WeatherService(provider, tmp_path)
+    assert service.geocode("Paris") == (48.8566, 2.3522)
+    assert service.geocode("  PARIS ") == (48.8566, 2.3522)
+    assert service.geocode("Atlantis") == (None, None)
+    assert provider.geocodes == 2
+    assert WeatherService(StubProvider(), tmp_path).geocode("paris") == (48.8566, 2.3522)  # from disk
+
+
+def test_fresh_forecast_is_served_from_cache(tmp_path):
+    provider = StubProvider()
+    service = WeatherService(provider, tmp_path)
+    first = service.current_weather(48.8566, 2.3522)
+    assert service.current_weather(48.8566, 2.3522) == first
+    assert provider.forecasts == 1
+
+
+def test_stale_forecast_refreshes_in_background(tmp_path):
+    provider = StubProvider(observed=datetime.now(timezone.utc) - timedelta(hours=1))
+    service = WeatherService(provider, tmp_path)
+    first = service.current_weather(1, 2)
+    service._weather[service._key(1, 2)]["expires_at"] = time.time() - 1
+    assert service.current_weather(1, 2) == first  # served stale meanwhile
+    _wait(lambda: provider.forecasts == 2 and not service._refreshing)
+    assert service.current_weather(1, 2)["current"]["temperature_2m"] == 22
+
+
+def test_failed_refresh_is_logged_and_keeps_the_stale_forecast(tmp_path, caplog):
+    provider = StubProvider()
+    service = WeatherService(provider, tmp_path)
+    first = service.current_weather(1, 2)
+    provider.fail = True
+    with caplog.at_level(logging.ERROR):
+        service.prefetch(1, 2)
+        _wait(lambda: not service._refreshing)
+    assert "Weather refresh failed: provider down" in caplog.text
+    assert service.current_weather(1, 2) == first